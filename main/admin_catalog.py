@@ -1,12 +1,42 @@
 from django.contrib import admin
 
 from .models import Review, TravelPackage
+from .services.packages import on_package_changed
 
 admin.site.register(Review)
 
 
+class _PackageChangeAdmin(admin.ModelAdmin):
+    # Admin edits skip the vendor views, so refresh the package's derived copies here too.
+    package_lookup = 'pk'
+    itinerary_changed = False
+
+    def _get_package_ids(self, queryset):
+        return set(queryset.values_list(self.package_lookup, flat=True))
+
+    def _refresh_packages(self, package_ids):
+        for package_id in package_ids:
+            on_package_changed(package_id, itinerary_changed=self.itinerary_changed)
+
+    def save_model(self, request, obj, form, change):
+        # Include the previous parent too, in case the edit moved the row to another package.
+        package_ids = self._get_package_ids(self.model.objects.filter(pk=obj.pk)) if change else set()
+        super().save_model(request, obj, form, change)
+        self._refresh_packages(package_ids | self._get_package_ids(self.model.objects.filter(pk=obj.pk)))
+
+    def delete_model(self, request, obj):
+        package_ids = self._get_package_ids(self.model.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        self._refresh_packages(package_ids)
+
+    def delete_queryset(self, request, queryset):
+        package_ids = self._get_package_ids(queryset)
+        super().delete_queryset(request, queryset)
+        self._refresh_packages(package_ids)
+
+
 @admin.register(TravelPackage)
-class TravelPackageAdmin(admin.ModelAdmin):
+class TravelPackageAdmin(_PackageChangeAdmin):
     list_display = (
         'name',
         'vendor',
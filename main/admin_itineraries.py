@@ -1,8 +1,20 @@
 from django.contrib import admin
 
+from .admin_catalog import _PackageChangeAdmin
 from .models import CustomItinerary, CustomItinerarySelection, PackageDay, PackageDayOption
 
-admin.site.register(PackageDay)
-admin.site.register(PackageDayOption)
+
+@admin.register(PackageDay)
+class PackageDayAdmin(_PackageChangeAdmin):
+    package_lookup = 'package_id'
+    itinerary_changed = True
+
+
+@admin.register(PackageDayOption)
+class PackageDayOptionAdmin(_PackageChangeAdmin):
+    package_lookup = 'package_day__package_id'
+    itinerary_changed = True
+
+
 admin.site.register(CustomItinerary)
 admin.site.register(CustomItinerarySelection)
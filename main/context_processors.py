@@ -1,4 +1,7 @@
-from .models import UserProfile, Notification
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserProfile
+from .notifications import get_unread_notification_count
 
 def user_profile_context(request):
     if request.user.is_authenticated:
@@ -16,9 +19,8 @@ def notification_context(request):
             'unread_notification_count': 0,
         }
 
+    # Resolved only if a template actually renders the badge.
+    user_id = request.user.id
     return {
-        'unread_notification_count': Notification.objects.filter(
-            user=request.user,
-            is_read=False,
-        ).count(),
+        'unread_notification_count': SimpleLazyObject(lambda: get_unread_notification_count(user_id)),
     }
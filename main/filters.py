@@ -1,16 +1,112 @@
+from datetime import timedelta
+
 import django_filters
-from .models import TravelPackage
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import PackageDayOption, TravelPackage, normalize_facet_value
+
+# Facet buckets as (value, label, lower bound, upper bound); lower is inclusive, upper exclusive.
+PACKAGE_PRICE_BUCKETS = (
+    ('under-1000', 'Under 1,000', None, 1000),
+    ('1000-2500', '1,000 - 2,500', 1000, 2500),
+    ('2500-5000', '2,500 - 5,000', 2500, 5000),
+    ('5000-plus', '5,000+', 5000, None),
+)
+PACKAGE_DURATION_BUCKETS = (
+    ('short', '1 - 3 days', None, 4),
+    ('week', '4 - 7 days', 4, 8),
+    ('two-weeks', '8 - 14 days', 8, 15),
+    ('long', '15+ days', 15, None),
+)
+# Departure windows are measured in days from today.
+PACKAGE_DEPARTURE_WINDOWS = (
+    ('30-days', 'Next 30 days', 0, 30),
+    ('3-months', '1 - 3 months', 30, 90),
+    ('6-months', '3 - 6 months', 90, 180),
+    ('later', 'Later', 180, None),
+)
+
+
+def _bucket_choices(buckets):
+    return [(value, label) for value, label, _, _ in buckets]
+
+
+def build_bucket_q(field_name, bucket, offset=None):
+    """Return a ``Q`` for one bucket; date buckets pass ``offset`` to turn day counts into dates."""
+    _, _, lower, upper = bucket
+    condition = Q()
+    if lower is not None:
+        condition &= Q(**{f'{field_name}__gte': offset + timedelta(days=lower) if offset else lower})
+    if upper is not None:
+        condition &= Q(**{f'{field_name}__lt': offset + timedelta(days=upper) if offset else upper})
+    return condition
+
+
+def _filter_by_bucket(queryset, field_name, buckets, value, offset=None):
+    for bucket in buckets:
+        if bucket[0] == value:
+            return queryset.filter(build_bucket_q(field_name, bucket, offset))
+    return queryset
+
 
 class TravelPackageFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='icontains', label='Package Name')
-    location = django_filters.CharFilter(lookup_expr='icontains', label='Location')
-    travel_type = django_filters.CharFilter(lookup_expr='icontains', label='Travel Type')
+    location = django_filters.CharFilter(method='filter_location', label='Location')
+    travel_type = django_filters.CharFilter(method='filter_travel_type', label='Travel Type')
     price__gt = django_filters.NumberFilter(field_name='price', lookup_expr='gt', label='Price from')
     price__lt = django_filters.NumberFilter(field_name='price', lookup_expr='lt', label='Price to')
     start_date__gt = django_filters.DateFilter(field_name='start_date', lookup_expr='gt', label='Available from')
     start_date__lt = django_filters.DateFilter(field_name='start_date', lookup_expr='lt', label='Available to')
-    hotel__name = django_filters.CharFilter(field_name='hotel_options_name', lookup_expr='icontains', label='Hotel Name')
-    
+    price_bucket = django_filters.ChoiceFilter(
+        choices=_bucket_choices(PACKAGE_PRICE_BUCKETS), method='filter_price_bucket', label='Price',
+    )
+    duration = django_filters.ChoiceFilter(
+        choices=_bucket_choices(PACKAGE_DURATION_BUCKETS), method='filter_duration', label='Duration',
+    )
+    departure = django_filters.ChoiceFilter(
+        choices=_bucket_choices(PACKAGE_DEPARTURE_WINDOWS), method='filter_departure', label='Departure',
+    )
+    option_type = django_filters.ChoiceFilter(
+        choices=PackageDayOption.OPTION_TYPE_CHOICES, method='filter_option_type', label='Includes',
+    )
+    hotel__name = django_filters.CharFilter(method='filter_hotel_name', label='Hotel Name')
+
     class Meta:
         model = TravelPackage
-        fields = ['name', 'location', 'travel_type', 'price__gt', 'price__lt', 'start_date__gt', 'start_date__lt']
+        fields = [
+            'name', 'location', 'travel_type', 'price__gt', 'price__lt', 'start_date__gt', 'start_date__lt',
+            'price_bucket', 'duration', 'departure', 'option_type', 'hotel__name',
+        ]
+
+    def filter_location(self, queryset, name, value):
+        return queryset.filter(location_key=normalize_facet_value(value))
+
+    def filter_travel_type(self, queryset, name, value):
+        return queryset.filter(travel_type_key=normalize_facet_value(value))
+
+    def filter_price_bucket(self, queryset, name, value):
+        return _filter_by_bucket(queryset, 'price', PACKAGE_PRICE_BUCKETS, value)
+
+    def filter_duration(self, queryset, name, value):
+        return _filter_by_bucket(queryset, 'duration_days', PACKAGE_DURATION_BUCKETS, value)
+
+    def filter_departure(self, queryset, name, value):
+        return _filter_by_bucket(
+            queryset, 'start_date', PACKAGE_DEPARTURE_WINDOWS, value, offset=timezone.localdate(),
+        )
+
+    def filter_option_type(self, queryset, name, value):
+        return queryset.filter(Exists(
+            PackageDayOption.objects.filter(package_day__package=OuterRef('pk'), option_type=value)
+        ))
+
+    def filter_hotel_name(self, queryset, name, value):
+        # Hotels are modelled as 'stay' itinerary options rather than a separate table.
+        return queryset.filter(Exists(
+            PackageDayOption.objects.filter(
+                package_day__package=OuterRef('pk'),
+                option_type='stay',
+                title__icontains=value,
+            )
+        ))
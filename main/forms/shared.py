@@ -12,6 +12,12 @@ class ReviewForm(forms.ModelForm):
             'comment': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
         }
 
+    def clean_rating(self):
+        rating = self.cleaned_data['rating']
+        if not 1 <= rating <= 5:
+            raise forms.ValidationError('Choose a rating from 1 to 5.')
+        return rating
+
 
 class TravelPackageForm(forms.ModelForm):
     class Meta:
@@ -80,7 +80,7 @@ class BookingDisputeForm(forms.ModelForm):
 
 
 class CustomItinerarySelectionForm(forms.Form):
-    def __init__(self, *args, package=None, **kwargs):
+    def __init__(self, *args, package=None, package_days=None, **kwargs):
         self.package = package
         super().__init__(*args, **kwargs)
         self.package_days = []
@@ -89,7 +89,8 @@ class CustomItinerarySelectionForm(forms.Form):
         if not self.package:
             return
 
-        package_days = self.package.package_days.prefetch_related('options').all()
+        if package_days is None:
+            package_days = self.package.package_days.prefetch_related('options').all()
         for package_day in package_days:
             options = list(package_day.options.all())
             if not options:
@@ -0,0 +1,80 @@
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main.models import Booking, TravelPackage, UserProfile, Vendor
+from main.services.exports import BOOKING_EXPORT_CHUNK_SIZE, stream_booking_export_csv
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seeds synthetic bookings in a rolled-back transaction and reports peak memory of the streaming CSV export.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=200000)
+        parser.add_argument('--chunk-size', type=int, default=BOOKING_EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                vendor = self._seed(options['bookings'])
+                booking_ids = list(Booking.objects.filter(package__vendor=vendor).order_by('id').values_list('id', flat=True))
+                for count in (len(booking_ids) // 10, len(booking_ids)):
+                    bookings = Booking.objects.filter(package__vendor=vendor, id__lte=booking_ids[count - 1])
+                    self._measure(bookings, options['chunk_size'])
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write('Synthetic data rolled back.')
+
+    def _seed(self, booking_count):
+        self.stdout.write(f'Seeding {booking_count} bookings...')
+        suffix = int(time.time())
+        vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=User.objects.create_user(username=f'bench_export_vendor_{suffix}'), role='vendor'),
+            name='Bench Vendor',
+            description='Benchmark',
+            status='approved',
+        )
+        traveler = User.objects.create_user(username=f'bench_export_traveler_{suffix}', email='bench@example.com')
+        today = timezone.now().date()
+        package = TravelPackage.objects.create(
+            vendor=vendor,
+            name='Bench Package',
+            description='Benchmark package',
+            location='Nepal',
+            travel_type='Trek',
+            price=Decimal('1000.00'),
+            start_date=today,
+            end_date=today + timedelta(days=7),
+        )
+        Booking.objects.bulk_create(
+            [Booking(user=traveler, package=package, status='confirmed', total_price=Decimal('1000.00')) for _ in range(booking_count)],
+            batch_size=5000,
+        )
+        return vendor
+
+    def _measure(self, bookings, chunk_size):
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            rows = 0
+            size = 0
+            for line in stream_booking_export_csv(bookings, chunk_size=chunk_size):
+                rows += 1
+                size += len(line)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows - 1:>7} rows ({size / 1_000_000:.1f} MB of CSV) in {time.perf_counter() - started:.1f}s, '
+            f'peak traced memory {peak / 1_000_000:.1f} MB'
+        ))
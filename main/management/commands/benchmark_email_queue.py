@@ -0,0 +1,118 @@
+import socketserver
+import statistics
+import threading
+import time
+
+from django.core.mail import get_connection, send_mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import OutboundEmail
+from main.services.mailer import send_queued_emails
+from main.utils import send_otp
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _FakeSMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough SMTP for Django's backend, with an artificial delay per accepted message.
+    def _reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self._reply('220 fake-smtp ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='ignore').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self._reply('250 fake-smtp')
+            elif command == 'DATA':
+                self._reply('354 end with <CRLF>.<CRLF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                time.sleep(self.server.delay)
+                self.server.delivered += 1
+                self._reply('250 queued')
+            elif command == 'QUIT':
+                self._reply('221 bye')
+                return
+            else:
+                self._reply('250 ok')
+
+
+class _FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay):
+        super().__init__(('127.0.0.1', 0), _FakeSMTPHandler)
+        self.delay = delay
+        self.delivered = 0
+
+
+def _percentiles(timings):
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    return statistics.median(timings), p95
+
+
+class Command(BaseCommand):
+    help = 'Compares OTP send latency with direct SMTP against the outbox queue, using a local fake SMTP relay.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--smtp-delay', type=float, default=0.2, help='Seconds the fake relay spends on each message.')
+
+    def handle(self, *args, **options):
+        server = _FakeSMTPServer(options['smtp_delay'])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        connection_kwargs = {
+            'backend': 'django.core.mail.backends.smtp.EmailBackend',
+            'host': host,
+            'port': port,
+            'use_tls': False,
+            'use_ssl': False,
+            'username': '',
+            'password': '',
+        }
+
+        try:
+            with transaction.atomic():
+                self._run(options['requests'], connection_kwargs)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write('Benchmark rows rolled back.')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def _run(self, request_count, connection_kwargs):
+        direct = []
+        for index in range(request_count):
+            started = time.perf_counter()
+            send_mail('Your OTP Code', 'Your OTP code is 123456.', None, [f'direct{index}@example.com'],
+                      connection=get_connection(**connection_kwargs))
+            direct.append((time.perf_counter() - started) * 1000)
+
+        queued = []
+        for index in range(request_count):
+            started = time.perf_counter()
+            send_otp(f'queued{index}@example.com')
+            queued.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        sent, failed = send_queued_emails(batch_size=request_count, connection=get_connection(**connection_kwargs))
+        drain_seconds = time.perf_counter() - started
+
+        for label, timings in (('direct SMTP', direct), ('queued', queued)):
+            p50, p95 = _percentiles(timings)
+            self.stdout.write(f'{label:>12}: p50={p50:.1f}ms p95={p95:.1f}ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Worker delivered {sent} emails ({failed} deferred, '
+            f'{OutboundEmail.objects.filter(status="pending").count()} still pending) in {drain_seconds:.2f}s over one connection.'
+        ))
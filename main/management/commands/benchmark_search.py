@@ -0,0 +1,84 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main.models import TravelPackage, UserProfile, Vendor
+from main.services.search import rebuild_package_search_index, search_packages
+
+WORDS = [
+    'everest', 'annapurna', 'pokhara', 'chitwan', 'lumbini', 'mustang', 'langtang', 'kathmandu',
+    'trek', 'safari', 'heritage', 'rafting', 'paragliding', 'jungle', 'temple', 'lake', 'deluxe',
+    'budget', 'family', 'adventure', 'cultural', 'wildlife', 'monastery', 'sunrise', 'village',
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seeds synthetic packages in a rolled-back transaction and reports catalog search latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--packages', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                self._seed(options['packages'], rng)
+                self._run(options['queries'], rng)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write('Synthetic data rolled back.')
+
+    def _seed(self, package_count, rng):
+        self.stdout.write(f'Seeding {package_count} packages...')
+        user = User.objects.create_user(username=f'bench_vendor_{int(time.time())}')
+        profile = UserProfile.objects.create(user=user, role='vendor')
+        vendor = Vendor.objects.create(user_profile=profile, name='Bench Vendor', description='Benchmark', status='approved')
+        today = timezone.now().date()
+
+        TravelPackage.objects.bulk_create(
+            [
+                TravelPackage(
+                    vendor=vendor,
+                    name=' '.join(rng.sample(WORDS, 3)).title(),
+                    description=' '.join(rng.choices(WORDS, k=40)),
+                    location=rng.choice(WORDS[:8]).title(),
+                    travel_type=rng.choice(WORDS[8:16]).title(),
+                    price=Decimal(rng.randint(100, 5000)),
+                    start_date=today + timedelta(days=rng.randint(1, 365)),
+                    end_date=today + timedelta(days=rng.randint(366, 400)),
+                )
+                for _ in range(package_count)
+            ],
+            batch_size=2000,
+        )
+        started = time.perf_counter()
+        rebuild_package_search_index(TravelPackage.objects.filter(vendor=vendor), batch_size=2000)
+        self.stdout.write(f'Indexed in {time.perf_counter() - started:.1f}s')
+
+    def _run(self, query_count, rng):
+        base_qs = TravelPackage.objects.filter(moderation_status='approved')
+        timings = []
+        for _ in range(query_count):
+            query = ' '.join(rng.sample(WORDS, rng.randint(1, 2)))
+            started = time.perf_counter()
+            list(search_packages(query, base_qs)[:9])
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        self.stdout.write(self.style.SUCCESS(
+            f'{query_count} queries: p50={statistics.median(timings):.1f}ms p95={p95:.1f}ms max={timings[-1]:.1f}ms'
+        ))
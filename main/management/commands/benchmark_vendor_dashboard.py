@@ -0,0 +1,139 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from main.models import Booking, TravelPackage, Trip, UserProfile, Vendor
+from main.services.analytics import get_vendor_dashboard_analytics, rebuild_vendor_booking_rollups
+
+STATUSES = ['pending', 'confirmed', 'confirmed', 'confirmed', 'in_review', 'trip_completed', 'cancelled', 'cancellation_requested']
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _live_dashboard_analytics(vendor):
+    # The per-request aggregation the vendor dashboard ran before rollups existed.
+    vendor_bookings_qs = Booking.objects.filter(package__vendor=vendor)
+    confirmed_bookings = vendor_bookings_qs.filter(status__in=['confirmed', 'trip_completed'])
+    confirmed_bookings.aggregate(total_revenue=Sum('total_price'), total_bookings=Count('id'))
+    list(
+        confirmed_bookings.filter(booking_date__gte=timezone.now() - timezone.timedelta(days=365))
+        .annotate(month=TruncMonth('booking_date')).values('month')
+        .annotate(revenue=Sum('total_price')).order_by('month')
+    )
+    list(confirmed_bookings.values('package__name').annotate(count=Count('id')).order_by('-count')[:5])
+    vendor_bookings_qs.filter(status='pending').count()
+    vendor_bookings_qs.filter(status='in_review').count()
+    vendor_bookings_qs.filter(status__in=['cancellation_requested', 'cancellation_reviewed']).count()
+    Trip.objects.filter(vendor=vendor).exclude(status__in=['completed', 'cancelled', 'no_show']).count()
+
+
+def _summarize(timings):
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    return f'p50={statistics.median(timings):.1f}ms p95={p95:.1f}ms'
+
+
+class Command(BaseCommand):
+    help = 'Seeds one vendor with synthetic bookings in a rolled-back transaction and compares dashboard analytics latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=100000)
+        parser.add_argument('--packages', type=int, default=40)
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                vendor = self._seed(options['bookings'], options['packages'], rng)
+                self._run(vendor, options['runs'])
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write('Synthetic data rolled back.')
+
+    def _seed(self, booking_count, package_count, rng):
+        self.stdout.write(f'Seeding {booking_count} bookings across {package_count} packages...')
+        suffix = int(time.time())
+        vendor_user = User.objects.create_user(username=f'bench_dashboard_vendor_{suffix}')
+        vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=vendor_user, role='vendor'),
+            name='Bench Vendor',
+            description='Benchmark',
+            status='approved',
+        )
+        traveler = User.objects.create_user(username=f'bench_dashboard_traveler_{suffix}')
+        today = timezone.now().date()
+        packages = TravelPackage.objects.bulk_create([
+            TravelPackage(
+                vendor=vendor,
+                name=f'Bench Package {index}',
+                description='Benchmark package',
+                location='Nepal',
+                travel_type='Trek',
+                price=Decimal(rng.randint(100, 5000)),
+                start_date=today,
+                end_date=today + timedelta(days=7),
+            )
+            for index in range(package_count)
+        ])
+        Booking.objects.bulk_create(
+            [
+                Booking(
+                    user=traveler,
+                    package=rng.choice(packages),
+                    status=rng.choice(STATUSES),
+                    total_price=Decimal(rng.randint(100, 5000)),
+                )
+                for _ in range(booking_count)
+            ],
+            batch_size=2000,
+        )
+
+        # booking_date is auto_now_add, so spread the history over two years afterwards.
+        booking_ids = list(Booking.objects.filter(package__vendor=vendor).values_list('id', flat=True))
+        now = timezone.now()
+        for month_offset in range(24):
+            chunk = booking_ids[month_offset::24]
+            Booking.objects.filter(id__in=chunk).update(booking_date=now - timedelta(days=30 * month_offset))
+
+        started = time.perf_counter()
+        rows = rebuild_vendor_booking_rollups(vendor.id)
+        self.stdout.write(f'Backfilled {rows} rollup rows in {time.perf_counter() - started:.1f}s')
+        return vendor
+
+    def _run(self, vendor, runs):
+        live = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            _live_dashboard_analytics(vendor)
+            live.append((time.perf_counter() - started) * 1000)
+
+        rollup = []
+        for _ in range(runs):
+            cache.clear()
+            started = time.perf_counter()
+            get_vendor_dashboard_analytics(vendor.id)
+            rollup.append((time.perf_counter() - started) * 1000)
+
+        cached = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            get_vendor_dashboard_analytics(vendor.id)
+            cached.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(f'  live booking scan: {_summarize(live)}')
+        self.stdout.write(f'   rollup (cold):   {_summarize(rollup)}')
+        self.stdout.write(self.style.SUCCESS(f'   rollup (cached): {_summarize(cached)}'))
@@ -0,0 +1,230 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from main.models import (
+    Booking,
+    BookingCapacityRequest,
+    ChatThread,
+    PaymentLog,
+    Review,
+    TravelPackage,
+    Trip,
+    TripItem,
+    UserProfile,
+    Vendor,
+)
+from main.services.query_plans import build_key_querysets, find_sequential_scans
+
+BOOKING_STATUSES = ['pending', 'confirmed', 'confirmed', 'in_review', 'trip_completed', 'cancelled']
+TRIP_STATUSES = ['planned', 'ready', 'in_progress', 'completed', 'cancelled']
+CAPACITY_REQUEST_STATUSES = ['pending', 'approved', 'rejected', 'converted']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds synthetic catalog, booking and chat data in a rolled-back transaction, runs EXPLAIN on the '
+        'hot ORM queries and fails if any of them reads a large table with a sequential scan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=50)
+        parser.add_argument('--travelers', type=int, default=500)
+        parser.add_argument('--packages', type=int, default=5000)
+        parser.add_argument('--bookings', type=int, default=50000)
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=1000,
+            help='Sequential scans of tables with fewer rows than this are reported but not treated as failures.',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--show-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        failures = []
+        try:
+            with transaction.atomic():
+                fixtures = self._seed(options, rng)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                failures = self._check(fixtures, options['min_rows'], options['show_plans'])
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write('Synthetic data rolled back.')
+
+        if failures:
+            raise CommandError(f'Sequential scans on large tables: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('All key queries use indexes.'))
+
+    def _seed(self, options, rng):
+        self.stdout.write(
+            f"Seeding {options['packages']} packages and {options['bookings']} bookings "
+            f"across {options['vendors']} vendors and {options['travelers']} travelers..."
+        )
+        suffix = int(time.time())
+        today = timezone.now().date()
+
+        vendors = []
+        for index in range(options['vendors']):
+            user = User.objects.create_user(username=f'plan_vendor_{suffix}_{index}')
+            vendors.append(Vendor.objects.create(
+                user_profile=UserProfile.objects.create(user=user, role='vendor'),
+                name=f'Plan Vendor {index}',
+                description='Query plan check',
+                status='approved',
+            ))
+        travelers = User.objects.bulk_create([
+            User(username=f'plan_traveler_{suffix}_{index}') for index in range(options['travelers'])
+        ])
+
+        packages = []
+        for index in range(options['packages']):
+            start_date = today + timedelta(days=rng.randint(-60, 365))
+            sponsored = rng.random() < 0.05
+            package = TravelPackage(
+                vendor=rng.choice(vendors),
+                name=f'Plan Package {index}',
+                description='Query plan check',
+                location=rng.choice(['Pokhara', 'Kathmandu', 'Chitwan', 'Mustang', 'Lumbini']),
+                travel_type=rng.choice(['Trek', 'Tour', 'Safari', 'Adventure']),
+                price=Decimal(rng.randint(300, 6000)),
+                start_date=start_date,
+                end_date=start_date + timedelta(days=rng.randint(1, 14)),
+                moderation_status=rng.choice(['approved', 'approved', 'approved', 'pending', 'rejected']),
+                is_sponsored=sponsored,
+                sponsorship_start=today - timedelta(days=rng.randint(0, 30)) if sponsored else None,
+                sponsorship_end=today + timedelta(days=rng.randint(0, 30)) if sponsored else None,
+            )
+            package.refresh_facet_fields()
+            packages.append(package)
+        packages = TravelPackage.objects.bulk_create(packages, batch_size=1000)
+
+        bookings = Booking.objects.bulk_create(
+            [
+                Booking(
+                    user=rng.choice(travelers),
+                    package=rng.choice(packages),
+                    status=rng.choice(BOOKING_STATUSES),
+                    number_of_travelers=rng.randint(1, 4),
+                    total_price=Decimal(rng.randint(300, 6000)),
+                )
+                for _ in range(options['bookings'])
+            ],
+            batch_size=2000,
+        )
+        trips = Trip.objects.bulk_create(
+            [
+                Trip(
+                    booking=booking,
+                    traveler_id=booking.user_id,
+                    vendor_id=booking.package.vendor_id,
+                    package_id=booking.package_id,
+                    status=rng.choice(TRIP_STATUSES),
+                )
+                for booking in bookings[::2]
+            ],
+            batch_size=2000,
+        )
+        TripItem.objects.bulk_create(
+            [
+                TripItem(trip=trip, title=f'Day {day}', day_number=day, sort_order=0)
+                for trip in trips
+                for day in range(1, 4)
+            ],
+            batch_size=5000,
+        )
+
+        thread_pairs = {(rng.choice(travelers).id, rng.choice(packages)) for _ in range(options['bookings'] // 10)}
+        ChatThread.objects.bulk_create(
+            [
+                ChatThread(
+                    traveler_id=traveler_id,
+                    vendor_id=package.vendor_id,
+                    package=package,
+                    is_active=rng.random() < 0.9,
+                )
+                for traveler_id, package in thread_pairs
+            ],
+            batch_size=2000,
+            ignore_conflicts=True,
+        )
+        BookingCapacityRequest.objects.bulk_create(
+            [
+                BookingCapacityRequest(
+                    package=rng.choice(packages),
+                    traveler=rng.choice(travelers),
+                    status=rng.choice(CAPACITY_REQUEST_STATUSES),
+                )
+                for _ in range(options['bookings'] // 10)
+            ],
+            batch_size=2000,
+        )
+        PaymentLog.objects.bulk_create(
+            [
+                PaymentLog(
+                    booking=booking,
+                    user_id=booking.user_id,
+                    package_id=booking.package_id,
+                    provider=rng.choice(['stripe', 'khalti']),
+                    payment_type='booking',
+                    status=rng.choice(['initiated', 'success', 'failed']),
+                    amount=booking.total_price,
+                )
+                for booking in bookings
+            ],
+            batch_size=2000,
+        )
+        Review.objects.bulk_create(
+            [
+                Review(
+                    user=rng.choice(travelers),
+                    package=rng.choice(packages),
+                    rating=rng.randint(1, 5),
+                    comment='Query plan check',
+                )
+                for _ in range(options['bookings'] // 5)
+            ],
+            batch_size=2000,
+        )
+
+        return {
+            'traveler': rng.choice(travelers),
+            'vendor': rng.choice(vendors),
+            'package': rng.choice(packages),
+            'trip': rng.choice(trips),
+        }
+
+    def _check(self, fixtures, min_rows, show_plans):
+        row_counts = {
+            model._meta.db_table: model.objects.count()
+            for model in apps.get_app_config('main').get_models()
+        }
+        failures = []
+        for name, queryset in build_key_querysets(**fixtures).items():
+            scans = find_sequential_scans(queryset)
+            # Anything that is not a known small table (including subquery aliases) counts as large.
+            large_scans = [table for table in scans if row_counts.get(table, min_rows) >= min_rows]
+            if large_scans:
+                failures.append(f'{name} ({", ".join(large_scans)})')
+                self.stdout.write(self.style.ERROR(f'  {name}: sequential scan on {", ".join(large_scans)}'))
+            elif scans:
+                self.stdout.write(f'  {name}: ok (small tables scanned: {", ".join(scans)})')
+            else:
+                self.stdout.write(f'  {name}: ok')
+            if show_plans or large_scans:
+                for line in queryset.explain().splitlines():
+                    self.stdout.write(f'      {line}')
+        return failures
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.services.notifications import process_notification_fanouts
+
+
+class Command(BaseCommand):
+    help = 'Writes queued notification fan-outs, such as itinerary updates, to every affected traveler.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Notifications written per query.')
+        parser.add_argument('--limit', type=int, default=10, help='Fan-outs claimed per poll.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new fan-outs instead of exiting when the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds to wait between polls when nothing is due.')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = process_notification_fanouts(limit=options['limit'], batch_size=options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent:
+                self.stdout.write(f'Sent {sent} fan-outs ({failed} deferred).')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully sent {total_sent} fan-outs; {total_failed} deferred for retry.'))
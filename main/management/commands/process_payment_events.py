@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.services.payment_events import process_pending_payment_events
+
+
+class Command(BaseCommand):
+    help = 'Drains queued payment provider webhook events into bookings, sponsorships and payment logs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Events handled per batch.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new events instead of exiting when the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait between polls when the queue is empty.')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            handled = process_pending_payment_events(batch_size=options['batch_size'])
+            total += handled
+            if handled:
+                self.stdout.write(f'Handled {handled} payment events.')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully handled {total} payment events.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from main.models import TravelPackage
+from main.services.capacity import rebuild_capacity_ledger
+
+
+class Command(BaseCommand):
+    help = 'Recounts booked and held travelers for each package capacity ledger and expires stale holds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--package-id', type=int, action='append', dest='package_ids', help='Only rebuild the given package (repeatable).')
+
+    def handle(self, *args, **options):
+        queryset = TravelPackage.objects.order_by('id')
+        if options['package_ids']:
+            queryset = queryset.filter(id__in=options['package_ids'])
+
+        self.stdout.write('Rebuilding package capacity ledgers...')
+        rebuilt = 0
+        for package_id in queryset.values_list('id', flat=True).iterator():
+            rebuild_capacity_ledger(package_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {rebuilt} capacity ledgers.'))
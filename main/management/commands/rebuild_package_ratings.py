@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from main.services.ratings import rebuild_package_rating_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the denormalized rating average, count and histogram of packages from their reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--package-id', type=int, action='append', dest='package_ids', help='Only rebuild the given package (repeatable).')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding package rating stats...')
+        packages = rebuild_package_rating_stats(options['package_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt rating stats for {packages} packages.'))
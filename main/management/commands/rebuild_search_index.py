@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from main.models import TravelPackage
+from main.services.search import rebuild_package_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the catalog search token index for all travel packages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--package-id', type=int, action='append', dest='package_ids', help='Only reindex the given package (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Packages indexed per transaction.')
+
+    def handle(self, *args, **options):
+        queryset = TravelPackage.objects.all()
+        if options['package_ids']:
+            queryset = queryset.filter(id__in=options['package_ids'])
+
+        self.stdout.write('Rebuilding package search index...')
+        indexed = rebuild_package_search_index(queryset, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully indexed {indexed} travel packages.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from main.services.similarity import rebuild_package_similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the feature vectors behind "compare similar" and "you may also like" for every approved package.'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding package similarity vectors...')
+        packages = rebuild_package_similarity_index()
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt similarity vectors for {packages} packages.'))
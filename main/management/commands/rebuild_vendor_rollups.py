@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Vendor
+from main.services.analytics import rebuild_vendor_booking_rollups
+
+
+class Command(BaseCommand):
+    help = 'Backfills the vendor booking rollups used by the vendor dashboard from existing bookings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor-id', type=int, action='append', dest='vendor_ids', help='Only rebuild the given vendor (repeatable).')
+
+    def handle(self, *args, **options):
+        queryset = Vendor.objects.order_by('id')
+        if options['vendor_ids']:
+            queryset = queryset.filter(id__in=options['vendor_ids'])
+
+        self.stdout.write('Rebuilding vendor booking rollups...')
+        vendors = 0
+        rows = 0
+        for vendor_id in queryset.values_list('id', flat=True).iterator():
+            rows += rebuild_vendor_booking_rollups(vendor_id)
+            vendors += 1
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {rows} rollup rows for {vendors} vendors.'))
@@ -4,6 +4,11 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from django.db import transaction
 from main.models import UserProfile, Vendor, TravelPackage, Booking, Review, PackageImage
+from main.services.analytics import rebuild_vendor_booking_rollups
+from main.services.facets import bump_package_facet_version
+from main.services.ratings import rebuild_package_rating_stats
+from main.services.search import rebuild_package_search_index
+from main.services.similarity import rebuild_package_similarity_index
 
 USER_COUNT = 5
 PASSWORD = 'password123'
@@ -112,6 +117,8 @@ class Command(BaseCommand):
                 total_price=package.price * travelers_count
             )
             bookings.append(booking)
+        for vendor in vendors:
+            rebuild_vendor_booking_rollups(vendor.id)
         self.stdout.write(f"{len(bookings)} bookings created.")
 
         # --- Create Reviews ---
@@ -136,5 +143,9 @@ class Command(BaseCommand):
                     is_verified=True 
                 )
                 reviews.append(review)
+        rebuild_package_rating_stats()
+        rebuild_package_search_index()
+        rebuild_package_similarity_index()
+        bump_package_facet_version()
         self.stdout.write(f"{len(reviews)} reviews created.")
         self.stdout.write(self.style.SUCCESS('Successfully seeded the database.'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.services.mailer import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued outbound emails in batches over a single SMTP connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails sent per SMTP connection.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new emails instead of exiting when the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds to wait between polls when nothing is due.')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_queued_emails(batch_size=options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent:
+                self.stdout.write(f'Sent {sent} emails ({failed} deferred).')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully sent {total_sent} emails; {total_failed} deferred for retry.'))
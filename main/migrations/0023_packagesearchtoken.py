@@ -0,0 +1,76 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:14
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copy of the tokenizer and field weights in main.services.search at the time of
+# this migration, so later changes to that module cannot break a fresh migrate.
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+FIELD_WEIGHTS = {
+    'name': 8,
+    'location': 5,
+    'travel_type': 5,
+    'vendor_name': 3,
+    'option_titles': 2,
+    'description': 1,
+}
+
+
+def _tokenize(text):
+    return [token[:64] for token in TOKEN_PATTERN.findall((text or '').lower()) if len(token) >= 2]
+
+
+def backfill_search_tokens(apps, schema_editor):
+    TravelPackage = apps.get_model('main', 'TravelPackage')
+    PackageDayOption = apps.get_model('main', 'PackageDayOption')
+    PackageSearchToken = apps.get_model('main', 'PackageSearchToken')
+    option_titles = {}
+    for package_id, title in PackageDayOption.objects.values_list('package_day__package_id', 'title'):
+        option_titles.setdefault(package_id, []).append(title)
+
+    tokens = []
+    for package in TravelPackage.objects.select_related('vendor').order_by('id').iterator(chunk_size=500):
+        sources = {
+            'name': package.name,
+            'location': package.location,
+            'travel_type': package.travel_type,
+            'vendor_name': package.vendor.name,
+            'option_titles': ' '.join(option_titles.get(package.id, [])),
+            'description': package.description,
+        }
+        weights = Counter()
+        for field, text in sources.items():
+            for token in set(_tokenize(text)):
+                weights[token] += FIELD_WEIGHTS[field]
+        tokens.extend(
+            PackageSearchToken(package_id=package.id, token=token, weight=weight)
+            for token, weight in weights.items()
+        )
+    PackageSearchToken.objects.bulk_create(tokens, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_booking_child_under_seven_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='main.travelpackage')),
+            ],
+            options={
+                'unique_together': {('package', 'token')},
+            },
+        ),
+        migrations.RunPython(backfill_search_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_packagesearchtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageCapacityLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booked_travelers', models.PositiveIntegerField(default=0)),
+                ('held_travelers', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('package', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='capacity_ledger', to='main.travelpackage')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CapacityHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number_of_travelers', models.PositiveIntegerField(default=1)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('converted', 'Converted To Booking'), ('released', 'Released'), ('expired', 'Expired')], default='active', max_length=20)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capacity_holds', to='main.travelpackage')),
+                ('traveler', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capacity_holds', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['package', 'status', 'expires_at'], name='main_capaci_package_0bbdce_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_packagecapacityledger_capacityhold'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='payment_provider',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='payment_reference',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('payment_reference', ''), _negated=True), fields=('payment_provider', 'payment_reference'), name='unique_booking_per_payment_reference'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_booking_payment_reference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=20)),
+                ('event_id', models.CharField(max_length=255)),
+                ('event_type', models.CharField(max_length=100)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('ignored', 'Ignored'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['received_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'received_at'], name='main_paymen_status_14dd9a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('provider', 'event_id'), name='unique_payment_event_per_provider')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_vendor_booking_rollups(apps, schema_editor):
+    Booking = apps.get_model('main', 'Booking')
+    VendorBookingRollup = apps.get_model('main', 'VendorBookingRollup')
+    rows = (
+        Booking.objects.annotate(month=TruncMonth('booking_date', output_field=DateField()))
+        .order_by()
+        .values('package__vendor_id', 'package_id', 'month', 'status')
+        .annotate(booking_count=Count('id'), revenue=Sum('total_price'))
+    )
+    VendorBookingRollup.objects.bulk_create(
+        [
+            VendorBookingRollup(
+                vendor_id=row['package__vendor_id'],
+                package_id=row['package_id'],
+                month=row['month'],
+                status=row['status'],
+                booking_count=row['booking_count'],
+                revenue=row['revenue'] or 0,
+            )
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0027_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorBookingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('in_review', 'In Review'), ('cancellation_requested', 'Cancellation Requested'), ('cancellation_reviewed', 'Waiting Admin Decision'), ('partially_refunded', 'Partially Refunded'), ('refund_processed', 'Refund Processed'), ('trip_completed', 'Trip Completed'), ('no_show', 'No Show'), ('cancelled', 'Cancelled')], max_length=30)),
+                ('booking_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_rollups', to='main.travelpackage')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_rollups', to='main.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', 'status', 'month'], name='main_vendor_vendor__c08fe4_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'package', 'month', 'status'), name='unique_vendor_booking_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_vendor_booking_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0028_vendorbookingrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentlog',
+            index=models.Index(fields=['-created_at', '-id'], name='paymentlog_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentlog',
+            index=models.Index(fields=['provider', 'status', '-created_at'], name='paymentlog_provider_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentlog',
+            index=models.Index(fields=['status', '-created_at'], name='paymentlog_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentlog',
+            index=models.Index(fields=['payment_type', '-created_at'], name='paymentlog_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentlog',
+            index=models.Index(fields=['transaction_reference'], name='paymentlog_reference_idx'),
+        ),
+    ]
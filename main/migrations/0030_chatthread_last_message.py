@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_last_message(apps, schema_editor):
+    ChatThread = apps.get_model('main', 'ChatThread')
+    ChatMessage = apps.get_model('main', 'ChatMessage')
+    for thread in ChatThread.objects.only('id').iterator():
+        latest = ChatMessage.objects.filter(thread_id=thread.id).order_by('-id').only('message', 'created_at').first()
+        if latest is None:
+            continue
+        ChatThread.objects.filter(pk=thread.id).update(
+            last_message_at=latest.created_at,
+            last_message_preview=' '.join(latest.message.split())[:160],
+        )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0029_paymentlog_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatthread',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=160),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['thread', '-id'], name='chatmessage_thread_id_idx'),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:10
+
+from django.db import migrations, models
+from django.db.models import Max, Q
+
+
+def backfill_read_cursors(apps, schema_editor):
+    # A participant has seen everything up to the last message they sent or marked read.
+    ChatThread = apps.get_model('main', 'ChatThread')
+    ChatMessage = apps.get_model('main', 'ChatMessage')
+    for thread in ChatThread.objects.select_related('vendor__user_profile').iterator():
+        messages = ChatMessage.objects.filter(thread_id=thread.id)
+        cursors = messages.aggregate(
+            traveler=Max('id', filter=Q(sender_id=thread.traveler_id) | Q(is_read=True, sender_id=thread.vendor.user_profile.user_id)),
+            vendor=Max('id', filter=Q(sender_id=thread.vendor.user_profile.user_id) | Q(is_read=True, sender_id=thread.traveler_id)),
+        )
+        ChatThread.objects.filter(pk=thread.id).update(
+            traveler_read_cursor=cursors['traveler'] or 0,
+            vendor_read_cursor=cursors['vendor'] or 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0030_chatthread_last_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatthread',
+            name='traveler_read_cursor',
+            field=models.PositiveBigIntegerField(default=0, help_text='ID of the newest message the traveler has seen.'),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='vendor_read_cursor',
+            field=models.PositiveBigIntegerField(default=0, help_text='ID of the newest message the vendor has seen.'),
+        ),
+        migrations.RunPython(backfill_read_cursors, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatmessage',
+            name='is_read',
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:16
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_stats(apps, schema_editor):
+    TravelPackage = apps.get_model('main', 'TravelPackage')
+    Review = apps.get_model('main', 'Review')
+    histograms = {}
+    rows = (
+        Review.objects.filter(rating__gte=1, rating__lte=5)
+        .order_by()
+        .values_list('package_id', 'rating')
+        .annotate(count=Count('id'))
+    )
+    for package_id, rating, count in rows:
+        histograms.setdefault(package_id, [0] * 5)[rating - 1] = count
+    for package_id, histogram in histograms.items():
+        rating_count = sum(histogram)
+        rating_total = sum(stars * count for stars, count in enumerate(histogram, start=1))
+        TravelPackage.objects.filter(pk=package_id).update(
+            rating_avg=(Decimal(rating_total) / rating_count).quantize(Decimal('0.01')),
+            rating_count=rating_count,
+            rating_histogram=histogram,
+        )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0031_chat_read_cursors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='travelpackage',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='travelpackage',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='travelpackage',
+            name='rating_histogram',
+            field=models.JSONField(blank=True, default=list, help_text='Review counts for 1 to 5 stars.'),
+        ),
+        migrations.AddIndex(
+            model_name='travelpackage',
+            index=models.Index(fields=['-rating_avg', '-id'], name='package_rating_idx'),
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
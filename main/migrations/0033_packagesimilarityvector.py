@@ -0,0 +1,107 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:22
+
+import math
+import zlib
+from array import array
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# The vector layout below mirrors main.services.similarity as it stood when this migration
+# was written. It is spelled out in plain Python so the migration needs neither NumPy nor
+# the service module.
+HASH_BUCKETS = 64
+PRICE_BANDS = 10
+PRICE_BASE = 500
+DURATION_BANDS = (2, 4, 7, 10, 14)
+OPTION_TYPES = ('flight', 'road', 'rail', 'water', 'stay', 'activity', 'other')
+FEATURE_WEIGHTS = (('travel_type', 3.0), ('location', 2.0), ('price', 1.0), ('duration', 1.0), ('options', 1.0))
+
+
+def _normalized(values):
+    norm = math.sqrt(sum(value * value for value in values))
+    return [value / norm for value in values] if norm else values
+
+
+def _hashed_one_hot(value):
+    block = [0.0] * HASH_BUCKETS
+    value = ' '.join((value or '').lower().split())
+    if value:
+        block[zlib.crc32(value.encode('utf-8')) % HASH_BUCKETS] = 1.0
+    return block
+
+
+def _banded(position, size):
+    block = [0.0] * size
+    block[position] = 1.0
+    if position > 0:
+        block[position - 1] = 0.5
+    if position < size - 1:
+        block[position + 1] = 0.5
+    return _normalized(block)
+
+
+def _feature_vector(package, option_counts):
+    price_band = int(math.log2(max(float(package.price), 1) / PRICE_BASE)) if package.price else 0
+    if package.start_date and package.end_date:
+        days = (package.end_date - package.start_date).days + 1
+    else:
+        days = 0
+    blocks = {
+        'travel_type': _hashed_one_hot(package.travel_type),
+        'location': _hashed_one_hot(package.location),
+        'price': _banded(min(max(price_band, 0), PRICE_BANDS - 1), PRICE_BANDS),
+        'duration': _banded(sum(1 for edge in DURATION_BANDS if days > edge), len(DURATION_BANDS) + 1),
+        'options': _normalized([float(option_counts.get(option_type, 0)) for option_type in OPTION_TYPES]),
+    }
+    vector = array('f')
+    for name, weight in FEATURE_WEIGHTS:
+        vector.extend(value * math.sqrt(weight) for value in blocks[name])
+    return vector.tobytes()
+
+
+def backfill_similarity_vectors(apps, schema_editor):
+    TravelPackage = apps.get_model('main', 'TravelPackage')
+    PackageDayOption = apps.get_model('main', 'PackageDayOption')
+    PackageSimilarityVector = apps.get_model('main', 'PackageSimilarityVector')
+    option_counts = {}
+    rows = (
+        PackageDayOption.objects.order_by()
+        .values_list('package_day__package_id', 'option_type')
+        .annotate(count=Count('id'))
+    )
+    for package_id, option_type, count in rows:
+        option_counts.setdefault(package_id, {})[option_type] = count
+
+    PackageSimilarityVector.objects.bulk_create(
+        [
+            PackageSimilarityVector(
+                package_id=package.id,
+                vector=_feature_vector(package, option_counts.get(package.id, {})),
+            )
+            for package in TravelPackage.objects.filter(moderation_status='approved').order_by('id')
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0032_package_rating_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageSimilarityVector',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector', models.BinaryField(help_text='float32 feature vector used by the in-memory similarity index.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('package', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_vector', to='main.travelpackage')),
+            ],
+        ),
+        migrations.RunPython(backfill_similarity_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:27
+
+from django.db import migrations, models
+
+
+def backfill_facet_fields(apps, schema_editor):
+    TravelPackage = apps.get_model('main', 'TravelPackage')
+    packages = []
+    for package in TravelPackage.objects.only('id', 'location', 'travel_type', 'start_date', 'end_date').iterator():
+        package.location_key = ' '.join((package.location or '').lower().split())
+        package.travel_type_key = ' '.join((package.travel_type or '').lower().split())
+        package.duration_days = max((package.end_date - package.start_date).days + 1, 0)
+        packages.append(package)
+    TravelPackage.objects.bulk_update(packages, ['location_key', 'travel_type_key', 'duration_days'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0033_packagesimilarityvector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='travelpackage',
+            name='duration_days',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='travelpackage',
+            name='location_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='travelpackage',
+            name='travel_type_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_facet_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='packagedayoption',
+            index=models.Index(fields=['option_type', 'package_day'], name='packagedayoption_type_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0034_package_facets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['package', 'status'], name='booking_package_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-booking_date'], name='booking_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingcapacityrequest',
+            index=models.Index(fields=['package', 'status', '-created_at'], name='capacityrequest_package_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingcapacityrequest',
+            index=models.Index(condition=models.Q(('approved_payment_used_at__isnull', True), ('status', 'approved')), fields=['traveler', 'package'], name='capacityrequest_unused_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatthread',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['vendor', '-updated_at', '-id'], name='chatthread_vendor_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatthread',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['traveler', '-updated_at', '-id'], name='chatthread_traveler_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['package', '-created_at', '-id'], name='review_package_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='travelpackage',
+            index=models.Index(fields=['moderation_status', '-created_at', '-id'], name='package_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='travelpackage',
+            index=models.Index(condition=models.Q(('is_sponsored', True), ('moderation_status', 'approved')), fields=['sponsorship_start', 'sponsorship_end'], name='package_sponsor_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['traveler', 'status'], name='trip_traveler_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tripitem',
+            index=models.Index(fields=['trip', 'day_number', 'sort_order'], name='tripitem_trip_order_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:06
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, F, Q
+
+
+def fix_constraint_violations(apps, schema_editor):
+    TravelPackage = apps.get_model('main', 'TravelPackage')
+    Review = apps.get_model('main', 'Review')
+
+    # Rows that break the checks added in 0037 would abort that migration, so repair
+    # them here and leave a note for moderators instead.
+    for package in TravelPackage.objects.filter(end_date__lt=F('start_date')):
+        note = (
+            f"End date {package.end_date} was before the start date and has been reset to "
+            f"{package.start_date}; please confirm the schedule."
+        )
+        package.moderation_notes = f"{package.moderation_notes}\n{note}".strip()
+        package.end_date = package.start_date
+        package.duration_days = 1
+        package.save(update_fields=['end_date', 'duration_days', 'moderation_notes'])
+
+    invalid_reviews = Review.objects.filter(Q(rating__lt=1) | Q(rating__gt=5))
+    package_ids = set(invalid_reviews.values_list('package_id', flat=True))
+    invalid_reviews.filter(rating__lt=1).update(rating=1)
+    invalid_reviews.filter(rating__gt=5).update(rating=5)
+
+    # Out-of-range ratings were left out of the denormalized stats; count them now.
+    for package_id in package_ids:
+        histogram = [0] * 5
+        rows = Review.objects.filter(package_id=package_id).order_by().values_list('rating').annotate(count=Count('id'))
+        for rating, count in rows:
+            histogram[rating - 1] = count
+        rating_count = sum(histogram)
+        rating_total = sum(stars * count for stars, count in enumerate(histogram, start=1))
+        TravelPackage.objects.filter(pk=package_id).update(
+            rating_avg=(Decimal(rating_total) / rating_count).quantize(Decimal('0.01')),
+            rating_count=rating_count,
+            rating_histogram=histogram,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0035_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fix_constraint_violations, migrations.RunPython.noop),
+    ]
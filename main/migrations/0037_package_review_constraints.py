@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0036_fix_constraint_violations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.CheckConstraint(condition=models.Q(('rating__gte', 1), ('rating__lte', 5)), name='review_rating_range', violation_error_message='Rating must be between 1 and 5.'),
+        ),
+        migrations.AddConstraint(
+            model_name='travelpackage',
+            constraint=models.CheckConstraint(condition=models.Q(('end_date__gte', models.F('start_date'))), name='package_end_date_after_start', violation_error_message='End date cannot be before the start date.'),
+        ),
+    ]
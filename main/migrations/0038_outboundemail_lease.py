@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0037_package_review_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='leased_until',
+            field=models.DateTimeField(blank=True, help_text='While sending, the time after which another worker may claim the message again.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='outboundemail',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
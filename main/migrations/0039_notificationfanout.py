@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0038_outboundemail_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationFanout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('itinerary_changed', 'Itinerary Changed')], max_length=30)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('leased_until', models.DateTimeField(blank=True, help_text='While sending, the time after which another worker may claim the fan-out again.', null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_fanouts', to='main.travelpackage')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='main_notifi_status_0c3a33_idx')],
+            },
+        ),
+    ]
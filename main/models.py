@@ -3,6 +3,11 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 import datetime
 
+
+def normalize_facet_value(value):
+    """Lowercase and collapse whitespace so 'Pokhara ' and 'pokhara' land in the same facet."""
+    return ' '.join((value or '').lower().split())
+
 # Represents a user's profile, extending the built-in User model with additional information.
 class UserProfile(models.Model):
     DELETION_REQUEST_STATUS_CHOICES = (
@@ -88,6 +93,13 @@ class TravelPackage(models.Model):
         ('pending', 'Pending Review'),
         ('rejected', 'Rejected'),
     )
+    # Source field -> denormalized facet column that save() has to rewrite alongside it.
+    FACET_SOURCE_FIELDS = {
+        'location': 'location_key',
+        'travel_type': 'travel_type_key',
+        'start_date': 'duration_days',
+        'end_date': 'duration_days',
+    }
 
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='packages')
     name = models.CharField(max_length=255)
@@ -108,12 +120,56 @@ class TravelPackage(models.Model):
     moderated_at = models.DateTimeField(blank=True, null=True)
     start_date = models.DateField()
     end_date = models.DateField()
+    # Normalized copies of the catalog facets, kept in step by save() and filtered with exact, indexed lookups.
+    location_key = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    travel_type_key = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    duration_days = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_histogram = models.JSONField(default=list, blank=True, help_text='Review counts for 1 to 5 stars.')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rating_avg', '-id'], name='package_rating_idx'),
+            models.Index(fields=['moderation_status', '-created_at', '-id'], name='package_status_created_idx'),
+            # Only sponsored, listed packages are ever read by sponsorship window.
+            models.Index(
+                fields=['sponsorship_start', 'sponsorship_end'],
+                condition=models.Q(is_sponsored=True, moderation_status='approved'),
+                name='package_sponsor_window_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(end_date__gte=models.F('start_date')),
+                name='package_end_date_after_start',
+                violation_error_message='End date cannot be before the start date.',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+    def refresh_facet_fields(self):
+        self.location_key = normalize_facet_value(self.location)
+        self.travel_type_key = normalize_facet_value(self.travel_type)
+        if self.start_date and self.end_date:
+            self.duration_days = max((self.end_date - self.start_date).days + 1, 0)
+        else:
+            self.duration_days = 0
+
+    def save(self, *args, **kwargs):
+        self.refresh_facet_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            kwargs['update_fields'] = update_fields | {
+                key_field for field, key_field in self.FACET_SOURCE_FIELDS.items() if field in update_fields
+            }
+        super().save(*args, **kwargs)
+
 
 class PackageDay(models.Model):
     package = models.ForeignKey(TravelPackage, on_delete=models.CASCADE, related_name='package_days')
@@ -152,11 +208,36 @@ class PackageDayOption(models.Model):
 
     class Meta:
         ordering = ['sort_order', 'id']
+        indexes = [
+            models.Index(fields=['option_type', 'package_day'], name='packagedayoption_type_idx'),
+        ]
 
     def __str__(self):
         return f"{self.package_day} - {self.title}"
 
 
+# Inverted index entry used by catalog search: one row per (package, token) with a relevance weight.
+class PackageSearchToken(models.Model):
+    package = models.ForeignKey(TravelPackage, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64, db_index=True)
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = [('package', 'token')]
+
+    def __str__(self):
+        return f"{self.token} -> {self.package_id}"
+
+
+class PackageSimilarityVector(models.Model):
+    package = models.OneToOneField(TravelPackage, on_delete=models.CASCADE, related_name='similarity_vector')
+    vector = models.BinaryField(help_text='float32 feature vector used by the in-memory similarity index.')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Similarity vector for {self.package_id}"
+
+
 class CustomItinerary(models.Model):
     STATUS_CHOICES = (
         ('draft', 'Draft'),
@@ -219,6 +300,10 @@ class ChatThread(models.Model):
         null=True,
     )
     is_active = models.BooleanField(default=True)
+    last_message_at = models.DateTimeField(blank=True, null=True)
+    last_message_preview = models.CharField(max_length=160, blank=True)
+    traveler_read_cursor = models.PositiveBigIntegerField(default=0, help_text='ID of the newest message the traveler has seen.')
+    vendor_read_cursor = models.PositiveBigIntegerField(default=0, help_text='ID of the newest message the vendor has seen.')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -230,6 +315,19 @@ class ChatThread(models.Model):
                 name='unique_chat_thread_per_traveler_vendor_package',
             ),
         ]
+        # Inbox listings only ever show active threads, newest activity first.
+        indexes = [
+            models.Index(
+                fields=['vendor', '-updated_at', '-id'],
+                condition=models.Q(is_active=True),
+                name='chatthread_vendor_active_idx',
+            ),
+            models.Index(
+                fields=['traveler', '-updated_at', '-id'],
+                condition=models.Q(is_active=True),
+                name='chatthread_traveler_active_idx',
+            ),
+        ]
 
     def __str__(self):
         if self.package:
@@ -241,11 +339,13 @@ class ChatMessage(models.Model):
     thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_messages')
     message = models.TextField()
-    is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['thread', '-id'], name='chatmessage_thread_id_idx'),
+        ]
 
     def __str__(self):
         return f"Message in thread {self.thread_id} by {self.sender.username}"
@@ -286,6 +386,43 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.title}"
 
+
+# A notification that goes to every traveler on a package, queued for the
+# process_notification_fanouts worker instead of being written in the vendor's request.
+class NotificationFanout(models.Model):
+    KIND_CHOICES = (
+        ('itinerary_changed', 'Itinerary Changed'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    package = models.ForeignKey(TravelPackage, on_delete=models.CASCADE, related_name='notification_fanouts')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    leased_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text='While sending, the time after which another worker may claim the fan-out again.',
+    )
+    sent_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for package {self.package_id}"
+
 # Represents a booking made by a user for a travel package.
 class Booking(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
@@ -324,6 +461,21 @@ class Booking(models.Model):
     cancellation_requested_at = models.DateTimeField(blank=True, null=True)
     cancellation_reviewed_at = models.DateTimeField(blank=True, null=True)
     cancellation_admin_reviewed_at = models.DateTimeField(blank=True, null=True)
+    payment_provider = models.CharField(max_length=20, blank=True)
+    payment_reference = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['payment_provider', 'payment_reference'],
+                condition=~models.Q(payment_reference=''),
+                name='unique_booking_per_payment_reference',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['package', 'status'], name='booking_package_status_idx'),
+            models.Index(fields=['user', '-booking_date'], name='booking_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"Booking for {self.package.name} by {self.user.username}"
@@ -360,6 +512,15 @@ class BookingCapacityRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['package', 'status', '-created_at'], name='capacityrequest_package_idx'),
+            # Checkout looks for an approved request that has not paid for a booking yet.
+            models.Index(
+                fields=['traveler', 'package'],
+                condition=models.Q(status='approved', approved_payment_used_at__isnull=True),
+                name='capacityrequest_unused_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Capacity request for {self.package.name} by {self.traveler.username}"
@@ -373,6 +534,69 @@ class BookingCapacityRequest(models.Model):
         )
 
 
+# Denormalized seat counters per package; rows are locked while checking and reserving capacity.
+class PackageCapacityLedger(models.Model):
+    package = models.OneToOneField(TravelPackage, on_delete=models.CASCADE, related_name='capacity_ledger')
+    booked_travelers = models.PositiveIntegerField(default=0)
+    held_travelers = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Capacity ledger for {self.package.name}"
+
+
+# Seats reserved for a traveler while they are away at Stripe or eSewa checkout.
+class CapacityHold(models.Model):
+    STATUS_CHOICES = (
+        ('active', 'Active'),
+        ('converted', 'Converted To Booking'),
+        ('released', 'Released'),
+        ('expired', 'Expired'),
+    )
+
+    package = models.ForeignKey(TravelPackage, on_delete=models.CASCADE, related_name='capacity_holds')
+    traveler = models.ForeignKey(User, on_delete=models.CASCADE, related_name='capacity_holds')
+    number_of_travelers = models.PositiveIntegerField(default=1)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['package', 'status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"Hold of {self.number_of_travelers} on {self.package.name} for {self.traveler.username}"
+
+
+# Booking counts and revenue per vendor, package, month and status, kept in step with booking status changes.
+class VendorBookingRollup(models.Model):
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='booking_rollups')
+    package = models.ForeignKey(TravelPackage, on_delete=models.CASCADE, related_name='booking_rollups')
+    month = models.DateField()
+    status = models.CharField(max_length=30, choices=Booking.STATUS_CHOICES)
+    booking_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['vendor', 'package', 'month', 'status'],
+                name='unique_vendor_booking_rollup',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['vendor', 'status', 'month']),
+        ]
+
+    def __str__(self):
+        return f"{self.package.name} {self.month:%b %Y} {self.status}"
+
+
 class BookingOperation(models.Model):
     PERMIT_STATUS_CHOICES = (
         ('not_required', 'Not Required'),
@@ -450,11 +674,50 @@ class PaymentLog(models.Model):
 
     class Meta:
         ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='paymentlog_created_idx'),
+            models.Index(fields=['provider', 'status', '-created_at'], name='paymentlog_provider_idx'),
+            models.Index(fields=['status', '-created_at'], name='paymentlog_status_idx'),
+            models.Index(fields=['payment_type', '-created_at'], name='paymentlog_type_idx'),
+            models.Index(fields=['transaction_reference'], name='paymentlog_reference_idx'),
+        ]
 
     def __str__(self):
         return f"{self.provider} {self.payment_type} {self.status}"
 
 
+# Raw provider webhook events, stored as received and drained by the process_payment_events worker.
+class PaymentEvent(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    )
+
+    provider = models.CharField(max_length=20)
+    event_id = models.CharField(max_length=255)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['received_at', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'event_id'], name='unique_payment_event_per_provider'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} {self.event_type} {self.event_id}"
+
+
 class Trip(models.Model):
     STATUS_CHOICES = (
         ('planned', 'Planned'),
@@ -484,6 +747,9 @@ class Trip(models.Model):
 
     class Meta:
         ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['traveler', 'status'], name='trip_traveler_status_idx'),
+        ]
 
     def __str__(self):
         return f"Trip for booking #{self.booking_id}"
@@ -529,6 +795,9 @@ class TripItem(models.Model):
 
     class Meta:
         ordering = ['day_number', 'sort_order', 'id']
+        indexes = [
+            models.Index(fields=['trip', 'day_number', 'sort_order'], name='tripitem_trip_order_idx'),
+        ]
 
     def __str__(self):
         return f"Trip #{self.trip_id} - Day {self.day_number}: {self.title}"
@@ -568,6 +837,18 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_verified = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['package', '-created_at', '-id'], name='review_package_created_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(rating__gte=1, rating__lte=5),
+                name='review_rating_range',
+                violation_error_message='Rating must be between 1 and 5.',
+            ),
+        ]
+
     def __str__(self):
         return f"Review for {self.package.name} by {self.user.username}"
 
@@ -612,3 +893,38 @@ class EmailOTP(models.Model):
 
     def __str__(self):
         return f"{self.email} - {self.otp}"
+
+
+# Outgoing mail written inside the request and delivered later by the send_queued_emails command.
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    leased_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text='While sending, the time after which another worker may claim the message again.',
+    )
+    sent_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to_email}"
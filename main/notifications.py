@@ -1,11 +1,54 @@
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 
 from .models import Notification
 
 
-def create_notification(
+# Cached counts are adjusted in place and recounted from the table once the TTL lapses,
+# so any drift from writes that bypass these helpers heals on its own.
+UNREAD_NOTIFICATION_CACHE_TTL = 15 * 60
+
+
+def _unread_notification_cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_notification_count(user_id):
+    key = _unread_notification_cache_key(user_id)
+    count = cache.get(key)
+    if count is None or count < 0:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(key, count, UNREAD_NOTIFICATION_CACHE_TTL)
+    return count
+
+
+def _adjust_unread_notification_count(user_id, delta):
+    key = _unread_notification_cache_key(user_id)
+    try:
+        if delta > 0:
+            cache.incr(key, delta)
+        else:
+            cache.decr(key, -delta)
+    except ValueError:
+        # Nothing cached yet; the next read counts from the table.
+        pass
+
+
+NOTIFICATION_PAYLOAD_FIELDS = [
+    'title',
+    'message',
+    'notification_type',
+    'target_url',
+    'related_booking',
+    'related_custom_itinerary',
+    'related_thread',
+    'related_trip',
+]
+
+
+def _build_notification_payload(
     *,
-    user,
     title,
     message,
     notification_type,
@@ -14,9 +57,8 @@ def create_notification(
     related_custom_itinerary=None,
     related_thread=None,
     related_trip=None,
-    dedupe_key=None,
 ):
-    payload = {
+    return {
         'title': title,
         'message': message,
         'notification_type': notification_type,
@@ -27,20 +69,103 @@ def create_notification(
         'related_trip': related_trip,
     }
 
+
+def create_notification(
+    *,
+    user,
+    title,
+    message,
+    notification_type,
+    target_url='',
+    related_booking=None,
+    related_custom_itinerary=None,
+    related_thread=None,
+    related_trip=None,
+    dedupe_key=None,
+):
+    payload = _build_notification_payload(
+        title=title,
+        message=message,
+        notification_type=notification_type,
+        target_url=target_url,
+        related_booking=related_booking,
+        related_custom_itinerary=related_custom_itinerary,
+        related_thread=related_thread,
+        related_trip=related_trip,
+    )
+
     if dedupe_key:
         notification, created = Notification.objects.get_or_create(
             dedupe_key=dedupe_key,
             defaults={'user': user, **payload},
         )
-        if not created and notification.user_id == user.id:
+        if created:
+            _adjust_unread_notification_count(user.id, 1)
+        elif notification.user_id == user.id:
+            was_read = notification.is_read
             for field, value in payload.items():
                 setattr(notification, field, value)
             notification.is_read = False
             notification.read_at = None
             notification.save()
+            if was_read:
+                _adjust_unread_notification_count(user.id, 1)
         return notification
 
-    return Notification.objects.create(user=user, **payload)
+    notification = Notification.objects.create(user=user, **payload)
+    _adjust_unread_notification_count(user.id, 1)
+    return notification
+
+
+def create_notifications(entries, batch_size=500):
+    """Create or refresh many notifications in a handful of queries.
+
+    ``entries`` yields ``(user, payload, dedupe_key)`` tuples, where ``payload`` holds the
+    keyword arguments ``create_notification`` takes besides ``user`` and ``dedupe_key``.
+    Dedupe keys behave as in ``create_notification``: an existing notification for the same
+    user is refreshed and marked unread, and one owned by another user is left alone.
+    Returns the number of notifications written.
+    """
+    unkeyed = []
+    keyed = {}
+    for user, payload, dedupe_key in entries:
+        if dedupe_key:
+            keyed[dedupe_key] = (user, _build_notification_payload(**payload))
+        else:
+            unkeyed.append(Notification(user=user, **_build_notification_payload(**payload)))
+
+    existing = Notification.objects.in_bulk(list(keyed), field_name='dedupe_key') if keyed else {}
+    to_create = unkeyed
+    to_update = []
+    for dedupe_key, (user, payload) in keyed.items():
+        notification = existing.get(dedupe_key)
+        if notification is None:
+            to_create.append(Notification(user=user, dedupe_key=dedupe_key, **payload))
+        elif notification.user_id == user.id:
+            for field, value in payload.items():
+                setattr(notification, field, value)
+            notification.is_read = False
+            notification.read_at = None
+            to_update.append(notification)
+
+    if not to_create and not to_update:
+        return 0
+
+    with transaction.atomic():
+        # A key inserted concurrently since the lookup keeps the other writer's row.
+        Notification.objects.bulk_create(to_create, batch_size=batch_size, ignore_conflicts=True)
+        if to_update:
+            Notification.objects.bulk_update(
+                to_update,
+                fields=[*NOTIFICATION_PAYLOAD_FIELDS, 'is_read', 'read_at'],
+                batch_size=batch_size,
+            )
+
+    cache.delete_many([
+        _unread_notification_cache_key(user_id)
+        for user_id in {notification.user_id for notification in to_create + to_update}
+    ])
+    return len(to_create) + len(to_update)
 
 
 def mark_notification_read(notification):
@@ -49,4 +174,14 @@ def mark_notification_read(notification):
     notification.is_read = True
     notification.read_at = timezone.now()
     notification.save(update_fields=['is_read', 'read_at'])
+    _adjust_unread_notification_count(notification.user_id, -1)
     return notification
+
+
+def mark_all_notifications_read_for_user(user):
+    updated = Notification.objects.filter(user=user, is_read=False).update(
+        is_read=True,
+        read_at=timezone.now(),
+    )
+    cache.set(_unread_notification_cache_key(user.id), 0, UNREAD_NOTIFICATION_CACHE_TTL)
+    return updated
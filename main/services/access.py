@@ -50,7 +50,7 @@ def _get_chat_thread_for_user_or_403(user, thread_id):
             'vendor__user_profile',
             'vendor__user_profile__user',
             'package',
-        ).prefetch_related('messages__sender'),
+        ),
         pk=thread_id,
         is_active=True,
     )
@@ -1,9 +1,9 @@
 from django.conf import settings
-from django.core.mail import EmailMessage
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 from ..models import Booking, BookingDispute, TravelPackage, Trip
+from .mailer import queue_email
 
 
 def anonymize_user_account(user):
@@ -53,12 +53,7 @@ def send_account_deleted_email(user, app_name='TravelBooker'):
         "If you did not expect this action, please contact the administrator.\n\n"
         f"Regards,\n{app_name}"
     )
-    EmailMessage(
-        subject,
-        body,
-        getattr(settings, 'DEFAULT_FROM_EMAIL', None),
-        [user.email],
-    ).send()
+    queue_email(subject, body, user.email, from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', None))
 
 
 def get_traveler_deletion_blockers(user):
@@ -0,0 +1,181 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from ..models import Booking, TravelPackage, Trip, VendorBookingRollup
+
+
+REVENUE_BOOKING_STATUSES = ('confirmed', 'trip_completed')
+REFUND_QUEUE_STATUSES = ('cancellation_requested', 'cancellation_reviewed')
+VENDOR_DASHBOARD_CACHE_TTL = 60
+# The revenue chart shows this many calendar months, ending with the current one.
+VENDOR_DASHBOARD_CHART_MONTHS = 12
+
+
+def _vendor_dashboard_cache_key(vendor_id):
+    return f'vendor-dashboard:{vendor_id}'
+
+
+def invalidate_vendor_dashboard(vendor_id):
+    cache.delete(_vendor_dashboard_cache_key(vendor_id))
+
+
+def _rollup_month(booked_at):
+    return timezone.localtime(booked_at).date().replace(day=1)
+
+
+def _shift_month(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _apply_vendor_rollup_delta(*, vendor_id, package_id, month, status, count, revenue):
+    lookup = {'vendor_id': vendor_id, 'package_id': package_id, 'month': month, 'status': status}
+    updated = VendorBookingRollup.objects.filter(**lookup).update(
+        booking_count=F('booking_count') + count,
+        revenue=F('revenue') + revenue,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            VendorBookingRollup.objects.create(booking_count=count, revenue=revenue, **lookup)
+    except IntegrityError:
+        # Another request created the row first; apply the delta on top of theirs.
+        VendorBookingRollup.objects.filter(**lookup).update(
+            booking_count=F('booking_count') + count,
+            revenue=F('revenue') + revenue,
+            updated_at=timezone.now(),
+        )
+
+
+def _sync_vendor_rollup_from_booking(booking, previous_status, previous_total_price=None, previous_package_id=None):
+    if previous_total_price is None:
+        previous_total_price = booking.total_price
+    if previous_package_id is None:
+        previous_package_id = booking.package_id
+    if (
+        previous_status == booking.status and
+        previous_total_price == booking.total_price and
+        previous_package_id == booking.package_id
+    ):
+        return
+
+    vendor_ids = dict(
+        TravelPackage.objects.filter(pk__in={booking.package_id, previous_package_id})
+        .values_list('id', 'vendor_id')
+    )
+    month = _rollup_month(booking.booking_date)
+    if previous_status is not None and previous_package_id in vendor_ids:
+        _apply_vendor_rollup_delta(
+            vendor_id=vendor_ids[previous_package_id],
+            package_id=previous_package_id,
+            month=month,
+            status=previous_status,
+            count=-1,
+            revenue=-Decimal(previous_total_price),
+        )
+    if booking.package_id in vendor_ids:
+        _apply_vendor_rollup_delta(
+            vendor_id=vendor_ids[booking.package_id],
+            package_id=booking.package_id,
+            month=month,
+            status=booking.status,
+            count=1,
+            revenue=Decimal(booking.total_price),
+        )
+    for vendor_id in set(vendor_ids.values()):
+        invalidate_vendor_dashboard(vendor_id)
+
+
+def rebuild_vendor_booking_rollups(vendor_id):
+    """Recompute every rollup row for a vendor from its bookings; returns the rows written."""
+    rows = (
+        Booking.objects.filter(package__vendor_id=vendor_id)
+        .annotate(month=TruncMonth('booking_date', output_field=DateField()))
+        .order_by()
+        .values('package_id', 'month', 'status')
+        .annotate(booking_count=Count('id'), revenue=Sum('total_price'))
+    )
+    rollups = [
+        VendorBookingRollup(
+            vendor_id=vendor_id,
+            package_id=row['package_id'],
+            month=row['month'],
+            status=row['status'],
+            booking_count=row['booking_count'],
+            revenue=row['revenue'] or 0,
+        )
+        for row in rows
+    ]
+
+    with transaction.atomic():
+        VendorBookingRollup.objects.filter(vendor_id=vendor_id).delete()
+        VendorBookingRollup.objects.bulk_create(rollups, batch_size=500)
+    invalidate_vendor_dashboard(vendor_id)
+    return len(rollups)
+
+
+def _build_vendor_dashboard_analytics(vendor_id):
+    rollups = VendorBookingRollup.objects.filter(vendor_id=vendor_id).order_by()
+    revenue_rollups = rollups.filter(status__in=REVENUE_BOOKING_STATUSES)
+
+    totals = revenue_rollups.aggregate(total_revenue=Sum('revenue'), total_bookings=Sum('booking_count'))
+
+    first_month = _shift_month(_rollup_month(timezone.now()), 1 - VENDOR_DASHBOARD_CHART_MONTHS)
+    monthly_rows = (
+        revenue_rollups.filter(month__gte=first_month)
+        .values('month')
+        .annotate(month_revenue=Sum('revenue'))
+        .filter(month_revenue__gt=0)
+        .order_by('month')
+    )
+
+    package_rows = (
+        revenue_rollups.values('package__name')
+        .annotate(count=Sum('booking_count'))
+        .filter(count__gt=0)
+        .order_by('-count')[:5]
+    )
+
+    status_counts = dict(
+        rollups.filter(status__in=('pending', 'in_review', *REFUND_QUEUE_STATUSES))
+        .values('status')
+        .annotate(count=Sum('booking_count'))
+        .values_list('status', 'count')
+    )
+
+    return {
+        'total_revenue': totals['total_revenue'] or 0,
+        'total_bookings_count': totals['total_bookings'] or 0,
+        'monthly_revenue_labels': [row['month'].strftime('%b %Y') for row in monthly_rows],
+        'monthly_revenue_values': [float(row['month_revenue']) for row in monthly_rows],
+        'package_booking_labels': [row['package__name'] for row in package_rows],
+        'package_booking_values': [row['count'] for row in package_rows],
+        'dashboard_queue': {
+            'pending_bookings': status_counts.get('pending', 0),
+            'in_review_bookings': status_counts.get('in_review', 0),
+            'refund_requests': sum(status_counts.get(status, 0) for status in REFUND_QUEUE_STATUSES),
+            'active_trips': Trip.objects.filter(vendor_id=vendor_id).exclude(status__in=['completed', 'cancelled', 'no_show']).count(),
+        },
+    }
+
+
+def get_vendor_dashboard_analytics(vendor_id):
+    """Return the vendor dashboard charts and counters, read from rollups and cached briefly.
+
+    The rollup rows grow with packages and months rather than bookings, so building the
+    payload costs the same for a vendor with ten bookings as for one with a hundred thousand.
+    """
+    cache_key = _vendor_dashboard_cache_key(vendor_id)
+    analytics = cache.get(cache_key)
+    if analytics is None:
+        analytics = _build_vendor_dashboard_analytics(vendor_id)
+        cache.set(cache_key, analytics, VENDOR_DASHBOARD_CACHE_TTL)
+    return analytics
@@ -1 +1,48 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ..models import Booking
+from .access import _safe_int
 from .payments import _calculate_booking_pricing  # noqa: F401
+
+
+def _parse_filter_date(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def _filter_date_range(field_name, date_from=None, date_to=None):
+    # Compare the raw timestamp against local midnights instead of casting it to a date,
+    # so the column's index can still serve the range.
+    lookups = {}
+    if date_from:
+        lookups[f'{field_name}__gte'] = timezone.make_aware(datetime.combine(date_from, time.min))
+    if date_to:
+        lookups[f'{field_name}__lt'] = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+    return lookups
+
+
+def get_vendor_booking_filters(params):
+    status = params.get('status', '')
+    return {
+        'date_from': _parse_filter_date(params.get('date_from')),
+        'date_to': _parse_filter_date(params.get('date_to')),
+        'status': status if status in dict(Booking.STATUS_CHOICES) else '',
+        'package_id': _safe_int(params.get('package'), None, minimum=1),
+    }
+
+
+def filter_vendor_bookings(vendor, *, date_from=None, date_to=None, status='', package_id=None):
+    bookings = Booking.objects.filter(
+        package__vendor=vendor,
+        **_filter_date_range('booking_date', date_from, date_to),
+    )
+    if status:
+        bookings = bookings.filter(status=status)
+    if package_id:
+        bookings = bookings.filter(package_id=package_id)
+    return bookings
@@ -1,27 +1,263 @@
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 
-from ..models import Booking, BookingCapacityRequest
+from ..models import Booking, BookingCapacityRequest, CapacityHold, PackageCapacityLedger, TravelPackage
 
 
 CAPACITY_BOOKING_STATUSES = ['confirmed', 'in_review', 'trip_completed']
+# Stripe Checkout sessions must stay open for at least 30 minutes and are set to expire
+# with the hold, so the hold gets a few minutes of slack on top of that.
+CAPACITY_HOLD_MINUTES = 35
 
 
-def get_package_capacity_summary(package):
-    booked_travelers = (
-        Booking.objects.filter(package=package, status__in=CAPACITY_BOOKING_STATUSES)
+class CapacityUnavailableError(ValueError):
+    """Raised when a payment arrives after its hold lapsed and the seats were taken."""
+
+
+def _build_capacity_summary(max_travelers, booked_travelers, held_travelers=0):
+    return {
+        'max_travelers': max_travelers,
+        'booked_travelers': booked_travelers,
+        'held_travelers': held_travelers,
+        'remaining_capacity': max(max_travelers - booked_travelers - held_travelers, 0),
+    }
+
+
+def _count_booked_travelers(package_id):
+    return (
+        Booking.objects.filter(package_id=package_id, status__in=CAPACITY_BOOKING_STATUSES)
         .aggregate(total=Sum('number_of_travelers'))
         .get('total')
         or 0
     )
-    remaining_capacity = max(package.max_travelers - booked_travelers, 0)
+
+
+def _count_held_travelers(package_id):
+    return (
+        CapacityHold.objects.filter(package_id=package_id, status='active', expires_at__gt=timezone.now())
+        .aggregate(total=Sum('number_of_travelers'))
+        .get('total')
+        or 0
+    )
+
+
+def _get_or_create_capacity_ledger(package_id):
+    # A missing ledger is seeded from the bookings table, so callers must not apply a delta
+    # for a booking change that was already saved when the ledger gets created. The defaults
+    # are callables so the seeding aggregates only run when the ledger is actually missing.
+    return PackageCapacityLedger.objects.get_or_create(
+        package_id=package_id,
+        defaults={
+            'booked_travelers': lambda: _count_booked_travelers(package_id),
+            'held_travelers': lambda: _count_held_travelers(package_id),
+        },
+    )
+
+
+def _lock_capacity_ledger(package_id):
+    _get_or_create_capacity_ledger(package_id)
+    return PackageCapacityLedger.objects.select_for_update().get(package_id=package_id)
+
+
+def _release_expired_capacity_holds(ledger):
+    expired_holds = CapacityHold.objects.filter(
+        package_id=ledger.package_id,
+        status='active',
+        expires_at__lte=timezone.now(),
+    )
+    expired_total = expired_holds.aggregate(total=Sum('number_of_travelers')).get('total') or 0
+    if expired_total:
+        expired_holds.update(status='expired', updated_at=timezone.now())
+        ledger.held_travelers = max(ledger.held_travelers - expired_total, 0)
+        ledger.save(update_fields=['held_travelers', 'updated_at'])
+
+
+def get_package_capacity_summary(package):
+    ledger, _ = _get_or_create_capacity_ledger(package.id)
+    held_travelers = ledger.held_travelers
+    if held_travelers:
+        # Lapsed holds stay on the ledger until a checkout releases them under the row lock;
+        # reads leave them out with a plain count instead of taking that lock.
+        held_travelers = _count_held_travelers(package.id)
+    return _build_capacity_summary(package.max_travelers, ledger.booked_travelers, held_travelers)
+
+
+def _sync_capacity_ledger_from_booking(booking, previous_status, previous_travelers=None):
+    if previous_travelers is None:
+        previous_travelers = booking.number_of_travelers
+    previous_total = previous_travelers if previous_status in CAPACITY_BOOKING_STATUSES else 0
+    current_total = booking.number_of_travelers if booking.status in CAPACITY_BOOKING_STATUSES else 0
+    delta = current_total - previous_total
+    if not delta:
+        return
+
+    _, created = _get_or_create_capacity_ledger(booking.package_id)
+    if created:
+        return
+
+    PackageCapacityLedger.objects.filter(package_id=booking.package_id).update(
+        booked_travelers=Greatest(F('booked_travelers') + delta, Value(0)),
+        updated_at=timezone.now(),
+    )
+
+
+def reserve_package_capacity(*, traveler, package, number_of_travelers, allow_overbooking=False):
+    """Hold seats for a traveler heading to checkout, or return ``None`` if the package is full.
+
+    The ledger row is locked for the duration of the check, so concurrent checkouts
+    for the same package are serialized and cannot both claim the last seats.
+    """
+    with transaction.atomic():
+        ledger = _lock_capacity_ledger(package.id)
+        _release_expired_capacity_holds(ledger)
+
+        remaining = package.max_travelers - ledger.booked_travelers - ledger.held_travelers
+        if number_of_travelers > remaining and not allow_overbooking:
+            return None
+
+        hold = CapacityHold.objects.create(
+            package=package,
+            traveler=traveler,
+            number_of_travelers=number_of_travelers,
+            expires_at=timezone.now() + timezone.timedelta(minutes=CAPACITY_HOLD_MINUTES),
+        )
+        ledger.held_travelers = F('held_travelers') + number_of_travelers
+        ledger.save(update_fields=['held_travelers', 'updated_at'])
+        return hold
+
+
+def _close_capacity_hold(hold_id, new_status):
+    if not hold_id:
+        return None
+
+    with transaction.atomic():
+        hold = CapacityHold.objects.select_for_update().filter(pk=hold_id).first()
+        if not hold or hold.status != 'active':
+            return hold
+
+        ledger = _lock_capacity_ledger(hold.package_id)
+        hold.status = new_status
+        hold.save(update_fields=['status', 'updated_at'])
+        ledger.held_travelers = max(ledger.held_travelers - hold.number_of_travelers, 0)
+        ledger.save(update_fields=['held_travelers', 'updated_at'])
+        return hold
+
+
+def convert_capacity_hold(hold_id):
+    return _close_capacity_hold(hold_id, 'converted')
+
+
+def release_capacity_hold(hold_id):
+    return _close_capacity_hold(hold_id, 'released')
+
+
+def claim_checkout_capacity(hold_id, *, package, number_of_travelers, allow_overbooking=False):
+    """Turn a checkout's hold into booked seats, re-checking capacity if the hold is gone.
+
+    Must run inside the transaction that writes the booking: the ledger stays locked until
+    the booking's own ledger update commits. Raises ``CapacityUnavailableError`` when the
+    hold expired or was released and the package no longer has room for the group.
+    """
+    hold = CapacityHold.objects.select_for_update().filter(pk=hold_id).first() if hold_id else None
+    ledger = _lock_capacity_ledger(package.id)
+    if hold is not None and hold.status == 'active':
+        hold.status = 'converted'
+        hold.save(update_fields=['status', 'updated_at'])
+        ledger.held_travelers = max(ledger.held_travelers - hold.number_of_travelers, 0)
+        ledger.save(update_fields=['held_travelers', 'updated_at'])
+        return hold
+
+    _release_expired_capacity_holds(ledger)
+    remaining = package.max_travelers - ledger.booked_travelers - ledger.held_travelers
+    if number_of_travelers > remaining and not allow_overbooking:
+        raise CapacityUnavailableError(f'{package.name} no longer has room for {number_of_travelers} travelers.')
+    return hold
+
+
+def rebuild_capacity_ledger(package_id):
+    with transaction.atomic():
+        ledger = _lock_capacity_ledger(package_id)
+        _release_expired_capacity_holds(ledger)
+        ledger.booked_travelers = _count_booked_travelers(package_id)
+        ledger.held_travelers = _count_held_travelers(package_id)
+        ledger.save(update_fields=['booked_travelers', 'held_travelers', 'updated_at'])
+        return ledger
+
+
+def get_package_capacity_summaries(packages):
+    """Return ``{package_id: capacity summary}`` for many packages in one query.
+
+    Accepts a ``TravelPackage`` queryset, an iterable of package instances, or an
+    iterable of package ids.
+    """
+    if not hasattr(packages, 'model'):
+        packages = list(packages)
+        if not packages:
+            return {}
+        if isinstance(packages[0], TravelPackage):
+            packages = [package.id for package in packages]
+        packages = TravelPackage.objects.filter(id__in=packages)
+
+    rows = annotate_package_capacity(packages).values_list(
+        'id', 'max_travelers', 'booked_travelers', 'held_travelers',
+    )
     return {
-        'max_travelers': package.max_travelers,
-        'booked_travelers': booked_travelers,
-        'remaining_capacity': remaining_capacity,
+        package_id: _build_capacity_summary(max_travelers, booked_travelers, held_travelers)
+        for package_id, max_travelers, booked_travelers, held_travelers in rows
     }
 
 
+def attach_package_capacity(packages):
+    """Set ``booked_travelers``, ``held_travelers`` and ``remaining_capacity`` on each package in one query."""
+    packages = list(packages)
+    pending = [package for package in packages if not hasattr(package, 'remaining_capacity')]
+    summaries = get_package_capacity_summaries(pending)
+    for package in pending:
+        summary = summaries[package.id]
+        package.booked_travelers = summary['booked_travelers']
+        package.held_travelers = summary['held_travelers']
+        package.remaining_capacity = summary['remaining_capacity']
+    return packages
+
+
+def annotate_package_capacity(queryset):
+    """Annotate ``booked_travelers``, ``held_travelers`` and ``remaining_capacity`` onto a ``TravelPackage`` queryset.
+
+    Booked seats come from the capacity ledger, falling back to the bookings table for
+    packages whose ledger has not been created yet, and live holds are subtracted the
+    same way ``get_package_capacity_summary`` does.
+    """
+    ledger_booked = PackageCapacityLedger.objects.filter(package=OuterRef('pk')).values('booked_travelers')
+    booked_travelers = (
+        Booking.objects.filter(package=OuterRef('pk'), status__in=CAPACITY_BOOKING_STATUSES)
+        .values('package')
+        .annotate(total=Sum('number_of_travelers'))
+        .values('total')
+    )
+    held_travelers = (
+        CapacityHold.objects.filter(package=OuterRef('pk'), status='active', expires_at__gt=timezone.now())
+        .values('package')
+        .annotate(total=Sum('number_of_travelers'))
+        .values('total')
+    )
+    return queryset.annotate(
+        booked_travelers=Coalesce(
+            Subquery(ledger_booked, output_field=IntegerField()),
+            Subquery(booked_travelers, output_field=IntegerField()),
+            Value(0),
+        ),
+        held_travelers=Coalesce(Subquery(held_travelers, output_field=IntegerField()), Value(0)),
+    ).annotate(
+        remaining_capacity=Greatest(
+            F('max_travelers') - F('booked_travelers') - F('held_travelers'),
+            Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+
+
 def get_matching_approved_capacity_request(*, traveler, package, adult_count, child_count, child_under_seven_count):
     return (
         BookingCapacityRequest.objects.filter(
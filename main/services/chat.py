@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import ChatMessage, ChatThread
+
+
+CHAT_MESSAGES_PER_PAGE = 30
+CHAT_PREVIEW_LENGTH = 160
+CHAT_FEED_TIMEOUT = 25
+CHAT_FEED_POLL_INTERVAL = 0.5
+# Short enough that a waiter in another process, with a per-process cache, still falls
+# back to the database within a couple of seconds.
+CHAT_FEED_CACHE_TTL = 2
+
+
+def _chat_thread_latest_key(thread_id):
+    return f'chat-thread-latest:{thread_id}'
+
+
+def _build_message_preview(text):
+    text = ' '.join(text.split())
+    if len(text) <= CHAT_PREVIEW_LENGTH:
+        return text
+    return text[:CHAT_PREVIEW_LENGTH - 1].rstrip() + '…'
+
+
+def _read_cursor_field(thread, user):
+    return 'traveler_read_cursor' if thread.traveler_id == user.id else 'vendor_read_cursor'
+
+
+def annotate_thread_summaries(threads, user):
+    """Attach the latest sender and unread count to each thread with correlated subqueries.
+
+    The preview text and timestamp come from the denormalized ``last_message_*`` columns,
+    and unread messages are those past the user's read cursor, counted over the
+    ``(thread, id)`` index, so listing threads never loads message rows.
+    """
+    threads = threads.annotate(
+        read_cursor=Case(
+            When(traveler=user, then=F('traveler_read_cursor')),
+            default=F('vendor_read_cursor'),
+        ),
+    )
+    latest_messages = ChatMessage.objects.filter(thread=OuterRef('pk')).order_by('-id')
+    unread_messages = (
+        ChatMessage.objects.filter(thread=OuterRef('pk'), id__gt=OuterRef('read_cursor'))
+        .exclude(sender=user)
+        .order_by()
+        .values('thread')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    return threads.annotate(
+        last_message_sender=Subquery(latest_messages.values('sender__username')[:1]),
+        unread_count=Coalesce(Subquery(unread_messages, output_field=IntegerField()), Value(0)),
+    )
+
+
+def get_unread_chat_total(user):
+    """Count messages past the user's read cursor across all of their active threads."""
+    return (
+        ChatMessage.objects.filter(thread__is_active=True)
+        .filter(
+            Q(thread__traveler=user, id__gt=F('thread__traveler_read_cursor')) |
+            Q(thread__vendor__user_profile__user=user, id__gt=F('thread__vendor_read_cursor'))
+        )
+        .exclude(sender=user)
+        .count()
+    )
+
+
+def mark_chat_thread_read(thread, user, message_id):
+    """Move the user's read cursor forward to ``message_id`` with a single UPDATE."""
+    field = _read_cursor_field(thread, user)
+    return ChatThread.objects.filter(pk=thread.pk, **{f'{field}__lt': message_id}).update(**{field: message_id})
+
+
+def record_chat_message(thread, sender, text):
+    """Store a message and refresh the thread's preview and the sender's read cursor in one UPDATE."""
+    with transaction.atomic():
+        message = ChatMessage.objects.create(thread=thread, sender=sender, message=text)
+        ChatThread.objects.filter(pk=thread.pk).update(
+            last_message_at=message.created_at,
+            last_message_preview=_build_message_preview(text),
+            updated_at=timezone.now(),
+            **{_read_cursor_field(thread, sender): message.id},
+        )
+    cache.set(_chat_thread_latest_key(thread.pk), message.id, CHAT_FEED_CACHE_TTL)
+    return message
+
+
+def get_chat_message_page(thread, before_id=None, per_page=CHAT_MESSAGES_PER_PAGE):
+    """Return the newest ``per_page`` messages older than ``before_id``, oldest first.
+
+    Reads one indexed ``(thread, id)`` range per page, so a thread with ten thousand
+    messages costs the same to open as one with ten.
+    """
+    messages_qs = ChatMessage.objects.filter(thread=thread).select_related('sender')
+    if before_id is not None:
+        messages_qs = messages_qs.filter(id__lt=before_id)
+
+    rows = list(messages_qs.order_by('-id')[:per_page + 1])
+    has_older = len(rows) > per_page
+    rows = rows[:per_page]
+    rows.reverse()
+    return {
+        'messages': rows,
+        'has_older': has_older,
+        'older_cursor': rows[0].id if rows and has_older else None,
+    }
+
+
+def serialize_chat_message(message):
+    return {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'sender': message.sender.username,
+        'message': message.message,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+async def _get_latest_message_id(thread_id):
+    latest_id = await cache.aget(_chat_thread_latest_key(thread_id))
+    if latest_id is None:
+        latest_id = await (
+            ChatMessage.objects.filter(thread_id=thread_id)
+            .order_by('-id')
+            .values_list('id', flat=True)
+            .afirst()
+        ) or 0
+        await cache.aset(_chat_thread_latest_key(thread_id), latest_id, CHAT_FEED_CACHE_TTL)
+    return latest_id
+
+
+async def wait_for_chat_messages(thread_id, after_id, timeout=CHAT_FEED_TIMEOUT):
+    """Return messages in a thread newer than ``after_id``, waiting up to ``timeout`` seconds.
+
+    While nothing is new the wait only reads the thread's latest-message ID from the cache
+    between ``asyncio.sleep`` calls, so an idle client holds no worker thread and no
+    database connection; messages are read from the database once something arrives.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if await _get_latest_message_id(thread_id) > after_id:
+            return [
+                message
+                async for message in ChatMessage.objects.filter(thread_id=thread_id, id__gt=after_id)
+                .select_related('sender')
+                .order_by('id')[:CHAT_MESSAGES_PER_PAGE]
+            ]
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return []
+        await asyncio.sleep(min(CHAT_FEED_POLL_INTERVAL, remaining))
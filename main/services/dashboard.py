@@ -1,81 +1,64 @@
 from django.utils import timezone
 
-from ..models import Notification, Trip
-from .trips import (
-    _build_trip_next_action,
-    _build_trip_progress_summary,
-    _build_trip_timeline_items,
-)
+from ..models import Trip
+from ..notifications import get_unread_notification_count
+from .trips import _build_trip_timeline_summaries
 
 
-def _build_traveler_dashboard_summary(user):
-    active_trips = list(
-        Trip.objects.filter(traveler=user)
-        .exclude(status__in=['completed', 'cancelled', 'no_show'])
-        .only('id', 'start_date')
-    )
-    unread_notifications = Notification.objects.filter(user=user, is_read=False).count()
+INACTIVE_TRIP_STATUSES = ['completed', 'cancelled', 'no_show']
+NEXT_ACTION_PRIORITY = {
+    'blocked': 0,
+    'ready': 1,
+    'in_progress': 2,
+    'pending': 3,
+}
 
-    pending_actions = 0
-    upcoming_items = 0
-    today = timezone.now().date()
-
-    for trip in active_trips:
-        current_day_number = None
-        if trip.start_date:
-            current_day_number = max(1, (today - trip.start_date).days + 1)
 
-        trip_items = (
-            trip.items.only('day_number', 'status')
-            .exclude(status__in=['completed', 'cancelled'])
-            .all()
-        )
-        for item in trip_items:
-            is_upcoming = current_day_number is not None and item.day_number > current_day_number
-            if is_upcoming:
-                upcoming_items += 1
-            elif item.status in {'ready', 'in_progress', 'blocked', 'pending'}:
-                pending_actions += 1
+def _get_trip_lifecycle(trip, today):
+    if trip.status == 'in_progress':
+        return 0, 'Live Now'
+    if trip.start_date and trip.start_date <= today:
+        return 1, 'Current Trip'
+    if trip.status == 'ready':
+        return 2, 'Ready Soon'
+    return 3, 'Upcoming'
 
-    return {
-        'active_trips': len(active_trips),
-        'unread_notifications': unread_notifications,
-        'pending_actions': pending_actions,
-        'upcoming_items': upcoming_items,
-    }
 
+def _build_traveler_dashboard(user, trip_card_limit=1, next_action_limit=6):
+    """Build the summary, trip cards and next actions for ``user`` from one shared read.
 
-def _build_dashboard_trip_cards(user, limit=4):
+    Active trips and their timeline summaries are loaded with a fixed number of queries
+    regardless of how many trips the traveler has; the three dashboard widgets are
+    derived from that result.
+    """
     today = timezone.now().date()
     trips = list(
         Trip.objects.filter(traveler=user)
-        .exclude(status__in=['completed', 'cancelled', 'no_show'])
+        .exclude(status__in=INACTIVE_TRIP_STATUSES)
         .select_related('booking', 'package', 'vendor')
     )
+    timeline_summaries = _build_trip_timeline_summaries(trips)
 
+    pending_actions = 0
+    upcoming_items = 0
     cards = []
     for trip in trips:
-        timeline_items = _build_trip_timeline_items(trip)
-        progress_summary = _build_trip_progress_summary(trip)
-        next_action = _build_trip_next_action(timeline_items)
-
-        if trip.status == 'in_progress':
-            lifecycle_sort = 0
-            lifecycle_label = 'Live Now'
-        elif trip.start_date and trip.start_date <= today:
-            lifecycle_sort = 1
-            lifecycle_label = 'Current Trip'
-        elif trip.status == 'ready':
-            lifecycle_sort = 2
-            lifecycle_label = 'Ready Soon'
-        else:
-            lifecycle_sort = 3
-            lifecycle_label = 'Upcoming'
+        timeline_summary = timeline_summaries[trip.id]
 
+        current_day_number = None
+        if trip.start_date:
+            current_day_number = max(1, (today - trip.start_date).days + 1)
+        for item in timeline_summary['open_items']:
+            if current_day_number is not None and item['day_number'] > current_day_number:
+                upcoming_items += 1
+            else:
+                pending_actions += 1
+
+        lifecycle_sort, lifecycle_label = _get_trip_lifecycle(trip, today)
         cards.append({
             'trip': trip,
-            'progress_summary': progress_summary,
-            'next_action': next_action,
+            'progress_summary': timeline_summary['progress_summary'],
+            'next_action': timeline_summary['next_action'],
             'lifecycle_label': lifecycle_label,
             'lifecycle_sort': lifecycle_sort,
         })
@@ -87,25 +70,13 @@ def _build_dashboard_trip_cards(user, limit=4):
             entry['trip'].created_at,
         )
     )
-    return cards[:limit]
-
 
-def _build_dashboard_next_actions(user, limit=6):
-    trip_cards = _build_dashboard_trip_cards(user, limit=20)
     action_cards = []
-
-    for card in trip_cards:
+    for card in cards:
         next_action = card['next_action']
         if not next_action:
             continue
 
-        action_priority = {
-            'blocked': 0,
-            'ready': 1,
-            'in_progress': 2,
-            'pending': 3,
-        }.get(next_action['status_key'], 4)
-
         action_cards.append({
             'trip': card['trip'],
             'package': card['trip'].package,
@@ -119,7 +90,7 @@ def _build_dashboard_next_actions(user, limit=6):
             'action_link': next_action['action_link'],
             'action_label': next_action['action_label'],
             'description': next_action['description'],
-            'action_priority': action_priority,
+            'action_priority': NEXT_ACTION_PRIORITY.get(next_action['status_key'], 4),
         })
 
     action_cards.sort(
@@ -129,5 +100,14 @@ def _build_dashboard_next_actions(user, limit=6):
             entry['day_number'],
         )
     )
-    return action_cards[:limit]
 
+    return {
+        'summary': {
+            'active_trips': len(trips),
+            'unread_notifications': get_unread_notification_count(user.id),
+            'pending_actions': pending_actions,
+            'upcoming_items': upcoming_items,
+        },
+        'trip_cards': cards[:trip_card_limit],
+        'next_actions': action_cards[:next_action_limit],
+    }
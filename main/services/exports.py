@@ -0,0 +1,77 @@
+import csv
+
+from django.db.models import Prefetch
+
+from ..models import CustomItinerarySelection
+
+
+BOOKING_EXPORT_CHUNK_SIZE = 2000
+BOOKING_EXPORT_HEADER = [
+    'Booking ID',
+    'Booking Date',
+    'Status',
+    'Traveler',
+    'Traveler Email',
+    'Package',
+    'Travelers',
+    'Total Price',
+    'Day',
+    'Option Type',
+    'Option',
+    'Option Price',
+]
+
+
+class _Echo:
+    # csv.writer only needs write(); hand each encoded line straight back to the generator.
+    def write(self, value):
+        return value
+
+
+def iter_booking_export_rows(bookings, chunk_size=BOOKING_EXPORT_CHUNK_SIZE):
+    """Yield CSV rows for ``bookings``, one per itinerary selection or one per plain booking.
+
+    Bookings are read with ``iterator(chunk_size=...)`` and selections are prefetched per
+    chunk, so only one chunk of bookings is ever held in memory.
+    """
+    bookings = (
+        bookings.select_related('user', 'package')
+        .prefetch_related(
+            Prefetch(
+                'custom_itinerary__selections',
+                queryset=CustomItinerarySelection.objects.select_related('package_day', 'selected_option'),
+            )
+        )
+        .order_by('booking_date', 'id')
+    )
+
+    for booking in bookings.iterator(chunk_size=chunk_size):
+        booking_columns = [
+            booking.id,
+            booking.booking_date.strftime('%Y-%m-%d %H:%M'),
+            booking.get_status_display(),
+            booking.user.username,
+            booking.user.email,
+            booking.package.name,
+            booking.number_of_travelers,
+            booking.total_price,
+        ]
+        selections = booking.custom_itinerary.selections.all() if booking.custom_itinerary_id else []
+        if not selections:
+            yield booking_columns + ['', 'Default Package', 'No customization', booking.total_price]
+            continue
+
+        for selection in selections:
+            yield booking_columns + [
+                selection.package_day.day_number,
+                selection.selected_option.get_option_type_display(),
+                selection.selected_option.title,
+                selection.selected_price,
+            ]
+
+
+def stream_booking_export_csv(bookings, chunk_size=BOOKING_EXPORT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(BOOKING_EXPORT_HEADER)
+    for row in iter_booking_export_rows(bookings, chunk_size=chunk_size):
+        yield writer.writerow(row)
@@ -0,0 +1,144 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Min, Value, When
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from ..filters import (
+    PACKAGE_DEPARTURE_WINDOWS,
+    PACKAGE_DURATION_BUCKETS,
+    PACKAGE_PRICE_BUCKETS,
+    TravelPackageFilter,
+    build_bucket_q,
+)
+from ..models import PackageDayOption, TravelPackage
+
+
+PACKAGE_FACET_CACHE_TTL = 10 * 60
+PACKAGE_FACET_VALUE_LIMIT = 12
+
+_PACKAGE_FACET_VERSION_KEY = 'package-facets-version'
+
+
+def get_package_facet_version():
+    version = cache.get(_PACKAGE_FACET_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.set(_PACKAGE_FACET_VERSION_KEY, version, None)
+    return version
+
+
+def bump_package_facet_version():
+    cache.set(_PACKAGE_FACET_VERSION_KEY, time.time_ns(), None)
+
+
+def _catalog_queryset():
+    return TravelPackage.objects.filter(moderation_status='approved').order_by()
+
+
+def _filtered_catalog(filter_data, exclude):
+    # Each facet is counted with every other selected filter applied but not its own, so
+    # picking "Pokhara" still shows how many packages the other destinations would give.
+    data = {name: value for name, value in filter_data.items() if name != exclude}
+    return TravelPackageFilter(data, queryset=_catalog_queryset()).qs
+
+
+def _bucket_case(field_name, buckets, offset=None):
+    return Case(
+        *[When(build_bucket_q(field_name, bucket, offset), then=Value(bucket[0])) for bucket in buckets],
+        default=Value(None),
+        output_field=CharField(),
+    )
+
+
+def _count_key_facet(queryset, key_field, label_field):
+    rows = (
+        queryset.exclude(**{key_field: ''})
+        .values(key_field)
+        .annotate(label=Min(label_field), count=Count('id'))
+        .order_by('-count', key_field)[:PACKAGE_FACET_VALUE_LIMIT]
+    )
+    return [{'value': row[key_field], 'label': row['label'], 'count': row['count']} for row in rows]
+
+
+def _count_bucket_facet(queryset, field_name, buckets, offset=None):
+    counts = dict(
+        queryset.annotate(bucket=_bucket_case(field_name, buckets, offset))
+        .exclude(bucket=None)
+        .values('bucket')
+        .annotate(count=Count('id'))
+        .values_list('bucket', 'count')
+    )
+    return [
+        {'value': value, 'label': label, 'count': counts[value]}
+        for value, label, _, _ in buckets
+        if counts.get(value)
+    ]
+
+
+def _count_option_type_facet(queryset):
+    counts = dict(
+        PackageDayOption.objects.filter(package_day__package__in=queryset.values('pk'))
+        .order_by()
+        .values('option_type')
+        .annotate(count=Count('package_day__package', distinct=True))
+        .values_list('option_type', 'count')
+    )
+    return [
+        {'value': value, 'label': label, 'count': counts[value]}
+        for value, label in PackageDayOption.OPTION_TYPE_CHOICES
+        if counts.get(value)
+    ]
+
+
+def _build_package_facets(filter_data, today):
+    counters = {
+        'location': lambda qs: _count_key_facet(qs, 'location_key', 'location'),
+        'travel_type': lambda qs: _count_key_facet(qs, 'travel_type_key', 'travel_type'),
+        'price_bucket': lambda qs: _count_bucket_facet(qs, 'price', PACKAGE_PRICE_BUCKETS),
+        'duration': lambda qs: _count_bucket_facet(qs, 'duration_days', PACKAGE_DURATION_BUCKETS),
+        'departure': lambda qs: _count_bucket_facet(qs, 'start_date', PACKAGE_DEPARTURE_WINDOWS, offset=today),
+        'option_type': _count_option_type_facet,
+    }
+    return [
+        {
+            'name': name,
+            'label': TravelPackageFilter.base_filters[name].label,
+            'values': counter(_filtered_catalog(filter_data, exclude=name)),
+        }
+        for name, counter in counters.items()
+    ]
+
+
+def _package_facet_cache_key(filterset, today):
+    selected = sorted(
+        (name, str(value))
+        for name, value in filterset.form.cleaned_data.items()
+        if value not in (None, '')
+    )
+    digest = hashlib.md5(urlencode(selected).encode('utf-8')).hexdigest()
+    return f'package-facets:{get_package_facet_version()}:{today.isoformat()}:{digest}'
+
+
+def get_package_facets(filterset):
+    """Return facet counts for the approved catalog under ``filterset``'s current selection.
+
+    Every facet is one grouped query, counted with the other selected filters applied.
+    Results are cached per filter combination (as cleaned by the form) and per day, since
+    departure windows move with the date; package changes bump the shared version.
+    """
+    today = timezone.localdate()
+    filterset.is_valid()
+    cache_key = _package_facet_cache_key(filterset, today)
+    facets = cache.get(cache_key)
+    if facets is None:
+        filter_data = {
+            name: value
+            for name, value in filterset.data.items()
+            if name in TravelPackageFilter.base_filters and name in filterset.form.cleaned_data
+        }
+        facets = _build_package_facets(filter_data, today)
+        cache.set(cache_key, facets, PACKAGE_FACET_CACHE_TTL)
+    return facets
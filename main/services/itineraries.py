@@ -1,4 +1,10 @@
-from ..models import PackageDay
+from django.db.models import Prefetch
+
+from ..models import CustomItinerarySelection, PackageDay
+from .package_detail import bump_package_detail_version
+
+
+BOOKING_SELECTION_ORDERING = ('package_day__day_number', 'package_day__sort_order', 'id')
 
 
 def _sync_package_itinerary_json(package):
@@ -14,6 +20,7 @@ def _sync_package_itinerary_json(package):
         for package_day in package_days
     ]
     package.save(update_fields=['itinerary', 'updated_at'])
+    bump_package_detail_version(package.id)
 
 
 def _build_selected_options_summary(selected_options):
@@ -62,15 +69,25 @@ def _build_group_title(items, action_link):
     return 'Selections'
 
 
-def _build_booking_selection_items(custom_itinerary):
+def _prefetch_booking_selections(lookup='custom_itinerary__selections'):
+    # Lets list views pass `selections=...selections.all()` without a query per booking.
+    return Prefetch(
+        lookup,
+        queryset=CustomItinerarySelection.objects.select_related('package_day', 'selected_option')
+        .order_by(*BOOKING_SELECTION_ORDERING),
+    )
+
+
+def _build_booking_selection_items(custom_itinerary, selections=None):
     if not custom_itinerary:
         return []
 
-    selections = (
-        custom_itinerary.selections.select_related('package_day', 'selected_option')
-        .all()
-        .order_by('package_day__day_number', 'package_day__sort_order', 'id')
-    )
+    if selections is None:
+        selections = (
+            custom_itinerary.selections.select_related('package_day', 'selected_option')
+            .all()
+            .order_by(*BOOKING_SELECTION_ORDERING)
+        )
 
     return [
         {
@@ -0,0 +1,112 @@
+import logging
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+EMAIL_MAX_ATTEMPTS = 6
+EMAIL_RETRY_BASE_SECONDS = 30
+# How long a claimed batch belongs to one worker; a worker that dies mid-batch leaves its
+# messages to be picked up again once this runs out.
+EMAIL_SEND_LEASE_SECONDS = 10 * 60
+
+
+def queue_email(subject, body, recipient, from_email=None):
+    """Store an email for the send_queued_emails worker instead of talking to SMTP in the request."""
+    if not recipient:
+        return None
+    return OutboundEmail.objects.create(
+        to_email=recipient,
+        from_email=from_email or '',
+        subject=subject,
+        body=body,
+    )
+
+
+def _schedule_retry(email, error):
+    email.attempts += 1
+    email.last_error = str(error)[:2000]
+    email.leased_until = None
+    if email.attempts >= EMAIL_MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = timezone.now() + timezone.timedelta(
+            seconds=EMAIL_RETRY_BASE_SECONDS * 2 ** (email.attempts - 1)
+        )
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at', 'leased_until'])
+
+
+def _claim_queued_emails(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        # Locked rows are skipped, so parallel senders never claim the same message.
+        email_ids = list(
+            OutboundEmail.objects.filter(
+                Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', leased_until__lte=now)
+            )
+            .select_for_update(skip_locked=True)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=email_ids).update(
+            status='sending',
+            leased_until=now + timezone.timedelta(seconds=EMAIL_SEND_LEASE_SECONDS),
+        )
+    return list(OutboundEmail.objects.filter(pk__in=email_ids).order_by('next_attempt_at', 'id'))
+
+
+def send_queued_emails(batch_size=100, connection=None):
+    """Deliver up to ``batch_size`` due emails over one SMTP connection; returns ``(sent, failed)``.
+
+    The batch is claimed in a short transaction and sent outside it, so no row lock is
+    held while the relay is slow. A message that the relay rejects is retried with
+    exponential backoff until it reaches ``EMAIL_MAX_ATTEMPTS``. If the connection itself
+    cannot be opened, the whole batch is rescheduled.
+    """
+    emails = _claim_queued_emails(batch_size)
+    if not emails:
+        return 0, 0
+
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning("Could not open the email connection: %s", exc)
+        for email in emails:
+            _schedule_retry(email, exc)
+        return 0, len(emails)
+
+    sent = failed = 0
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject,
+                email.body,
+                email.from_email or None,
+                [email.to_email],
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as exc:
+                logger.warning("Email %s to %s was not delivered: %s", email.id, email.to_email, exc)
+                _schedule_retry(email, exc)
+                failed += 1
+                continue
+
+            OutboundEmail.objects.filter(pk=email.pk).update(
+                status='sent',
+                attempts=F('attempts') + 1,
+                leased_until=None,
+                sent_at=timezone.now(),
+            )
+            sent += 1
+    finally:
+        connection.close()
+    return sent, failed
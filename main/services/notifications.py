@@ -1,11 +1,23 @@
+import logging
+
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import F, Q
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils import timezone
 
-from ..models import CustomItinerary, TravelPackage
-from ..notifications import create_notification
+from ..models import Booking, CustomItinerary, NotificationFanout, TravelPackage
+from ..notifications import create_notification, create_notifications
 from .access import _get_vendor_or_403, _get_vendor_user
 
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_FANOUT_MAX_ATTEMPTS = 6
+NOTIFICATION_FANOUT_RETRY_BASE_SECONDS = 30
+# How long a claimed fan-out belongs to one worker before another may pick it up again.
+NOTIFICATION_FANOUT_LEASE_SECONDS = 10 * 60
+
 
 def _notify_custom_itinerary_saved(custom_itinerary):
     create_notification(
@@ -25,29 +37,146 @@ def _notify_booking_confirmed(booking, *, is_custom):
         if is_custom else
         f"Your booking for {booking.package.name} is confirmed."
     )
-    create_notification(
-        user=booking.user,
-        title='Payment successful',
-        message=traveler_message,
-        notification_type='payment_success',
-        target_url=reverse('booking_confirmation', args=[booking.id]),
-        related_booking=booking,
-        related_trip=getattr(booking, 'trip', None),
-        dedupe_key=f"payment_success:traveler:{booking.id}",
+    related_trip = getattr(booking, 'trip', None)
+    create_notifications([
+        (
+            booking.user,
+            {
+                'title': 'Payment successful',
+                'message': traveler_message,
+                'notification_type': 'payment_success',
+                'target_url': reverse('booking_confirmation', args=[booking.id]),
+                'related_booking': booking,
+                'related_trip': related_trip,
+            },
+            f"payment_success:traveler:{booking.id}",
+        ),
+        (
+            _get_vendor_user(booking.package.vendor),
+            {
+                'title': 'New confirmed booking',
+                'message': f"{booking.user.username} confirmed a booking for {booking.package.name}.",
+                'notification_type': 'booking_created',
+                'target_url': reverse('vendor_bookings'),
+                'related_booking': booking,
+                'related_trip': related_trip,
+            },
+            f"booking_created:vendor:{booking.id}",
+        ),
+    ])
+
+
+def _notify_itinerary_changed(package, batch_size=500):
+    bookings = (
+        Booking.objects.filter(package=package, status__in=['confirmed', 'in_review'])
+        .select_related('user', 'trip')
+        .order_by('id')
     )
+    written = 0
+    last_id = 0
+    # Walk the bookings by id so only one batch of travelers and notifications is in memory.
+    while True:
+        batch = list(bookings.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return written
+        written += create_notifications(
+            (
+                (
+                    booking.user,
+                    {
+                        'title': 'Itinerary updated',
+                        'message': f"The vendor updated the itinerary for {package.name}. Please review your trip plan.",
+                        'notification_type': 'trip_update',
+                        'target_url': reverse('booking_confirmation', args=[booking.id]),
+                        'related_booking': booking,
+                        'related_trip': getattr(booking, 'trip', None),
+                    },
+                    f"itinerary_changed:booking:{booking.id}",
+                )
+                for booking in batch
+            ),
+            batch_size=batch_size,
+        )
+        if len(batch) < batch_size:
+            return written
+        last_id = batch[-1].id
 
-    create_notification(
-        user=_get_vendor_user(booking.package.vendor),
-        title='New confirmed booking',
-        message=f"{booking.user.username} confirmed a booking for {booking.package.name}.",
-        notification_type='booking_created',
-        target_url=reverse('vendor_bookings'),
-        related_booking=booking,
-        related_trip=getattr(booking, 'trip', None),
-        dedupe_key=f"booking_created:vendor:{booking.id}",
+
+NOTIFICATION_FANOUT_HANDLERS = {
+    'itinerary_changed': _notify_itinerary_changed,
+}
+
+
+def queue_itinerary_change_notifications(package):
+    """Queue the traveler fan-out for the worker; edits made before it runs share one entry."""
+    fanout = NotificationFanout.objects.filter(kind='itinerary_changed', package=package, status='pending').first()
+    if fanout is None:
+        fanout = NotificationFanout.objects.create(kind='itinerary_changed', package=package)
+    return fanout
+
+
+def _schedule_fanout_retry(fanout, error):
+    fanout.attempts += 1
+    fanout.last_error = str(error)[:2000]
+    fanout.leased_until = None
+    if fanout.attempts >= NOTIFICATION_FANOUT_MAX_ATTEMPTS:
+        fanout.status = 'failed'
+    else:
+        fanout.status = 'pending'
+        fanout.next_attempt_at = timezone.now() + timezone.timedelta(
+            seconds=NOTIFICATION_FANOUT_RETRY_BASE_SECONDS * 2 ** (fanout.attempts - 1)
+        )
+    fanout.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at', 'leased_until'])
+
+
+def _claim_notification_fanouts(limit):
+    now = timezone.now()
+    with transaction.atomic():
+        # Locked rows are skipped, so parallel workers never claim the same fan-out.
+        fanout_ids = list(
+            NotificationFanout.objects.filter(
+                Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', leased_until__lte=now)
+            )
+            .select_for_update(skip_locked=True)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        NotificationFanout.objects.filter(pk__in=fanout_ids).update(
+            status='sending',
+            leased_until=now + timezone.timedelta(seconds=NOTIFICATION_FANOUT_LEASE_SECONDS),
+        )
+    return list(
+        NotificationFanout.objects.filter(pk__in=fanout_ids).select_related('package').order_by('next_attempt_at', 'id')
     )
 
 
+def process_notification_fanouts(limit=10, batch_size=500):
+    """Write up to ``limit`` queued fan-outs, ``batch_size`` notifications at a time; returns ``(sent, failed)``.
+
+    A fan-out that raises is retried with exponential backoff until it reaches
+    ``NOTIFICATION_FANOUT_MAX_ATTEMPTS``. Notifications are keyed per booking, so a retry
+    refreshes the ones an earlier attempt already wrote instead of duplicating them.
+    """
+    sent = failed = 0
+    for fanout in _claim_notification_fanouts(limit):
+        try:
+            NOTIFICATION_FANOUT_HANDLERS[fanout.kind](fanout.package, batch_size=batch_size)
+        except Exception as exc:
+            logger.warning("Notification fan-out %s failed: %s", fanout.id, exc)
+            _schedule_fanout_retry(fanout, exc)
+            failed += 1
+            continue
+
+        NotificationFanout.objects.filter(pk=fanout.pk).update(
+            status='sent',
+            attempts=F('attempts') + 1,
+            leased_until=None,
+            sent_at=timezone.now(),
+        )
+        sent += 1
+    return sent, failed
+
+
 def _notify_payment_cancelled(request, detail_message):
     if not request.user.is_authenticated:
         return
@@ -0,0 +1,106 @@
+import time
+
+from django.core.cache import cache
+
+from ..forms import ItineraryDayForm
+from ..models import Review
+from .pagination import paginate_by_keyset
+
+
+PACKAGE_DETAIL_CACHE_TTL = 60 * 60
+PACKAGE_REVIEWS_PER_PAGE = 10
+
+
+def _package_detail_version_key(package_id):
+    return f'package-detail-version:{package_id}'
+
+
+def get_package_detail_version(package_id):
+    version = cache.get(_package_detail_version_key(package_id))
+    if version is None:
+        # A fresh timestamp rather than 1, so an evicted version can never match old entries.
+        version = time.time_ns()
+        cache.set(_package_detail_version_key(package_id), version, None)
+    return version
+
+
+def bump_package_detail_version(package_id):
+    cache.set(_package_detail_version_key(package_id), time.time_ns(), None)
+
+
+def _build_legacy_itinerary_items(package):
+    activity_labels = dict(ItineraryDayForm.ACTIVITY_CHOICES)
+    raw_itinerary_items = package.itinerary if isinstance(package.itinerary, list) else []
+    itinerary_items = []
+
+    for item in sorted(raw_itinerary_items, key=lambda entry: entry.get('day') or 0):
+        if not isinstance(item, dict):
+            continue
+
+        day = item.get('day')
+        title = (item.get('title') or '').strip()
+        description = (item.get('description') or '').strip()
+        activity_type = item.get('activity_type') or ''
+        inclusions = [
+            inclusion.strip()
+            for inclusion in (item.get('inclusions') or '').split(',')
+            if inclusion.strip()
+        ]
+
+        if not day or not title or not description:
+            continue
+
+        itinerary_items.append({
+            'day': day,
+            'title': title,
+            'description': description,
+            'activity_label': activity_labels.get(activity_type, activity_type.replace('_', ' ').title()),
+            'inclusions': inclusions,
+            'options': [],
+            'selection_field': None,
+        })
+    return itinerary_items
+
+
+def _paginate_package_reviews(package, cursor=None, direction='next'):
+    return paginate_by_keyset(
+        Review.objects.filter(package=package).select_related('user'),
+        cursor=cursor,
+        direction=direction,
+        per_page=PACKAGE_REVIEWS_PER_PAGE,
+    )
+
+
+def _build_package_detail_content(package):
+    package_days = list(package.package_days.prefetch_related('options').all())
+    return {
+        'package_days': package_days,
+        'legacy_itinerary_items': [] if package_days else _build_legacy_itinerary_items(package),
+        'first_review_page': _paginate_package_reviews(package),
+    }
+
+
+def get_package_detail_content(package):
+    """Return the parts of ``package_detail`` that look the same for every visitor.
+
+    That is the package days with their options, the itinerary fallback built from the
+    package JSON and the first page of reviews. Entries are keyed by a version that
+    itinerary edits, package edits and new reviews bump, plus the package's ``updated_at``,
+    so a stale copy is never read back; callers layer per-visitor state on top.
+    """
+    cache_key = (
+        f'package-detail:{package.id}:{get_package_detail_version(package.id)}:'
+        f'{package.updated_at.timestamp()}'
+    )
+    content = cache.get(cache_key)
+    if content is None:
+        content = _build_package_detail_content(package)
+        cache.set(cache_key, content, PACKAGE_DETAIL_CACHE_TTL)
+    return content
+
+
+def get_package_review_page(package, cursor=None, direction='next', first_page=None):
+    """Return a keyset page of reviews, reusing the cached first page when no cursor is given."""
+    if not cursor and first_page is not None:
+        return dict(first_page)
+    return _paginate_package_reviews(package, cursor=cursor, direction=direction)
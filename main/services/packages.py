@@ -0,0 +1,27 @@
+from ..models import TravelPackage
+from .facets import bump_package_facet_version
+from .itineraries import _sync_package_itinerary_json
+from .notifications import queue_itinerary_change_notifications
+from .package_detail import bump_package_detail_version
+from .search import _sync_package_search_index
+from .similarity import sync_package_similarity
+from .sponsorship import invalidate_sponsored_placements
+
+
+def on_package_changed(package_id, *, itinerary_changed=False):
+    """Refresh every derived copy of a package after it, its days or its options change.
+
+    Pass the id rather than the instance so the same call works after a delete, when
+    the package row is already gone and only the caches and vectors need clearing.
+    """
+    package = TravelPackage.objects.select_related('vendor').filter(pk=package_id).first()
+    if package is not None:
+        if itinerary_changed:
+            _sync_package_itinerary_json(package)
+        _sync_package_search_index(package)
+    sync_package_similarity(package_id)
+    bump_package_facet_version()
+    bump_package_detail_version(package_id)
+    invalidate_sponsored_placements()
+    if package is not None and itinerary_changed:
+        queue_itinerary_change_notifications(package)
@@ -0,0 +1,112 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+def _encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    return values
+
+
+def _cursor_output_field(queryset, field):
+    annotation = queryset.query.annotations.get(field)
+    if annotation is not None:
+        return annotation.output_field
+    try:
+        return queryset.model._meta.get_field(field)
+    except FieldDoesNotExist:
+        return None
+
+
+def _resolve_cursor(queryset, field, cursor):
+    # Cursors come back from the query string, so a tampered token or one issued for a
+    # different sort must read as "no cursor" rather than reach the database as a bad value.
+    values = _decode_cursor(cursor)
+    output_field = _cursor_output_field(queryset, field)
+    if values is None or output_field is None:
+        return None
+    try:
+        position = [output_field.to_python(values[0]), queryset.model._meta.pk.to_python(values[1])]
+    except (ValidationError, TypeError, ValueError):
+        return None
+    if None in position:
+        return None
+    return position
+
+
+def _keyset_filter(field, value, pk, *, after, descending):
+    # "after" means further along the page order; for a descending order that is the smaller key.
+    lookup = 'lt' if after == descending else 'gt'
+    return Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': pk})
+
+
+def _build_cursor_url(request, cursor, direction):
+    if not cursor:
+        return None
+    params = request.GET.copy()
+    params.pop('page', None)
+    params['pagination'] = 'cursor'
+    params['cursor'] = cursor
+    params['direction'] = direction
+    return f"?{params.urlencode()}"
+
+
+def paginate_by_keyset(queryset, *, cursor=None, direction='next', per_page=9, field='created_at', descending=True):
+    """Slice ``queryset`` into a page ordered by ``(field, pk)`` without COUNT or OFFSET queries.
+
+    ``cursor`` is an opaque token taken from a previous page's ``next_cursor`` or
+    ``previous_cursor``; ``direction`` says which side of it to read. Each page costs
+    a single indexed range query regardless of how deep the client has scrolled.
+    """
+    prefix = '-' if descending else ''
+    reverse_prefix = '' if descending else '-'
+    position = _resolve_cursor(queryset, field, cursor)
+    backwards = position is not None and direction == 'previous'
+
+    if backwards:
+        queryset = queryset.filter(
+            _keyset_filter(field, position[0], position[1], after=False, descending=descending)
+        ).order_by(f'{reverse_prefix}{field}', f'{reverse_prefix}pk')
+    else:
+        if position is not None:
+            queryset = queryset.filter(
+                _keyset_filter(field, position[0], position[1], after=True, descending=descending)
+            )
+        queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}pk')
+
+    rows = list(queryset[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def _cursor_for(obj):
+        return _encode_cursor([getattr(obj, field), obj.pk])
+
+    if backwards:
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    return {
+        'object_list': rows,
+        'has_next': bool(rows) and has_next,
+        'has_previous': bool(rows) and has_previous,
+        'next_cursor': _cursor_for(rows[-1]) if rows and has_next else None,
+        'previous_cursor': _cursor_for(rows[0]) if rows and has_previous else None,
+    }
@@ -0,0 +1,214 @@
+import json
+import logging
+
+import stripe
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from ..models import PaymentEvent, TravelPackage
+from .capacity import CapacityUnavailableError, release_capacity_hold
+from .notifications import _notify_booking_confirmed
+from .payments import (
+    _create_payment_log,
+    _get_pending_checkout_from_metadata,
+    activate_sponsorship_payment,
+    confirm_checkout_booking,
+)
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_EVENT_MAX_ATTEMPTS = 5
+
+
+def record_stripe_event(payload, signature_header):
+    """Verify a Stripe webhook body and append it to the event queue.
+
+    Raises ``ValueError`` or ``stripe.SignatureVerificationError`` for payloads that do
+    not come from Stripe. Redelivered events are stored once; returns ``(event, created)``.
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise ValueError('STRIPE_WEBHOOK_SECRET is not configured.')
+
+    stripe.Webhook.construct_event(payload, signature_header, settings.STRIPE_WEBHOOK_SECRET)
+    data = json.loads(payload)
+    try:
+        with transaction.atomic():
+            return PaymentEvent.objects.get_or_create(
+                provider='stripe',
+                event_id=data['id'],
+                defaults={'event_type': data.get('type', ''), 'payload': data},
+            )
+    except IntegrityError:
+        return PaymentEvent.objects.get(provider='stripe', event_id=data['id']), False
+
+
+def _checkout_return_event_id(transaction_reference):
+    return f"return:{transaction_reference}"
+
+
+def record_checkout_return(provider, transaction_reference, metadata):
+    """Queue a checkout the browser came back from for the payment event worker.
+
+    The return is confirmed by the same idempotent handlers as the provider's webhook, so
+    whichever of the two is processed second finds the payment already applied. Returns
+    ``(event, created)``.
+    """
+    event_id = _checkout_return_event_id(transaction_reference)
+    payment = {'id': transaction_reference, 'provider': provider, 'metadata': metadata}
+    try:
+        with transaction.atomic():
+            return PaymentEvent.objects.get_or_create(
+                provider=provider,
+                event_id=event_id,
+                defaults={'event_type': 'checkout.returned', 'payload': {'data': {'object': payment}}},
+            )
+    except IntegrityError:
+        return PaymentEvent.objects.get(provider=provider, event_id=event_id), False
+
+
+def get_checkout_return_event(user, provider, transaction_reference):
+    if not transaction_reference or not user.is_authenticated:
+        return None
+    return PaymentEvent.objects.filter(
+        provider=provider,
+        event_id=_checkout_return_event_id(transaction_reference),
+        payload__data__object__metadata__user_id=str(user.id),
+    ).first()
+
+
+def _get_metadata_user(metadata):
+    user = User.objects.filter(pk=metadata.get('user_id') or None).first()
+    if user is None:
+        raise ValueError('Checkout metadata does not reference a known user.')
+    return user
+
+
+def _confirm_checkout_payment(metadata, *, provider, transaction_reference):
+    payment_type = metadata.get('payment_type')
+    user = _get_metadata_user(metadata)
+
+    if payment_type == 'sponsorship':
+        package = TravelPackage.objects.select_related('vendor').get(
+            pk=metadata.get('package_id'),
+            vendor__user_profile__user=user,
+        )
+        activate_sponsorship_payment(
+            package,
+            metadata.get('sponsorship_amount'),
+            user=user,
+            provider=provider,
+            transaction_reference=transaction_reference,
+        )
+        return
+
+    if payment_type not in ('booking', 'custom_itinerary'):
+        raise ValueError(f"Unknown checkout payment type: {payment_type!r}")
+
+    try:
+        booking, package, is_custom, created = confirm_checkout_booking(
+            user,
+            _get_pending_checkout_from_metadata(metadata),
+            provider=provider,
+            transaction_reference=transaction_reference,
+        )
+    except CapacityUnavailableError:
+        # Already logged for a refund; retrying cannot free the seats.
+        return
+    if not created:
+        return
+
+    _notify_booking_confirmed(booking, is_custom=is_custom)
+    _create_payment_log(
+        provider=provider,
+        payment_type='custom_itinerary' if is_custom else 'booking',
+        status='success',
+        amount=booking.total_price,
+        user=user,
+        booking=booking,
+        package=package,
+        transaction_reference=transaction_reference,
+    )
+
+
+def _handle_stripe_checkout_completed(checkout_session):
+    if checkout_session.get('payment_status') != 'paid':
+        return
+    _confirm_checkout_payment(
+        checkout_session.get('metadata') or {},
+        provider='stripe',
+        transaction_reference=checkout_session['id'],
+    )
+
+
+def _handle_checkout_returned(payment):
+    _confirm_checkout_payment(
+        payment['metadata'],
+        provider=payment['provider'],
+        transaction_reference=payment['id'],
+    )
+
+
+def _handle_stripe_checkout_expired(checkout_session):
+    metadata = checkout_session.get('metadata') or {}
+    release_capacity_hold(metadata.get('capacity_hold_id') or None)
+
+
+PAYMENT_EVENT_HANDLERS = {
+    ('stripe', 'checkout.session.completed'): _handle_stripe_checkout_completed,
+    ('stripe', 'checkout.session.async_payment_succeeded'): _handle_stripe_checkout_completed,
+    ('stripe', 'checkout.session.expired'): _handle_stripe_checkout_expired,
+    ('stripe', 'checkout.returned'): _handle_checkout_returned,
+    ('esewa', 'checkout.returned'): _handle_checkout_returned,
+}
+
+
+def _process_payment_event(event_pk):
+    try:
+        with transaction.atomic():
+            event = (
+                PaymentEvent.objects.select_for_update(skip_locked=True)
+                .filter(pk=event_pk, status='pending')
+                .first()
+            )
+            if event is None:
+                return False
+
+            handler = PAYMENT_EVENT_HANDLERS.get((event.provider, event.event_type))
+            if handler is None:
+                event.status = 'ignored'
+            else:
+                handler(event.payload['data']['object'])
+                event.status = 'processed'
+            event.attempts += 1
+            event.processed_at = timezone.now()
+            event.save(update_fields=['status', 'attempts', 'processed_at'])
+            return True
+    except Exception as exc:
+        logger.exception("Payment event %s failed to process.", event_pk)
+        PaymentEvent.objects.filter(pk=event_pk, status='pending').update(
+            attempts=F('attempts') + 1,
+            last_error=str(exc)[:2000],
+            status=Case(
+                When(attempts__gte=PAYMENT_EVENT_MAX_ATTEMPTS - 1, then=Value('failed')),
+                default=Value('pending'),
+            ),
+        )
+        return False
+
+
+def process_pending_payment_events(batch_size=50):
+    """Apply up to ``batch_size`` queued events oldest first; returns how many were handled.
+
+    Each event runs in its own transaction under a skip-locked row lock, so several
+    workers can drain the queue side by side. Failures stay queued for a retry until
+    they reach ``PAYMENT_EVENT_MAX_ATTEMPTS``.
+    """
+    event_pks = list(
+        PaymentEvent.objects.filter(status='pending')
+        .order_by('received_at', 'id')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    return sum(1 for event_pk in event_pks if _process_payment_event(event_pk))
@@ -0,0 +1,118 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Sum
+
+from ..models import PaymentLog
+from .bookings import _filter_date_range, _parse_filter_date
+from .exports import _Echo
+
+
+PAYMENT_LOG_EXPORT_CHUNK_SIZE = 2000
+PAYMENT_LOG_EXPORT_FIELDS = [
+    'id',
+    'created_at',
+    'provider',
+    'payment_type',
+    'status',
+    'amount',
+    'transaction_reference',
+    'user__username',
+    'booking_id',
+    'package__name',
+    'notes',
+]
+
+
+def _parse_amount(value):
+    try:
+        return Decimal(value) if value else None
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def get_payment_log_filters(params):
+    status = params.get('status', '')
+    payment_type = params.get('payment_type', '')
+    return {
+        'provider': params.get('provider', '').strip().lower(),
+        'status': status if status in dict(PaymentLog.STATUS_CHOICES) else '',
+        'payment_type': payment_type if payment_type in dict(PaymentLog.PAYMENT_TYPE_CHOICES) else '',
+        'date_from': _parse_filter_date(params.get('date_from')),
+        'date_to': _parse_filter_date(params.get('date_to')),
+        'amount_min': _parse_amount(params.get('amount_min')),
+        'amount_max': _parse_amount(params.get('amount_max')),
+        'reference': params.get('reference', '').strip(),
+    }
+
+
+def filter_payment_logs(*, provider='', status='', payment_type='', date_from=None, date_to=None,
+                        amount_min=None, amount_max=None, reference=''):
+    payment_logs = PaymentLog.objects.all()
+    if reference:
+        # A reference identifies the payment outright, so it short-circuits the other filters.
+        return payment_logs.filter(transaction_reference=reference)
+    if provider:
+        payment_logs = payment_logs.filter(provider=provider)
+    if status:
+        payment_logs = payment_logs.filter(status=status)
+    if payment_type:
+        payment_logs = payment_logs.filter(payment_type=payment_type)
+    payment_logs = payment_logs.filter(**_filter_date_range('created_at', date_from, date_to))
+    if amount_min is not None:
+        payment_logs = payment_logs.filter(amount__gte=amount_min)
+    if amount_max is not None:
+        payment_logs = payment_logs.filter(amount__lte=amount_max)
+    return payment_logs
+
+
+def summarize_payment_logs(payment_logs):
+    """Return log counts and amount totals by provider and by status from one grouped query."""
+    status_labels = dict(PaymentLog.STATUS_CHOICES)
+    by_provider = {}
+    by_status = {}
+    overall = {'count': 0, 'total': Decimal('0')}
+
+    rows = (
+        payment_logs.order_by()
+        .values('provider', 'status')
+        .annotate(count=Count('id'), total=Sum('amount'))
+    )
+    for row in rows:
+        total = row['total'] or Decimal('0')
+        for bucket, key, label in (
+            (by_provider, row['provider'], row['provider'].title()),
+            (by_status, row['status'], status_labels.get(row['status'], row['status'])),
+        ):
+            entry = bucket.setdefault(key, {'key': key, 'label': label, 'count': 0, 'total': Decimal('0')})
+            entry['count'] += row['count']
+            entry['total'] += total
+        overall['count'] += row['count']
+        overall['total'] += total
+
+    return {
+        'by_provider': sorted(by_provider.values(), key=lambda entry: entry['label']),
+        'by_status': sorted(by_status.values(), key=lambda entry: entry['label']),
+        'overall': overall,
+    }
+
+
+def _iter_payment_log_rows(payment_logs, chunk_size):
+    rows = payment_logs.order_by('-created_at', '-id').values_list(*PAYMENT_LOG_EXPORT_FIELDS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(PAYMENT_LOG_EXPORT_FIELDS, row))
+
+
+def stream_payment_logs_csv(payment_logs, chunk_size=PAYMENT_LOG_EXPORT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(PAYMENT_LOG_EXPORT_FIELDS)
+    for row in _iter_payment_log_rows(payment_logs, chunk_size):
+        yield writer.writerow(row.values())
+
+
+def stream_payment_logs_jsonl(payment_logs, chunk_size=PAYMENT_LOG_EXPORT_CHUNK_SIZE):
+    for row in _iter_payment_log_rows(payment_logs, chunk_size):
+        row['created_at'] = row['created_at'].isoformat()
+        row['amount'] = str(row['amount'])
+        yield json.dumps(row) + '\n'
@@ -4,16 +4,25 @@ import hmac
 from decimal import Decimal
 
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
 
 from ..forms import BookingTravelerForm
 from ..models import Booking, CustomItinerary, PaymentLog, TravelPackage
-from .capacity import mark_capacity_request_used
+from .analytics import _sync_vendor_rollup_from_booking
+from .capacity import (
+    CAPACITY_BOOKING_STATUSES,
+    CapacityUnavailableError,
+    _sync_capacity_ledger_from_booking,
+    claim_checkout_capacity,
+    mark_capacity_request_used,
+)
 from ..notifications import create_notification
-from .access import _get_vendor_or_403, _get_vendor_user
+from .access import _get_vendor_user
 from .itineraries import _build_action_button_label
+from .sponsorship import invalidate_sponsored_placements
 from .trips import _create_trip_from_booking
 
 
@@ -222,6 +231,7 @@ def _store_pending_payment_session(
     child_under_seven_count=None,
     total_price=None,
     capacity_request_id=None,
+    capacity_hold_id=None,
     sponsorship_amount=None,
 ):
     request.session['pending_booking_package_id'] = package_id
@@ -234,6 +244,7 @@ def _store_pending_payment_session(
     request.session['pending_booking_child_under_seven_count'] = child_under_seven_count
     request.session['pending_booking_total_price'] = str(total_price) if total_price is not None else None
     request.session['pending_capacity_request_id'] = capacity_request_id
+    request.session['pending_capacity_hold_id'] = capacity_hold_id
     request.session['pending_sponsorship_amount'] = (
         str(sponsorship_amount) if sponsorship_amount is not None else None
     )
@@ -251,27 +262,50 @@ def _clear_pending_payment_session(request):
         'pending_booking_child_under_seven_count',
         'pending_booking_total_price',
         'pending_capacity_request_id',
+        'pending_capacity_hold_id',
         'pending_sponsorship_amount',
     ]:
         request.session.pop(key, None)
 
 
-def _create_or_update_booking_from_pending_payment(request):
-    custom_itinerary_id = request.session.get('pending_custom_itinerary_id')
-    package_id = request.session.get('pending_booking_package_id')
-    adult_count = int(request.session.get('pending_booking_adult_count') or 1)
-    child_count = int(request.session.get('pending_booking_child_count') or 0)
-    child_under_seven_count = int(request.session.get('pending_booking_child_under_seven_count') or 0)
-    capacity_request_id = request.session.get('pending_capacity_request_id')
+def _get_pending_checkout_from_session(request):
+    return {
+        'package_id': request.session.get('pending_booking_package_id'),
+        'custom_itinerary_id': request.session.get('pending_custom_itinerary_id'),
+        'adult_count': request.session.get('pending_booking_adult_count'),
+        'child_count': request.session.get('pending_booking_child_count'),
+        'child_under_seven_count': request.session.get('pending_booking_child_under_seven_count'),
+        'total_price': request.session.get('pending_booking_total_price'),
+        'capacity_request_id': request.session.get('pending_capacity_request_id'),
+        'capacity_hold_id': request.session.get('pending_capacity_hold_id'),
+    }
+
+
+def _create_or_update_booking_from_checkout(user, checkout, *, provider='', transaction_reference=''):
+    custom_itinerary_id = checkout.get('custom_itinerary_id')
+    package_id = checkout.get('package_id')
+    adult_count = int(checkout.get('adult_count') or 1)
+    child_count = int(checkout.get('child_count') or 0)
+    child_under_seven_count = int(checkout.get('child_under_seven_count') or 0)
+    capacity_request_id = checkout.get('capacity_request_id')
 
     if not custom_itinerary_id and not package_id:
         raise ValueError('No pending payment target found.')
 
+    capacity_request = None
+    if capacity_request_id:
+        from ..models import BookingCapacityRequest
+        capacity_request = BookingCapacityRequest.objects.filter(
+            pk=capacity_request_id,
+            traveler=user,
+        ).first()
+    allow_overbooking = capacity_request is not None and capacity_request.status == 'approved'
+
     if custom_itinerary_id:
         custom_itinerary = get_object_or_404(
             CustomItinerary.objects.select_related('package'),
             pk=custom_itinerary_id,
-            user=request.user,
+            user=user,
         )
         pricing = _calculate_booking_pricing(
             custom_itinerary.package,
@@ -281,13 +315,24 @@ def _create_or_update_booking_from_pending_payment(request):
             custom_itinerary=custom_itinerary,
         )
         total_price = _quantize_currency(
-            request.session.get('pending_booking_total_price') or pricing['total_price']
+            checkout.get('total_price') or pricing['total_price']
+        )
+        existing_booking = Booking.objects.filter(custom_itinerary=custom_itinerary).first()
+        counted_travelers = (
+            existing_booking.number_of_travelers
+            if existing_booking and existing_booking.status in CAPACITY_BOOKING_STATUSES else 0
+        )
+        claim_checkout_capacity(
+            checkout.get('capacity_hold_id'),
+            package=custom_itinerary.package,
+            number_of_travelers=pricing['total_travelers'] - counted_travelers,
+            allow_overbooking=allow_overbooking,
         )
 
-        booking, _ = Booking.objects.get_or_create(
+        booking, created = Booking.objects.get_or_create(
             custom_itinerary=custom_itinerary,
             defaults={
-                'user': request.user,
+                'user': user,
                 'package': custom_itinerary.package,
                 'adult_count': adult_count,
                 'child_count': child_count,
@@ -295,24 +340,36 @@ def _create_or_update_booking_from_pending_payment(request):
                 'number_of_travelers': pricing['total_travelers'],
                 'total_price': total_price,
                 'status': 'confirmed',
+                'payment_provider': provider,
+                'payment_reference': transaction_reference,
             }
         )
-        if (
+        if created:
+            _sync_capacity_ledger_from_booking(booking, previous_status=None)
+            _sync_vendor_rollup_from_booking(booking, previous_status=None)
+        elif (
             booking.status != 'confirmed' or
             booking.total_price != total_price or
             booking.number_of_travelers != pricing['total_travelers'] or
             booking.adult_count != adult_count or
             booking.child_count != child_count or
-            booking.child_under_seven_count != child_under_seven_count
+            booking.child_under_seven_count != child_under_seven_count or
+            booking.payment_reference != transaction_reference
         ):
+            previous_status = booking.status
+            previous_travelers = booking.number_of_travelers
+            previous_total_price = booking.total_price
+            previous_package_id = booking.package_id
             booking.status = 'confirmed'
             booking.total_price = total_price
             booking.package = custom_itinerary.package
-            booking.user = request.user
+            booking.user = user
             booking.number_of_travelers = pricing['total_travelers']
             booking.adult_count = adult_count
             booking.child_count = child_count
             booking.child_under_seven_count = child_under_seven_count
+            booking.payment_provider = provider
+            booking.payment_reference = transaction_reference
             booking.save(update_fields=[
                 'status',
                 'total_price',
@@ -322,66 +379,207 @@ def _create_or_update_booking_from_pending_payment(request):
                 'adult_count',
                 'child_count',
                 'child_under_seven_count',
+                'payment_provider',
+                'payment_reference',
             ])
+            _sync_capacity_ledger_from_booking(booking, previous_status, previous_travelers)
+            _sync_vendor_rollup_from_booking(booking, previous_status, previous_total_price, previous_package_id)
         if custom_itinerary.status != 'confirmed':
             custom_itinerary.status = 'confirmed'
             custom_itinerary.save(update_fields=['status', 'updated_at'])
 
         _create_trip_from_booking(booking)
-        if capacity_request_id:
-            from ..models import BookingCapacityRequest
-            capacity_request = BookingCapacityRequest.objects.filter(
-                pk=capacity_request_id,
-                traveler=request.user,
-            ).first()
-            mark_capacity_request_used(capacity_request)
+        mark_capacity_request_used(capacity_request)
 
         return booking, custom_itinerary.package, True
 
     package = get_object_or_404(TravelPackage, pk=package_id)
     pricing = _calculate_booking_pricing(package, adult_count, child_count, child_under_seven_count)
     total_price = _quantize_currency(
-        request.session.get('pending_booking_total_price') or pricing['total_price']
+        checkout.get('total_price') or pricing['total_price']
+    )
+    claim_checkout_capacity(
+        checkout.get('capacity_hold_id'),
+        package=package,
+        number_of_travelers=pricing['total_travelers'],
+        allow_overbooking=allow_overbooking,
     )
     booking = Booking.objects.create(
-        user=request.user,
+        user=user,
         package=package,
         adult_count=adult_count,
         child_count=child_count,
         child_under_seven_count=child_under_seven_count,
         number_of_travelers=pricing['total_travelers'],
         total_price=total_price,
-        status='confirmed'
+        status='confirmed',
+        payment_provider=provider,
+        payment_reference=transaction_reference,
     )
-    if capacity_request_id:
-        from ..models import BookingCapacityRequest
-        capacity_request = BookingCapacityRequest.objects.filter(
-            pk=capacity_request_id,
-            traveler=request.user,
-        ).first()
-        mark_capacity_request_used(capacity_request)
+    _sync_capacity_ledger_from_booking(booking, previous_status=None)
+    _sync_vendor_rollup_from_booking(booking, previous_status=None)
+    mark_capacity_request_used(capacity_request)
     _create_trip_from_booking(booking)
     return booking, package, False
 
 
-def _activate_pending_sponsorship(request):
-    sponsorship_package_id = request.session.get('pending_sponsorship_package_id')
-    if not sponsorship_package_id:
-        raise ValueError('No pending sponsorship target found.')
-
-    vendor = _get_vendor_or_403(request)
-    package = get_object_or_404(
-        TravelPackage.objects.select_related('vendor'),
-        pk=sponsorship_package_id,
-        vendor=vendor,
+def _get_confirmed_booking_for_payment(user, provider, transaction_reference):
+    if not transaction_reference or not user.is_authenticated:
+        return None
+    return (
+        Booking.objects.select_related('package')
+        .filter(user=user, payment_provider=provider, payment_reference=transaction_reference)
+        .first()
     )
 
-    today = timezone.now().date()
-    current_price = _get_sponsorship_price(
-        package,
-        request.session.get('pending_sponsorship_amount'),
+
+def _get_checkout_payment_log(user, provider, transaction_reference):
+    # Sponsorships and payments flagged for a refund leave no booking behind, so their
+    # payment log is how the browser learns what the worker did.
+    if not transaction_reference or not user.is_authenticated:
+        return None
+    return (
+        PaymentLog.objects.select_related('package')
+        .filter(
+            user=user,
+            provider=provider,
+            transaction_reference=transaction_reference,
+            status__in=['success', 'failed'],
+        )
+        .order_by('-id')
+        .first()
     )
 
+
+def _flag_payment_for_refund(user, checkout, *, provider, transaction_reference, reason):
+    payment_type = 'custom_itinerary' if checkout.get('custom_itinerary_id') else 'booking'
+    if transaction_reference and PaymentLog.objects.filter(
+        provider=provider,
+        payment_type=payment_type,
+        status='failed',
+        transaction_reference=transaction_reference,
+    ).exists():
+        return
+
+    if checkout.get('custom_itinerary_id'):
+        custom_itinerary = CustomItinerary.objects.select_related('package').filter(
+            pk=checkout['custom_itinerary_id'],
+        ).first()
+        package = custom_itinerary.package if custom_itinerary else None
+    else:
+        package = TravelPackage.objects.filter(pk=checkout.get('package_id')).first()
+    _create_payment_log(
+        provider=provider,
+        payment_type=payment_type,
+        status='failed',
+        amount=checkout.get('total_price') or 0,
+        user=user,
+        package=package,
+        transaction_reference=transaction_reference or '',
+        notes=f"Refund required: the payment arrived after its seat hold expired. {reason}",
+    )
+
+
+def confirm_checkout_booking(user, checkout, *, provider, transaction_reference):
+    """Confirm a pending checkout for ``user`` once per provider transaction.
+
+    Returns ``(booking, package, is_custom, created)``. A replayed callback, webhook or
+    refresh for a transaction that was already confirmed gets the original booking back
+    with ``created=False``, so callers can skip notifications and payment logs.
+
+    Raises ``CapacityUnavailableError`` when the seats went to someone else after the
+    checkout's hold expired; no booking is written and the payment is logged for a refund.
+    """
+    booking = _get_confirmed_booking_for_payment(user, provider, transaction_reference)
+    if booking:
+        return booking, booking.package, booking.custom_itinerary_id is not None, False
+
+    try:
+        with transaction.atomic():
+            booking, package, is_custom = _create_or_update_booking_from_checkout(
+                user,
+                checkout,
+                provider=provider,
+                transaction_reference=transaction_reference or '',
+            )
+    except IntegrityError:
+        # A concurrent request for the same transaction won the unique constraint.
+        booking = _get_confirmed_booking_for_payment(user, provider, transaction_reference)
+        if booking is None:
+            raise
+        return booking, booking.package, booking.custom_itinerary_id is not None, False
+    except CapacityUnavailableError as exc:
+        _flag_payment_for_refund(
+            user,
+            checkout,
+            provider=provider,
+            transaction_reference=transaction_reference,
+            reason=str(exc),
+        )
+        raise
+    return booking, package, is_custom, True
+
+
+def confirm_booking_payment(request, *, provider, transaction_reference):
+    return confirm_checkout_booking(
+        request.user,
+        _get_pending_checkout_from_session(request),
+        provider=provider,
+        transaction_reference=transaction_reference,
+    )
+
+
+def _build_checkout_metadata(user, payment_type, **values):
+    # Stripe metadata only holds strings; it is what lets the webhook worker confirm a
+    # checkout without the browser session.
+    metadata = {'user_id': str(user.id), 'payment_type': payment_type}
+    for key, value in values.items():
+        metadata[key] = '' if value is None else str(value)
+    return metadata
+
+
+def _get_pending_checkout_from_metadata(metadata):
+    return {key: metadata.get(key) or None for key in [
+        'package_id',
+        'custom_itinerary_id',
+        'adult_count',
+        'child_count',
+        'child_under_seven_count',
+        'total_price',
+        'capacity_request_id',
+        'capacity_hold_id',
+    ]}
+
+
+def _build_pending_checkout_metadata(request):
+    # The browser return is queued with the same metadata the Stripe session carries, so
+    # the worker confirms it through the webhook handlers.
+    sponsorship_package_id = request.session.get('pending_sponsorship_package_id')
+    if sponsorship_package_id:
+        return _build_checkout_metadata(
+            request.user,
+            'sponsorship',
+            package_id=sponsorship_package_id,
+            sponsorship_amount=request.session.get('pending_sponsorship_amount'),
+        )
+    checkout = _get_pending_checkout_from_session(request)
+    payment_type = 'custom_itinerary' if checkout['custom_itinerary_id'] else 'booking'
+    return _build_checkout_metadata(request.user, payment_type, **checkout)
+
+
+def _sponsorship_payment_recorded(provider, transaction_reference):
+    return bool(transaction_reference) and PaymentLog.objects.filter(
+        provider=provider,
+        payment_type='sponsorship',
+        status='success',
+        transaction_reference=transaction_reference,
+    ).exists()
+
+
+def _activate_sponsorship(package, sponsorship_amount):
+    today = timezone.now().date()
+    current_price = _get_sponsorship_price(package, sponsorship_amount)
+
     if package.is_sponsored and package.sponsorship_end and package.sponsorship_end >= today:
         start_anchor = package.sponsorship_end + timezone.timedelta(days=1)
         if not package.sponsorship_start:
@@ -402,9 +600,10 @@ def _activate_pending_sponsorship(request):
         'sponsorship_priority',
         'updated_at',
     ])
+    invalidate_sponsored_placements()
 
     create_notification(
-        user=_get_vendor_user(vendor),
+        user=_get_vendor_user(package.vendor),
         title='Sponsorship activated',
         message=f"{package.name} is sponsored through {package.sponsorship_end}.",
         notification_type='payment_success',
@@ -415,6 +614,30 @@ def _activate_pending_sponsorship(request):
     return package
 
 
+def activate_sponsorship_payment(package, sponsorship_amount, *, user, provider, transaction_reference):
+    """Extend ``package``'s sponsorship and log the payment, once per provider transaction.
+
+    Returns ``(package, activated)``; ``activated`` is ``False`` when the browser return
+    and the webhook worker both deliver the same payment.
+    """
+    with transaction.atomic():
+        package = TravelPackage.objects.select_for_update().select_related('vendor').get(pk=package.pk)
+        if _sponsorship_payment_recorded(provider, transaction_reference):
+            return package, False
+
+        _activate_sponsorship(package, sponsorship_amount)
+        _create_payment_log(
+            provider=provider,
+            payment_type='sponsorship',
+            status='success',
+            amount=_get_sponsorship_price(package),
+            user=user,
+            package=package,
+            transaction_reference=transaction_reference or '',
+        )
+        return package, True
+
+
 def _generate_esewa_signature(total_amount, transaction_uuid, product_code):
     message = f"total_amount={total_amount},transaction_uuid={transaction_uuid},product_code={product_code}"
     digest = hmac.new(
@@ -0,0 +1,65 @@
+import re
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from ..models import Booking, BookingCapacityRequest, ChatThread, PaymentLog, Review, TravelPackage, Trip, TripItem
+from .capacity import CAPACITY_BOOKING_STATUSES, annotate_package_capacity
+from .chat import annotate_thread_summaries
+from .sponsorship import _sponsored_placements_queryset
+
+
+# PostgreSQL prints "Seq Scan on <table>"; SQLite prints "SCAN <table or alias>" unless an
+# index is walked. Subquery aliases such as U0 cannot be mapped back to a table.
+_SEQUENTIAL_SCAN_PATTERNS = (
+    re.compile(r'Seq Scan on (\w+)'),
+    re.compile(r'\bSCAN (?!CONSTANT ROW)(\w+)\b(?! USING (?:COVERING )?INDEX| USING INTEGER PRIMARY KEY)'),
+)
+
+
+def find_sequential_scans(queryset):
+    """Return the tables that ``queryset``'s query plan reads with a full sequential scan."""
+    plan = queryset.explain()
+    return sorted({
+        table
+        for pattern in _SEQUENTIAL_SCAN_PATTERNS
+        for table in pattern.findall(plan)
+    })
+
+
+def build_key_querysets(*, traveler, vendor, package, trip, today=None):
+    """Return the hot catalog, booking and inbox queries, keyed by name, as the views run them.
+
+    Each entry mirrors a query issued by a view or service on every page load, so the
+    query plan checks (``check_query_plans`` and the test suite) notice when a schema or
+    ORM change stops one of them from using an index.
+    """
+    today = today or timezone.localdate()
+    vendor_user = vendor.user_profile.user
+    return {
+        'catalog_page': annotate_package_capacity(
+            TravelPackage.objects.select_related('vendor').filter(moderation_status='approved')
+        ).order_by('-created_at', '-id')[:10],
+        'sponsored_placements': _sponsored_placements_queryset(today),
+        'package_booked_travelers': (
+            Booking.objects.filter(package=package, status__in=CAPACITY_BOOKING_STATUSES)
+            .values('package')
+            .annotate(total=Sum('number_of_travelers'))
+        ),
+        'traveler_bookings': Booking.objects.filter(user=traveler).order_by('-booking_date')[:10],
+        'traveler_active_trips': Trip.objects.filter(traveler=traveler, status__in=['planned', 'ready', 'in_progress']),
+        'trip_timeline': TripItem.objects.filter(trip=trip).order_by('day_number', 'sort_order', 'id'),
+        'traveler_inbox': annotate_thread_summaries(
+            ChatThread.objects.filter(traveler=traveler, is_active=True), traveler,
+        ).order_by('-updated_at', '-id')[:20],
+        'vendor_inbox': annotate_thread_summaries(
+            ChatThread.objects.filter(vendor=vendor, is_active=True), vendor_user,
+        ).order_by('-updated_at', '-id')[:20],
+        'package_capacity_requests': BookingCapacityRequest.objects.filter(package=package, status='pending'),
+        'vendor_capacity_queue': (
+            BookingCapacityRequest.objects.filter(package__vendor=vendor, status='pending')
+            .order_by('-created_at')[:5]
+        ),
+        'payment_log_page': PaymentLog.objects.order_by('-created_at', '-id')[:50],
+        'package_reviews': Review.objects.filter(package=package).order_by('-created_at', '-id')[:11],
+    }
@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count
+
+from ..models import Review, TravelPackage
+from .package_detail import bump_package_detail_version
+
+
+RATING_SCALE = 5
+
+
+def _normalize_rating_histogram(histogram):
+    histogram = [int(count) for count in (histogram or [])][:RATING_SCALE]
+    return histogram + [0] * (RATING_SCALE - len(histogram))
+
+
+def _build_rating_stats(histogram):
+    histogram = _normalize_rating_histogram(histogram)
+    rating_count = sum(histogram)
+    rating_total = sum(stars * count for stars, count in enumerate(histogram, start=1))
+    rating_avg = (Decimal(rating_total) / rating_count).quantize(Decimal('0.01')) if rating_count else Decimal('0')
+    return {
+        'rating_avg': rating_avg,
+        'rating_count': rating_count,
+        'rating_histogram': histogram,
+    }
+
+
+def build_rating_histogram_rows(package):
+    histogram = _normalize_rating_histogram(package.rating_histogram)
+    return [
+        {
+            'stars': stars,
+            'count': histogram[stars - 1],
+            'percent': round(histogram[stars - 1] * 100 / package.rating_count) if package.rating_count else 0,
+        }
+        for stars in range(RATING_SCALE, 0, -1)
+    ]
+
+
+def _apply_package_rating_delta(package_id, rating, delta):
+    if not 1 <= rating <= RATING_SCALE:
+        return
+
+    with transaction.atomic():
+        histogram = _normalize_rating_histogram(
+            TravelPackage.objects.select_for_update()
+            .values_list('rating_histogram', flat=True)
+            .get(pk=package_id)
+        )
+        histogram[rating - 1] = max(histogram[rating - 1] + delta, 0)
+        TravelPackage.objects.filter(pk=package_id).update(**_build_rating_stats(histogram))
+    bump_package_detail_version(package_id)
+
+
+def _sync_package_rating_from_review(review, delta=1):
+    """Add (``delta=1``) or remove (``delta=-1``) one review from its package's rating stats."""
+    _apply_package_rating_delta(review.package_id, review.rating, delta)
+
+
+def rebuild_package_rating_stats(package_ids=None):
+    """Recompute rating stats from the reviews table; returns how many packages were written."""
+    packages = TravelPackage.objects.order_by('id')
+    if package_ids is not None:
+        packages = packages.filter(id__in=package_ids)
+
+    histograms = {}
+    rows = (
+        Review.objects.filter(package__in=packages, rating__gte=1, rating__lte=RATING_SCALE)
+        .order_by()
+        .values_list('package_id', 'rating')
+        .annotate(count=Count('id'))
+    )
+    for package_id, rating, count in rows:
+        histograms.setdefault(package_id, [0] * RATING_SCALE)[rating - 1] = count
+
+    updated = []
+    for package in packages.only('id').iterator():
+        stats = _build_rating_stats(histograms.get(package.id))
+        for field, value in stats.items():
+            setattr(package, field, value)
+        updated.append(package)
+    TravelPackage.objects.bulk_update(updated, ['rating_avg', 'rating_count', 'rating_histogram'], batch_size=500)
+    for package in updated:
+        bump_package_detail_version(package.id)
+    return len(updated)
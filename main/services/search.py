@@ -0,0 +1,125 @@
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from ..models import PackageDayOption, PackageSearchToken, TravelPackage
+
+
+SEARCH_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+SEARCH_TOKEN_MIN_LENGTH = 2
+SEARCH_TOKEN_MAX_LENGTH = 64
+SEARCH_MAX_QUERY_TERMS = 6
+
+# Field weights used when ranking matches; a hit in the name beats a hit buried in the description.
+SEARCH_FIELD_WEIGHTS = {
+    'name': 8,
+    'location': 5,
+    'travel_type': 5,
+    'vendor_name': 3,
+    'option_titles': 2,
+    'description': 1,
+}
+
+
+def _tokenize(text):
+    return [
+        token[:SEARCH_TOKEN_MAX_LENGTH]
+        for token in SEARCH_TOKEN_PATTERN.findall((text or '').lower())
+        if len(token) >= SEARCH_TOKEN_MIN_LENGTH
+    ]
+
+
+def _build_package_search_weights(package, option_titles=None):
+    if option_titles is None:
+        option_titles = PackageDayOption.objects.filter(
+            package_day__package=package,
+        ).values_list('title', flat=True)
+
+    sources = {
+        'name': package.name,
+        'location': package.location,
+        'travel_type': package.travel_type,
+        'vendor_name': package.vendor.name,
+        'option_titles': ' '.join(option_titles),
+        'description': package.description,
+    }
+
+    weights = Counter()
+    for field, text in sources.items():
+        for token in set(_tokenize(text)):
+            weights[token] += SEARCH_FIELD_WEIGHTS[field]
+    return weights
+
+
+def _sync_package_search_index(package):
+    weights = _build_package_search_weights(package)
+    with transaction.atomic():
+        PackageSearchToken.objects.filter(package=package).delete()
+        PackageSearchToken.objects.bulk_create([
+            PackageSearchToken(package=package, token=token, weight=weight)
+            for token, weight in weights.items()
+        ])
+
+
+def rebuild_package_search_index(queryset=None, batch_size=500):
+    queryset = queryset if queryset is not None else TravelPackage.objects.all()
+    packages = queryset.select_related('vendor').order_by('id')
+    indexed = 0
+
+    batch = []
+    for package in packages.iterator(chunk_size=batch_size):
+        batch.append(package)
+        if len(batch) >= batch_size:
+            indexed += _index_package_batch(batch)
+            batch = []
+    if batch:
+        indexed += _index_package_batch(batch)
+    return indexed
+
+
+def _index_package_batch(packages):
+    option_titles = {}
+    for package_id, title in PackageDayOption.objects.filter(
+        package_day__package__in=packages,
+    ).values_list('package_day__package_id', 'title'):
+        option_titles.setdefault(package_id, []).append(title)
+
+    tokens = []
+    for package in packages:
+        weights = _build_package_search_weights(package, option_titles.get(package.id, []))
+        tokens.extend(
+            PackageSearchToken(package=package, token=token, weight=weight)
+            for token, weight in weights.items()
+        )
+
+    with transaction.atomic():
+        PackageSearchToken.objects.filter(package__in=packages).delete()
+        PackageSearchToken.objects.bulk_create(tokens, batch_size=1000)
+    return len(packages)
+
+
+def search_packages(query, queryset=None):
+    """Return ``queryset`` narrowed to packages matching every query term, best matches first.
+
+    Terms are prefix-matched against the token index, so "trek" finds "trekking".
+    Each match carries a ``search_rank`` annotation summed from the field weights.
+    """
+    queryset = queryset if queryset is not None else TravelPackage.objects.all()
+    terms = list(dict.fromkeys(_tokenize(query)))[:SEARCH_MAX_QUERY_TERMS]
+    if not terms:
+        return queryset.order_by('-created_at')
+
+    for term in terms:
+        queryset = queryset.filter(
+            id__in=PackageSearchToken.objects.filter(token__startswith=term).values('package_id')
+        )
+
+    rank_filter = Q()
+    for term in terms:
+        rank_filter |= Q(search_tokens__token__startswith=term)
+
+    return queryset.annotate(
+        search_rank=Sum('search_tokens__weight', filter=rank_filter),
+    ).order_by('-search_rank', '-created_at', '-id')
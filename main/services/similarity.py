@@ -0,0 +1,209 @@
+import math
+import zlib
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+
+from ..models import PackageDayOption, PackageSimilarityVector, TravelPackage, normalize_facet_value
+
+
+SIMILARITY_HASH_BUCKETS = 64
+SIMILARITY_PRICE_BANDS = 10
+SIMILARITY_PRICE_BASE = 500
+SIMILARITY_DURATION_BANDS = (2, 4, 7, 10, 14)
+SIMILARITY_OPTION_TYPES = tuple(value for value, _ in PackageDayOption.OPTION_TYPE_CHOICES)
+SIMILAR_PACKAGES_CACHE_TTL = 60 * 60
+# Seconds a worker trusts its last look at the vector table before checking it again.
+SIMILARITY_VERSION_CHECK_INTERVAL = 30
+
+# Same priorities as the old scoring query: travel type, then location, then price.
+# Each block is scaled by sqrt(weight) so a perfect match on it adds exactly ``weight``.
+SIMILARITY_FEATURE_WEIGHTS = {
+    'travel_type': 3.0,
+    'location': 2.0,
+    'price': 1.0,
+    'duration': 1.0,
+    'options': 1.0,
+}
+
+_SIMILARITY_VERSION_KEY = 'package-similarity-version'
+_index = {'version': None, 'package_ids': np.empty(0, dtype=np.int64), 'matrix': None, 'rows': {}}
+
+
+def _hashed_one_hot(value):
+    block = np.zeros(SIMILARITY_HASH_BUCKETS, dtype=np.float32)
+    value = normalize_facet_value(value)
+    if value:
+        block[zlib.crc32(value.encode('utf-8')) % SIMILARITY_HASH_BUCKETS] = 1.0
+    return block
+
+
+def _banded(position, size):
+    # Neighbouring bands count half, so a package just across a band edge still scores.
+    block = np.zeros(size, dtype=np.float32)
+    block[position] = 1.0
+    if position > 0:
+        block[position - 1] = 0.5
+    if position < size - 1:
+        block[position + 1] = 0.5
+    return block / np.linalg.norm(block)
+
+
+def _price_band(price):
+    band = int(math.log2(max(float(price), 1) / SIMILARITY_PRICE_BASE)) if price else 0
+    return min(max(band, 0), SIMILARITY_PRICE_BANDS - 1)
+
+
+def _duration_band(start_date, end_date):
+    days = (end_date - start_date).days + 1 if start_date and end_date else 0
+    return sum(1 for edge in SIMILARITY_DURATION_BANDS if days > edge)
+
+
+def _build_feature_vector(package, option_counts):
+    options = np.array([option_counts.get(option_type, 0) for option_type in SIMILARITY_OPTION_TYPES], dtype=np.float32)
+    if options.any():
+        options /= np.linalg.norm(options)
+
+    blocks = {
+        'travel_type': _hashed_one_hot(package.travel_type),
+        'location': _hashed_one_hot(package.location),
+        'price': _banded(_price_band(package.price), SIMILARITY_PRICE_BANDS),
+        'duration': _banded(_duration_band(package.start_date, package.end_date), len(SIMILARITY_DURATION_BANDS) + 1),
+        'options': options,
+    }
+    return np.concatenate([
+        blocks[name] * np.float32(math.sqrt(weight))
+        for name, weight in SIMILARITY_FEATURE_WEIGHTS.items()
+    ]).astype(np.float32)
+
+
+def _load_option_counts(package_ids):
+    option_counts = {}
+    rows = (
+        PackageDayOption.objects.filter(package_day__package_id__in=package_ids)
+        .order_by()
+        .values_list('package_day__package_id', 'option_type')
+        .annotate(count=Count('id'))
+    )
+    for package_id, option_type, count in rows:
+        option_counts.setdefault(package_id, {})[option_type] = count
+    return option_counts
+
+
+def _get_similarity_version():
+    # The version is read from the vector table, so a worker whose cache is not shared still
+    # notices another worker's writes once its cached copy expires: writes move the latest
+    # timestamp and deletions the row count.
+    version = cache.get(_SIMILARITY_VERSION_KEY)
+    if version is None:
+        stats = PackageSimilarityVector.objects.aggregate(count=Count('id'), latest=Max('updated_at'))
+        latest = stats['latest'].timestamp() if stats['latest'] else 0
+        version = f"{stats['count']}:{latest}"
+        cache.set(_SIMILARITY_VERSION_KEY, version, SIMILARITY_VERSION_CHECK_INTERVAL)
+    return version
+
+
+def _expire_similarity_version():
+    cache.delete(_SIMILARITY_VERSION_KEY)
+
+
+def sync_package_similarity(package_id):
+    """Recompute one package's vector, or drop it when the package is no longer listed."""
+    package = TravelPackage.objects.filter(pk=package_id, moderation_status='approved').first()
+    if package is None:
+        PackageSimilarityVector.objects.filter(package_id=package_id).delete()
+    else:
+        vector = _build_feature_vector(package, _load_option_counts([package_id]).get(package_id, {}))
+        PackageSimilarityVector.objects.update_or_create(package_id=package_id, defaults={'vector': vector.tobytes()})
+    _expire_similarity_version()
+
+
+def rebuild_package_similarity_index():
+    """Recompute every approved package's vector in bulk; returns how many were written."""
+    packages = list(
+        TravelPackage.objects.filter(moderation_status='approved')
+        .only('id', 'travel_type', 'location', 'price', 'start_date', 'end_date')
+        .order_by('id')
+    )
+    option_counts = _load_option_counts([package.id for package in packages])
+    vectors = [
+        PackageSimilarityVector(
+            package_id=package.id,
+            vector=_build_feature_vector(package, option_counts.get(package.id, {})).tobytes(),
+        )
+        for package in packages
+    ]
+    with transaction.atomic():
+        PackageSimilarityVector.objects.all().delete()
+        PackageSimilarityVector.objects.bulk_create(vectors, batch_size=500)
+    _expire_similarity_version()
+    return len(vectors)
+
+
+def _get_similarity_index():
+    global _index
+
+    version = _get_similarity_version()
+    if _index['version'] == version:
+        return _index
+
+    rows = list(PackageSimilarityVector.objects.order_by('package_id').values_list('package_id', 'vector'))
+    package_ids = np.array([package_id for package_id, _ in rows], dtype=np.int64)
+    matrix = np.vstack([np.frombuffer(bytes(vector), dtype=np.float32) for _, vector in rows]) if rows else None
+    # Swap the whole dict in one assignment so concurrent readers never see a half-built index.
+    _index = {
+        'version': version,
+        'package_ids': package_ids,
+        'matrix': matrix,
+        'rows': {int(package_id): row for row, package_id in enumerate(package_ids)},
+    }
+    return _index
+
+
+def rank_similar_package_ids(package, limit=3):
+    """Return the IDs of the ``limit`` listed packages whose vectors score highest against ``package``.
+
+    Scoring is a single matrix-vector product over the in-process index, which is only
+    reloaded when the vector table's row count or latest write time changes; that check
+    runs at most every ``SIMILARITY_VERSION_CHECK_INTERVAL`` seconds per worker.
+    """
+    index = _get_similarity_index()
+    if index['matrix'] is None or limit <= 0:
+        return []
+
+    row = index['rows'].get(package.id)
+    if row is not None:
+        vector = index['matrix'][row]
+    else:
+        vector = _build_feature_vector(package, _load_option_counts([package.id]).get(package.id, {}))
+
+    scores = index['matrix'] @ vector
+    if row is not None:
+        scores[row] = -np.inf
+    limit = min(limit, len(scores) - (row is not None))
+    if limit <= 0:
+        return []
+
+    # Partition to the k-th best score, keep everything tied with it, and only sort that
+    # handful: highest score first, newer (higher ID) package first among equal scores.
+    threshold = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+    candidates = np.flatnonzero(scores >= threshold)
+    ordered = candidates[np.lexsort((-index['package_ids'][candidates], -scores[candidates]))][:limit]
+    return [int(package_id) for package_id in index['package_ids'][ordered]]
+
+
+def get_similar_packages(package, limit=3):
+    """Return up to ``limit`` similar listed packages, cached until any package's vector changes."""
+    cache_key = f'similar-packages:{package.id}:{limit}:{_get_similarity_version()}'
+    similar_packages = cache.get(cache_key)
+    if similar_packages is None:
+        package_ids = rank_similar_package_ids(package, limit=limit)
+        packages_by_id = TravelPackage.objects.select_related('vendor').filter(
+            id__in=package_ids,
+            moderation_status='approved',
+        ).in_bulk()
+        similar_packages = [packages_by_id[package_id] for package_id in package_ids if package_id in packages_by_id]
+        cache.set(cache_key, similar_packages, SIMILAR_PACKAGES_CACHE_TTL)
+    return similar_packages
@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+from ..models import TravelPackage
+
+
+SPONSORED_PLACEMENTS_CACHE_KEY = 'sponsorship:active-placements'
+SPONSORED_PLACEMENTS_CACHE_TTL = 60 * 60
+
+
+def _sponsored_placements_queryset(today):
+    return TravelPackage.objects.select_related('vendor').filter(
+        moderation_status='approved',
+        is_sponsored=True,
+        sponsorship_start__isnull=False,
+        sponsorship_end__isnull=False,
+        sponsorship_start__lte=today,
+        sponsorship_end__gte=today,
+    ).order_by('-sponsorship_amount', '-created_at')
+
+
+def _build_sponsored_placements(today):
+    packages = list(_sponsored_placements_queryset(today))
+    return {
+        'date': today.isoformat(),
+        'packages': packages,
+        'ids': [package.id for package in packages],
+        'id_set': frozenset(package.id for package in packages),
+    }
+
+
+def get_sponsored_placements():
+    """Return today's active sponsored packages, computed at most once per day or invalidation."""
+    today = timezone.now().date()
+    placements = cache.get(SPONSORED_PLACEMENTS_CACHE_KEY)
+    if placements is None or placements['date'] != today.isoformat():
+        placements = _build_sponsored_placements(today)
+        cache.set(SPONSORED_PLACEMENTS_CACHE_KEY, placements, SPONSORED_PLACEMENTS_CACHE_TTL)
+    return placements
+
+
+def invalidate_sponsored_placements():
+    cache.delete(SPONSORED_PLACEMENTS_CACHE_KEY)
+
+
+def get_active_sponsored_packages(limit=None):
+    packages = get_sponsored_placements()['packages']
+    return packages[:limit] if limit is not None else list(packages)
+
+
+def get_active_sponsored_package_ids():
+    return get_sponsored_placements()['ids']
+
+
+def is_package_sponsored_today(package_id):
+    return package_id in get_sponsored_placements()['id_set']
+
+
+def filter_sponsored_packages(queryset):
+    """Return the active sponsored packages that also match ``queryset``, in placement order."""
+    placements = get_sponsored_placements()
+    if not placements['ids']:
+        return []
+
+    matching_ids = set(queryset.filter(id__in=placements['ids']).values_list('id', flat=True))
+    return [package for package in placements['packages'] if package.id in matching_ids]
@@ -1,3 +1,4 @@
+from django.db.models import Count, Q
 from django.utils import timezone
 
 from ..forms import TripItemAttachmentForm
@@ -50,22 +51,21 @@ def _build_trip_timeline_items(trip):
     ]
 
 
-def _build_trip_progress_summary(trip):
-    counts = {
-        'total': 0,
-        'pending': 0,
-        'ready': 0,
-        'in_progress': 0,
-        'completed': 0,
-        'blocked': 0,
-        'cancelled': 0,
-        'completion_percentage': 0,
-    }
+TRIP_ITEM_STATUS_KEYS = ('pending', 'ready', 'in_progress', 'completed', 'blocked', 'cancelled')
+CLOSED_TRIP_ITEM_STATUSES = ('completed', 'cancelled')
+NEXT_ACTION_STATUS_ORDER = ('ready', 'in_progress', 'pending')
+
+
+def _trip_item_status_counts():
+    counts = {'total': Count('id')}
+    for status in TRIP_ITEM_STATUS_KEYS:
+        counts[status] = Count('id', filter=Q(status=status))
+    return counts
+
 
-    for status in trip.items.values_list('status', flat=True):
-        counts['total'] += 1
-        if status in counts:
-            counts[status] += 1
+def _build_progress_counts(row=None):
+    counts = {key: (row or {}).get(key, 0) for key in ('total', *TRIP_ITEM_STATUS_KEYS)}
+    counts['completion_percentage'] = 0
 
     if counts['total']:
         counts['completion_percentage'] = int((counts['completed'] / counts['total']) * 100)
@@ -80,9 +80,72 @@ def _build_trip_progress_summary(trip):
     return counts
 
 
+def _build_trip_progress_summary(trip):
+    return _build_progress_counts(trip.items.aggregate(**_trip_item_status_counts()))
+
+
+def _build_trip_timeline_summaries(trips):
+    """Return progress counts, next action and open items for each trip, keyed by trip id.
+
+    A lightweight alternative to ``_build_trip_timeline_items`` for list pages: status
+    counts are aggregated in the database and only open items are read, as a narrow
+    projection without attachments or forms. Costs two queries for any number of trips.
+    """
+    if not trips:
+        return {}
+
+    status_labels = dict(TripItem.STATUS_CHOICES)
+    summaries = {
+        trip.id: {'progress_summary': _build_progress_counts(), 'next_action': None, 'open_items': []}
+        for trip in trips
+    }
+
+    count_rows = (
+        TripItem.objects.filter(trip__in=trips)
+        .order_by()
+        .values('trip_id')
+        .annotate(**_trip_item_status_counts())
+    )
+    for row in count_rows:
+        summaries[row['trip_id']]['progress_summary'] = _build_progress_counts(row)
+
+    open_rows = (
+        TripItem.objects.filter(trip__in=trips)
+        .exclude(status__in=CLOSED_TRIP_ITEM_STATUSES)
+        .order_by('trip_id', 'day_number', 'sort_order', 'id')
+        .values(
+            'id',
+            'trip_id',
+            'day_number',
+            'title',
+            'description',
+            'status',
+            'action_link',
+            'action_label',
+            'selected_option__title',
+        )
+    )
+    for row in open_rows:
+        summaries[row['trip_id']]['open_items'].append({
+            'id': row['id'],
+            'day_number': row['day_number'],
+            'title': row['title'],
+            'description': row['description'],
+            'status': status_labels.get(row['status'], row['status']),
+            'status_key': row['status'],
+            'action_link': row['action_link'],
+            'action_label': row['action_label'] or 'Open Link',
+            'selected_option_title': row['selected_option__title'] or '',
+        })
+
+    for summary in summaries.values():
+        summary['next_action'] = _build_trip_next_action(summary['open_items'])
+
+    return summaries
+
+
 def _build_trip_next_action(timeline_items):
-    priority_order = ['ready', 'in_progress', 'pending']
-    for status_key in priority_order:
+    for status_key in NEXT_ACTION_STATUS_ORDER:
         for item in timeline_items:
             if item['status_key'] == status_key:
                 return item
@@ -1,7 +1,7 @@
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import EmailMessage
 
 from .access import _get_vendor_or_403, _get_vendor_user  # noqa: F401
+from .mailer import queue_email
 
 
 def send_vendor_status_email(request, vendor):
@@ -29,4 +29,4 @@ def send_vendor_status_email(request, vendor):
     else:
         return
 
-    EmailMessage(subject, body, to=[user.email]).send()
+    queue_email(subject, body, user.email)
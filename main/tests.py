@@ -1,16 +1,73 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+import tracemalloc
+from io import StringIO
 from decimal import Decimal
-from datetime import timedelta
+from datetime import date, datetime, timedelta
 
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core import mail
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocMemEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
 from .forms import BookingTravelerForm
-from .models import Booking, BookingCapacityRequest, Review, TravelPackage, UserProfile, Vendor
-from .services.capacity import can_proceed_with_capacity
-from .services.payments import _calculate_booking_pricing
+from .notifications import create_notification, create_notifications, get_unread_notification_count, mark_notification_read
+from .models import Booking, BookingCapacityRequest, BookingDispute, CapacityHold, ChatMessage, ChatThread, CustomItinerary, CustomItinerarySelection, Notification, NotificationFanout, PackageCapacityLedger, PackageDay, PackageDayOption, PackageSimilarityVector, OutboundEmail, PaymentEvent, PaymentLog, Review, TravelPackage, Trip, TripItem, UserProfile, Vendor, VendorBookingRollup
+from .services.analytics import _sync_vendor_rollup_from_booking, get_vendor_dashboard_analytics, rebuild_vendor_booking_rollups
+from .services.bookings import filter_vendor_bookings
+from .services.capacity import (
+    CapacityUnavailableError,
+    can_proceed_with_capacity,
+    get_package_capacity_summaries,
+    get_package_capacity_summary,
+    release_capacity_hold,
+    reserve_package_capacity,
+)
+from .services.chat import CHAT_MESSAGES_PER_PAGE, get_unread_chat_total, record_chat_message, wait_for_chat_messages
+from .services.dashboard import _build_traveler_dashboard
+from .services.exports import stream_booking_export_csv
+from .services.facets import get_package_facet_version
+from .services.itineraries import _sync_package_itinerary_json
+from .services.mailer import send_queued_emails
+from .services.notifications import _notify_itinerary_changed, process_notification_fanouts
+from .services.package_detail import PACKAGE_REVIEWS_PER_PAGE
+from .services.pagination import _encode_cursor
+from .services.payment_events import process_pending_payment_events
+from .services.payment_logs import filter_payment_logs, summarize_payment_logs
+from .services.payments import (
+    _calculate_booking_pricing,
+    _store_pending_payment_session,
+    confirm_booking_payment,
+    confirm_checkout_booking,
+)
+from .services.query_plans import find_sequential_scans
+from .services.ratings import _sync_package_rating_from_review, rebuild_package_rating_stats
+from .services.search import _sync_package_search_index, search_packages
+from .services.similarity import (
+    _SIMILARITY_VERSION_KEY,
+    rank_similar_package_ids,
+    rebuild_package_similarity_index,
+    sync_package_similarity,
+)
+from .services.sponsorship import get_active_sponsored_package_ids, get_sponsored_placements
+from .services.trips import (
+    _build_trip_next_action,
+    _build_trip_progress_summary,
+    _build_trip_timeline_items,
+    _build_trip_timeline_summaries,
+)
 
 
 class ReviewFlowTests(TestCase):
@@ -121,6 +178,47 @@ class ReviewFlowTests(TestCase):
         )
         self.assertContains(response, 'You already reviewed this trip.')
 
+    def _create_custom_bookings(self, count):
+        day = PackageDay.objects.create(package=self.package, day_number=1, title='Arrival', description='Check in.')
+        option = PackageDayOption.objects.create(package_day=day, option_type='stay', title='Lodge', action_link='https://example.com')
+        for _ in range(count):
+            itinerary = CustomItinerary.objects.create(
+                user=self.traveler, package=self.package, base_price=Decimal('999.00'), final_price=Decimal('999.00'),
+            )
+            CustomItinerarySelection.objects.create(
+                custom_itinerary=itinerary, package_day=day, selected_option=option, selected_price=Decimal('0.00'),
+            )
+            booking = Booking.objects.create(
+                user=self.traveler, package=self.package, custom_itinerary=itinerary,
+                total_price=Decimal('999.00'), status='trip_completed',
+            )
+            BookingDispute.objects.create(booking=booking, opened_by=self.traveler, subject='Late pickup', message='Details')
+
+    def _count_my_bookings_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('my_bookings'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_my_bookings_query_count_is_constant(self):
+        self.client.login(username='traveler', password='pass12345')
+        self._create_custom_bookings(3)
+        baseline, _ = self._count_my_bookings_queries()
+
+        older_bookings = Booking.objects.bulk_create([
+            Booking(user=self.traveler, package=self.package, total_price=Decimal('999.00'), status='trip_completed')
+            for _ in range(297)
+        ])
+        Booking.objects.filter(pk__in=[booking.pk for booking in older_bookings]).update(
+            booking_date=timezone.now() - timedelta(days=30),
+        )
+        query_count, response = self._count_my_bookings_queries()
+
+        self.assertEqual(query_count, baseline)
+        self.assertEqual(response.context['bookings'].paginator.count, 300)
+        self.assertContains(response, 'Leave Review')
+
 
 class VendorPackageDeletionTests(TestCase):
     def setUp(self):
@@ -296,8 +394,1789 @@ class VendorCapacityRequestReviewTests(TestCase):
         self.assertIn('adult_count=2', notification.target_url)
         self.assertIn('child_count=1', notification.target_url)
         self.assertIn(f'capacity_request_id={self.capacity_request.id}', notification.target_url)
+        send_queued_emails()
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(mail.outbox[0].to, [self.traveler.email])
         self.assertIn('approved', mail.outbox[0].subject.lower())
         self.assertIn(reverse('choose_payment', args=[self.package.id]), mail.outbox[0].body)
 
+
+
+class PackageSearchTests(TestCase):
+    def setUp(self):
+        self.vendor_user = User.objects.create_user(username='vendor_search', password='pass12345')
+        self.vendor_profile = UserProfile.objects.create(user=self.vendor_user, role='vendor')
+        self.vendor = Vendor.objects.create(
+            user_profile=self.vendor_profile,
+            name='Himalayan Guides',
+            description='Vendor description',
+            status='approved',
+        )
+        self.trek = self._create_package('Annapurna Trek', 'Classic teahouse route.', 'Pokhara', 'Trekking')
+        self.safari = self._create_package('Jungle Safari', 'Elephant rides near the trekking hub.', 'Chitwan', 'Wildlife')
+        self.hidden = self._create_package('Langtang Trek', 'Quiet valley.', 'Langtang', 'Trekking', moderation_status='pending')
+
+    def _create_package(self, name, description, location, travel_type, moderation_status='approved'):
+        package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name=name,
+            description=description,
+            location=location,
+            travel_type=travel_type,
+            price=Decimal('500.00'),
+            start_date=timezone.now().date() + timedelta(days=10),
+            end_date=timezone.now().date() + timedelta(days=15),
+            moderation_status=moderation_status,
+        )
+        _sync_package_search_index(package)
+        return package
+
+    def test_search_ranks_name_and_type_matches_above_description_matches(self):
+        results = list(search_packages('trek', TravelPackage.objects.filter(moderation_status='approved')))
+
+        self.assertEqual(results, [self.trek, self.safari])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_search_requires_every_term_and_indexes_vendor_and_option_titles(self):
+        day = PackageDay.objects.create(package=self.safari, day_number=1, title='Arrival', description='Check in.')
+        PackageDayOption.objects.create(package_day=day, option_type='stay', title='Riverside Lodge')
+        _sync_package_search_index(self.safari)
+
+        self.assertEqual(list(search_packages('riverside himalayan')), [self.safari])
+        self.assertEqual(list(search_packages('riverside pokhara')), [])
+
+    def test_search_results_view_excludes_unapproved_packages(self):
+        response = self.client.get(reverse('search_results'), {'q': 'langtang'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Langtang Trek')
+        self.assertContains(response, 'No travel packages found')
+
+
+class SponsoredPlacementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_user(username='admin_sponsor', password='pass12345')
+        UserProfile.objects.create(user=self.admin_user, role='admin')
+        self.vendor_user = User.objects.create_user(username='vendor_sponsor', password='pass12345')
+        self.vendor_profile = UserProfile.objects.create(user=self.vendor_user, role='vendor')
+        self.vendor = Vendor.objects.create(
+            user_profile=self.vendor_profile,
+            name='Sponsor Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        today = timezone.now().date()
+        self.sponsored = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Featured Rafting',
+            description='Package description',
+            location='Trishuli',
+            travel_type='Adventure',
+            price=Decimal('300.00'),
+            start_date=today + timedelta(days=10),
+            end_date=today + timedelta(days=12),
+            is_sponsored=True,
+            sponsorship_start=today - timedelta(days=1),
+            sponsorship_end=today + timedelta(days=5),
+            sponsorship_amount=Decimal('150.00'),
+        )
+        self.organic = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Plain Hike',
+            description='Package description',
+            location='Nagarkot',
+            travel_type='Hiking',
+            price=Decimal('100.00'),
+            start_date=today + timedelta(days=10),
+            end_date=today + timedelta(days=12),
+        )
+
+    def test_package_list_reuses_cached_placements(self):
+        self.client.get(reverse('package_list'))
+
+        # Organic count + page, plus one grouped capacity query for the sponsored cards.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('package_list'))
+
+        self.assertEqual(list(response.context['sponsored_packages']), [self.sponsored])
+        self.assertEqual(list(response.context['packages']), [self.organic])
+
+    def test_moderation_change_evicts_cached_placements(self):
+        self.assertEqual(get_active_sponsored_package_ids(), [self.sponsored.id])
+        self.client.login(username='admin_sponsor', password='pass12345')
+
+        self.client.post(reverse('update_package_moderation', args=[self.sponsored.id, 'rejected']))
+
+        self.assertEqual(get_sponsored_placements()['ids'], [])
+
+
+class PackageListCursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.vendor_user = User.objects.create_user(username='vendor_cursor', password='pass12345')
+        self.vendor_profile = UserProfile.objects.create(user=self.vendor_user, role='vendor')
+        self.vendor = Vendor.objects.create(
+            user_profile=self.vendor_profile,
+            name='Cursor Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        created_at = timezone.now()
+        self.packages = []
+        for index in range(12):
+            package = TravelPackage.objects.create(
+                vendor=self.vendor,
+                name=f'Cursor Package {index}',
+                description='Package description',
+                location='Pokhara' if index % 2 else 'Kathmandu',
+                travel_type='Tour',
+                price=Decimal('200.00'),
+                start_date=timezone.now().date() + timedelta(days=10),
+                end_date=timezone.now().date() + timedelta(days=12),
+            )
+            # Pairs share a timestamp so the id tie-breaker is exercised.
+            TravelPackage.objects.filter(pk=package.pk).update(created_at=created_at - timedelta(minutes=index // 2))
+            self.packages.append(package)
+
+    def test_cursor_pages_follow_filters_without_count_query(self):
+        # Warm the sponsored placements and this filter's facet counts.
+        self.client.get(reverse('package_list'), {'pagination': 'cursor', 'location': 'pokhara'})
+        expected = list(
+            TravelPackage.objects.filter(location='Pokhara').order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+        with self.assertNumQueries(1):
+            first = self.client.get(reverse('package_list'), {'pagination': 'cursor', 'location': 'pokhara'})
+        first_page = first.context['cursor_page']
+        self.assertEqual([package.id for package in first.context['packages']], expected)
+        self.assertFalse(first_page['has_previous'])
+        self.assertFalse(first_page['has_next'])
+
+    def test_next_and_previous_cursors_are_stable(self):
+        expected = list(TravelPackage.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        first = self.client.get(reverse('package_list'), {'pagination': 'cursor'}).context['cursor_page']
+        second = self.client.get(reverse('package_list'), {
+            'pagination': 'cursor',
+            'cursor': first['next_cursor'],
+            'direction': 'next',
+        }).context['cursor_page']
+        back = self.client.get(reverse('package_list'), {
+            'pagination': 'cursor',
+            'cursor': second['previous_cursor'],
+            'direction': 'previous',
+        }).context['cursor_page']
+
+        self.assertEqual([package.id for package in first['object_list']], expected[:9])
+        self.assertEqual([package.id for package in second['object_list']], expected[9:])
+        self.assertFalse(second['has_next'])
+        self.assertEqual([package.id for package in back['object_list']], expected[:9])
+        self.assertFalse(back['has_previous'])
+
+    def test_invalid_cursors_fall_back_to_the_first_page(self):
+        expected = list(TravelPackage.objects.order_by('-created_at', '-id').values_list('id', flat=True))[:9]
+        newest_cursor = self.client.get(
+            reverse('package_list'), {'pagination': 'cursor'},
+        ).context['cursor_page']['next_cursor']
+        tampered = [_encode_cursor(values) for values in (['abc', 'xyz'], [{'a': 1}, 1], [None, None])]
+
+        for cursor in tampered + ['not-base64!']:
+            response = self.client.get(reverse('package_list'), {'pagination': 'cursor', 'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([package.id for package in response.context['packages']], expected)
+
+        response = self.client.get(
+            reverse('package_list'), {'pagination': 'cursor', 'sort': 'rating', 'cursor': newest_cursor},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['cursor_page']['has_previous'])
+
+
+class CatalogCapacityBadgeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.traveler = User.objects.create_user(username='traveler_badges', password='pass12345')
+        self.vendor_user = User.objects.create_user(username='vendor_badges', password='pass12345')
+        self.vendor_profile = UserProfile.objects.create(user=self.vendor_user, role='vendor')
+        self.vendor = Vendor.objects.create(
+            user_profile=self.vendor_profile,
+            name='Badge Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.packages = [
+            TravelPackage.objects.create(
+                vendor=self.vendor,
+                name=f'Badge Package {index}',
+                description='Package description',
+                location='Nepal',
+                travel_type='Tour',
+                price=Decimal('100.00'),
+                max_travelers=10,
+                start_date=timezone.now().date() + timedelta(days=10),
+                end_date=timezone.now().date() + timedelta(days=12),
+            )
+            for index in range(9)
+        ]
+
+    def _book(self, package, travelers, status='confirmed'):
+        Booking.objects.create(
+            user=self.traveler,
+            package=package,
+            total_price=Decimal('100.00'),
+            status=status,
+            number_of_travelers=travelers,
+        )
+
+    def test_bulk_summaries_match_single_package_summary(self):
+        self._book(self.packages[0], 3)
+        self._book(self.packages[0], 4, status='cancelled')
+        self._book(self.packages[1], 12)
+
+        for source in (self.packages, [package.id for package in self.packages], TravelPackage.objects.all()):
+            summaries = get_package_capacity_summaries(source)
+            for package in self.packages:
+                self.assertEqual(summaries[package.id], get_package_capacity_summary(package))
+
+    def test_catalog_counts_live_holds_like_the_detail_page(self):
+        self._book(self.packages[0], 3)
+        reserve_package_capacity(traveler=self.traveler, package=self.packages[0], number_of_travelers=5)
+        lapsed = reserve_package_capacity(traveler=self.traveler, package=self.packages[1], number_of_travelers=4)
+        CapacityHold.objects.filter(pk=lapsed.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        summaries = get_package_capacity_summaries(self.packages)
+        self.assertEqual(summaries[self.packages[0].id], get_package_capacity_summary(self.packages[0]))
+        self.assertEqual(summaries[self.packages[0].id]['remaining_capacity'], 2)
+        self.assertEqual(summaries[self.packages[1].id]['remaining_capacity'], 10)
+
+        response = self.client.get(reverse('package_list'))
+        remaining = {package.id: package.remaining_capacity for package in response.context['packages']}
+        self.assertEqual((remaining[self.packages[0].id], remaining[self.packages[1].id]), (2, 10))
+
+    def test_package_list_query_count_is_constant_for_nine_cards(self):
+        self.client.get(reverse('package_list'))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('package_list'))
+
+        for package in self.packages:
+            self._book(package, 2)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('package_list'))
+
+        self.assertEqual(len(response.context['packages']), 9)
+        self.assertTrue(all(package.remaining_capacity == 8 for package in response.context['packages']))
+        self.assertContains(response, '8 seats left', count=9)
+
+
+class PackageCapacityLedgerTests(TestCase):
+    def setUp(self):
+        self.traveler = User.objects.create_user(username='traveler_ledger', password='pass12345')
+        self.other_traveler = User.objects.create_user(username='traveler_ledger_2', password='pass12345')
+        self.vendor_user = User.objects.create_user(username='vendor_ledger', password='pass12345')
+        UserProfile.objects.create(user=self.traveler, role='traveler')
+        self.vendor_profile = UserProfile.objects.create(user=self.vendor_user, role='vendor')
+        self.vendor = Vendor.objects.create(
+            user_profile=self.vendor_profile,
+            name='Ledger Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Annapurna Circuit',
+            description='Package description',
+            location='Nepal',
+            travel_type='Trek',
+            price=Decimal('500.00'),
+            max_travelers=4,
+            start_date=timezone.now().date() + timedelta(days=20),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        self.booking = Booking.objects.create(
+            user=self.traveler,
+            package=self.package,
+            total_price=Decimal('1000.00'),
+            status='confirmed',
+            number_of_travelers=2,
+        )
+
+    def test_holds_claim_remaining_seats_until_released(self):
+        hold = reserve_package_capacity(traveler=self.traveler, package=self.package, number_of_travelers=2)
+        self.assertIsNotNone(hold)
+        self.assertIsNone(
+            reserve_package_capacity(traveler=self.other_traveler, package=self.package, number_of_travelers=1)
+        )
+        self.assertEqual(get_package_capacity_summary(self.package)['remaining_capacity'], 0)
+
+        release_capacity_hold(hold.id)
+        self.assertEqual(get_package_capacity_summary(self.package)['remaining_capacity'], 2)
+
+        CapacityHold.objects.filter(pk=hold.pk).update(status='active', expires_at=timezone.now() - timedelta(minutes=1))
+        PackageCapacityLedger.objects.filter(package=self.package).update(held_travelers=2)
+        self.assertIsNotNone(
+            reserve_package_capacity(traveler=self.other_traveler, package=self.package, number_of_travelers=2)
+        )
+        self.assertEqual(CapacityHold.objects.get(pk=hold.pk).status, 'expired')
+
+    def test_expired_hold_does_not_block_the_proceed_check(self):
+        hold = reserve_package_capacity(traveler=self.other_traveler, package=self.package, number_of_travelers=2)
+        CapacityHold.objects.filter(pk=hold.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        allowed, approved_request, summary = can_proceed_with_capacity(
+            traveler=self.traveler, package=self.package, adult_count=2, child_count=0,
+        )
+
+        self.assertTrue(allowed)
+        self.assertIsNone(approved_request)
+        self.assertEqual((summary['held_travelers'], summary['remaining_capacity']), (0, 2))
+        # Reads never lock the ledger; the next checkout releases the lapsed hold.
+        self.assertEqual(CapacityHold.objects.get(pk=hold.pk).status, 'active')
+
+    def _confirm_checkout(self, traveler, hold, reference):
+        return confirm_checkout_booking(
+            traveler,
+            {'package_id': self.package.id, 'adult_count': 2, 'total_price': '1000.00', 'capacity_hold_id': hold.id},
+            provider='stripe',
+            transaction_reference=reference,
+        )
+
+    def test_payment_after_the_hold_was_released_books_if_seats_are_still_free(self):
+        hold = reserve_package_capacity(traveler=self.other_traveler, package=self.package, number_of_travelers=2)
+        release_capacity_hold(hold.id)
+
+        booking, _, _, created = self._confirm_checkout(self.other_traveler, hold, 'cs_late_free')
+
+        self.assertTrue(created)
+        self.assertEqual(CapacityHold.objects.get(pk=hold.pk).status, 'released')
+        summary = get_package_capacity_summary(self.package)
+        self.assertEqual((summary['booked_travelers'], summary['held_travelers']), (4, 0))
+
+    def test_payment_after_the_hold_expired_and_seats_were_taken_is_flagged(self):
+        hold = reserve_package_capacity(traveler=self.other_traveler, package=self.package, number_of_travelers=2)
+        CapacityHold.objects.filter(pk=hold.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertIsNotNone(
+            reserve_package_capacity(traveler=self.traveler, package=self.package, number_of_travelers=2)
+        )
+
+        with self.assertRaises(CapacityUnavailableError):
+            self._confirm_checkout(self.other_traveler, hold, 'cs_late_full')
+
+        self.assertFalse(Booking.objects.filter(user=self.other_traveler).exists())
+        flagged = PaymentLog.objects.get(transaction_reference='cs_late_full')
+        self.assertEqual((flagged.status, flagged.package), ('failed', self.package))
+        self.assertIn('Refund required', flagged.notes)
+        summary = get_package_capacity_summary(self.package)
+        self.assertEqual((summary['booked_travelers'], summary['held_travelers']), (2, 2))
+
+    def test_custom_itinerary_checkout_holds_and_converts_capacity(self):
+        itinerary = CustomItinerary.objects.create(
+            user=self.other_traveler, package=self.package, base_price=Decimal('500.00'), final_price=Decimal('500.00'),
+        )
+        self.client.force_login(self.other_traveler)
+        checkout_url = reverse('esewa_custom_itinerary_checkout', args=[itinerary.id])
+
+        too_many = self.client.post(checkout_url, {'adult_count': 3, 'child_count': 0, 'child_under_seven_count': 0})
+        self.assertRedirects(too_many, reverse('custom_itinerary_detail', args=[itinerary.id]), fetch_redirect_response=False)
+        self.assertFalse(CapacityHold.objects.exists())
+
+        self.client.post(checkout_url, {'adult_count': 2, 'child_count': 0, 'child_under_seven_count': 0})
+        hold = CapacityHold.objects.get(package=self.package)
+        self.assertEqual((hold.status, hold.number_of_travelers), ('active', 2))
+        self.assertEqual(self.client.session['pending_capacity_hold_id'], hold.id)
+
+        request = self.client.get(reverse('home')).wsgi_request
+        booking, _, is_custom, created = confirm_booking_payment(
+            request, provider='esewa', transaction_reference=request.session['pending_payment_transaction_uuid'],
+        )
+
+        self.assertTrue(is_custom and created)
+        self.assertEqual(booking.custom_itinerary, itinerary)
+        self.assertEqual(CapacityHold.objects.get(pk=hold.pk).status, 'converted')
+        summary = get_package_capacity_summary(self.package)
+        self.assertEqual((summary['held_travelers'], summary['booked_travelers']), (0, 4))
+
+    def test_vendor_status_change_updates_ledger(self):
+        self.assertEqual(get_package_capacity_summary(self.package)['booked_travelers'], 2)
+        self.client.force_login(self.vendor_user)
+
+        self.client.post(reverse('update_booking_status', args=[self.booking.id, 'cancelled']))
+        self.assertEqual(get_package_capacity_summary(self.package)['booked_travelers'], 0)
+
+        self.client.post(reverse('update_booking_status', args=[self.booking.id, 'confirmed']))
+        self.client.post(reverse('update_booking_status', args=[self.booking.id, 'trip_completed']))
+        self.assertEqual(get_package_capacity_summary(self.package)['booked_travelers'], 2)
+
+
+class PaymentConfirmationIdempotencyTests(TestCase):
+    def setUp(self):
+        self.traveler = User.objects.create_user(username='traveler_pay', password='pass12345')
+        UserProfile.objects.create(user=self.traveler, role='traveler')
+        self.vendor_user = User.objects.create_user(username='vendor_pay', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=self.vendor_user, role='vendor'),
+            name='Pay Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Chitwan Safari',
+            description='Package description',
+            location='Nepal',
+            travel_type='Safari',
+            price=Decimal('300.00'),
+            max_travelers=10,
+            start_date=timezone.now().date() + timedelta(days=20),
+            end_date=timezone.now().date() + timedelta(days=22),
+        )
+        self.client.force_login(self.traveler)
+
+    def _start_checkout(self, transaction_reference):
+        session = self.client.session
+        session.update({
+            'pending_booking_package_id': self.package.id,
+            'pending_payment_provider': 'stripe',
+            'pending_payment_transaction_uuid': transaction_reference,
+            'pending_booking_adult_count': 2,
+            'pending_booking_total_price': '600.00',
+        })
+        session.save()
+
+    def test_replayed_stripe_success_returns_the_original_booking(self):
+        self._start_checkout('cs_test_123')
+        first = self.client.get(reverse('payment_success'), {'session_id': 'cs_test_123'})
+        self.assertTemplateUsed(first, 'main/payment/payment_processing.html')
+        self.assertFalse(Booking.objects.filter(package=self.package).exists())
+        self.assertEqual(process_pending_payment_events(), 1)
+
+        self._start_checkout('cs_test_123')
+        second = self.client.get(reverse('payment_success'), {'session_id': 'cs_test_123'})
+        refreshed = self.client.get(reverse('payment_success'), {'session_id': 'cs_test_123'})
+        self.assertEqual(process_pending_payment_events(), 0)
+
+        booking = Booking.objects.get(package=self.package)
+        self.assertEqual(booking.payment_reference, 'cs_test_123')
+        for response in (second, refreshed):
+            self.assertEqual(response.context['booking'], booking)
+        self.assertEqual(PaymentLog.objects.filter(status='success', booking=booking).count(), 1)
+
+    def _esewa_callback(self, transaction_uuid, status='COMPLETE'):
+        payload = {
+            'transaction_code': '000ABC',
+            'status': status,
+            'total_amount': '600.0',
+            'transaction_uuid': transaction_uuid,
+            'product_code': 'EPAYTEST',
+            'signed_field_names': 'transaction_code,status,total_amount,transaction_uuid,product_code,signed_field_names',
+        }
+        message = ','.join(f"{field}={payload[field]}" for field in payload['signed_field_names'].split(','))
+        payload['signature'] = base64.b64encode(
+            hmac.new(settings.ESEWA_SECRET_KEY.encode(), message.encode(), hashlib.sha256).digest()
+        ).decode()
+        data = base64.b64encode(json.dumps(payload).encode()).decode()
+        return self.client.get(reverse('esewa_verify'), {'data': data})
+
+    def test_esewa_return_is_confirmed_by_the_payment_event_worker(self):
+        self._start_checkout('esewa-uuid-2')
+        session = self.client.session
+        session['pending_payment_provider'] = 'esewa'
+        session.save()
+
+        status_url = f"{reverse('payment_status')}?provider=esewa&reference=esewa-uuid-2"
+        self.assertRedirects(self._esewa_callback('esewa-uuid-2'), status_url, fetch_redirect_response=False)
+        self.assertTemplateUsed(self.client.get(status_url), 'main/payment/payment_processing.html')
+        self.assertRedirects(self._esewa_callback('esewa-uuid-2'), status_url, fetch_redirect_response=False)
+        self.assertFalse(Booking.objects.filter(package=self.package).exists())
+
+        self.assertEqual(process_pending_payment_events(), 1)
+
+        booking = Booking.objects.get(package=self.package)
+        self.assertEqual((booking.payment_provider, booking.payment_reference), ('esewa', 'esewa-uuid-2'))
+        self.assertEqual(self.client.get(status_url).context['booking'], booking)
+        self.assertEqual(PaymentLog.objects.filter(status='success', booking=booking).count(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.traveler, notification_type='payment_success').count(), 1)
+
+    def test_status_page_reports_a_payment_flagged_for_refund(self):
+        self.package.max_travelers = 1
+        self.package.save(update_fields=['max_travelers'])
+        self._start_checkout('cs_test_full')
+        self.client.get(reverse('payment_success'), {'session_id': 'cs_test_full'})
+        process_pending_payment_events()
+
+        response = self.client.get(reverse('payment_success'), {'session_id': 'cs_test_full'})
+
+        self.assertRedirects(response, reverse('package_list'), fetch_redirect_response=False)
+        self.assertFalse(Booking.objects.filter(package=self.package).exists())
+        self.assertTrue(PaymentLog.objects.filter(transaction_reference='cs_test_full', status='failed').exists())
+
+    def test_success_page_ignores_a_session_id_that_is_not_the_pending_checkout(self):
+        self._start_checkout('cs_test_123')
+        response = self.client.get(reverse('payment_success'), {'session_id': 'cs_test_other'})
+        self.assertRedirects(response, reverse('package_list'), fetch_redirect_response=False)
+
+        session = self.client.session
+        session['pending_payment_transaction_uuid'] = None
+        session.save()
+        self.client.get(reverse('payment_success'), {'session_id': 'cs_test_other'})
+
+        self.assertFalse(Booking.objects.filter(package=self.package).exists())
+        self.assertEqual(self.client.session['pending_booking_package_id'], self.package.id)
+
+    def test_confirm_booking_payment_reports_whether_it_created_the_booking(self):
+        request = self.client.get(reverse('home')).wsgi_request
+        _store_pending_payment_session(
+            request,
+            package_id=self.package.id,
+            provider='esewa',
+            transaction_uuid='esewa-uuid-1',
+            adult_count=1,
+            child_count=0,
+            child_under_seven_count=0,
+            total_price=Decimal('300.00'),
+        )
+
+        booking, _, is_custom, created = confirm_booking_payment(request, provider='esewa', transaction_reference='esewa-uuid-1')
+        replay, _, _, replay_created = confirm_booking_payment(request, provider='esewa', transaction_reference='esewa-uuid-1')
+
+        self.assertTrue(created)
+        self.assertFalse(is_custom)
+        self.assertFalse(replay_created)
+        self.assertEqual(replay, booking)
+        self.assertEqual(Booking.objects.filter(package=self.package).count(), 1)
+
+
+def _fake_stripe_checkout_event(event_id, checkout_session_id, metadata, event_type='checkout.session.completed'):
+    return {
+        'id': event_id,
+        'object': 'event',
+        'type': event_type,
+        'data': {
+            'object': {
+                'id': checkout_session_id,
+                'object': 'checkout.session',
+                'payment_status': 'paid',
+                'metadata': metadata,
+            },
+        },
+    }
+
+
+def _sign_stripe_payload(payload, secret):
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+class StripeWebhookQueueTests(TestCase):
+    def setUp(self):
+        self.traveler = User.objects.create_user(username='traveler_hook', password='pass12345')
+        UserProfile.objects.create(user=self.traveler, role='traveler')
+        self.vendor_user = User.objects.create_user(username='vendor_hook', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=self.vendor_user, role='vendor'),
+            name='Hook Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Chitwan Safari',
+            description='Package description',
+            location='Nepal',
+            travel_type='Safari',
+            price=Decimal('300.00'),
+            max_travelers=10,
+            start_date=timezone.now().date() + timedelta(days=20),
+            end_date=timezone.now().date() + timedelta(days=22),
+        )
+        self.client.force_login(self.traveler)
+
+    def _post_event(self, event, secret='whsec_test'):
+        payload = json.dumps(event)
+        return self.client.post(
+            reverse('stripe_webhook'),
+            data=payload,
+            content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=_sign_stripe_payload(payload, secret),
+        )
+
+    def _booking_event(self, event_id='evt_1'):
+        return _fake_stripe_checkout_event(event_id, 'cs_test_hook', {
+            'user_id': str(self.traveler.id),
+            'payment_type': 'booking',
+            'package_id': str(self.package.id),
+            'adult_count': '2',
+            'child_count': '0',
+            'child_under_seven_count': '0',
+            'total_price': '600.00',
+            'capacity_request_id': '',
+            'capacity_hold_id': '',
+        })
+
+    def test_webhook_only_enqueues_and_worker_confirms_once(self):
+        self.assertEqual(self._post_event(self._booking_event()).status_code, 200)
+        self.assertEqual(self._post_event(self._booking_event()).status_code, 200)
+        self.assertEqual(self._post_event(self._booking_event(), secret='whsec_wrong').status_code, 400)
+
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        self.assertFalse(Booking.objects.exists())
+
+        self.assertEqual(process_pending_payment_events(), 1)
+        self.assertEqual(process_pending_payment_events(), 0)
+
+        booking = Booking.objects.get(package=self.package)
+        self.assertEqual((booking.payment_reference, booking.number_of_travelers), ('cs_test_hook', 2))
+        self.assertEqual(PaymentEvent.objects.get().status, 'processed')
+        self.assertEqual(PaymentLog.objects.filter(status='success', booking=booking).count(), 1)
+
+        response = self.client.get(reverse('payment_success'), {'session_id': 'cs_test_hook'})
+        self.assertEqual(response.context['booking'], booking)
+
+    def test_failed_event_stays_queued_with_error(self):
+        event = self._booking_event('evt_bad')
+        event['data']['object']['metadata']['user_id'] = '0'
+        self._post_event(event)
+
+        self.assertEqual(process_pending_payment_events(), 0)
+        queued = PaymentEvent.objects.get()
+        self.assertEqual((queued.status, queued.attempts), ('pending', 1))
+        self.assertIn('known user', queued.last_error)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class PackageCapacityConcurrencyTests(TransactionTestCase):
+    def test_concurrent_reservations_never_oversell(self):
+        import threading
+
+        vendor_user = User.objects.create_user(username='vendor_race', password='pass12345')
+        vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=vendor_user, role='vendor'),
+            name='Race Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        package = TravelPackage.objects.create(
+            vendor=vendor,
+            name='Last Seats',
+            description='Package description',
+            location='Nepal',
+            travel_type='Tour',
+            price=Decimal('100.00'),
+            max_travelers=5,
+            start_date=timezone.now().date() + timedelta(days=5),
+            end_date=timezone.now().date() + timedelta(days=6),
+        )
+        travelers = [User.objects.create_user(username=f'racer_{index}', password='pass12345') for index in range(10)]
+        holds = []
+
+        def reserve(traveler):
+            try:
+                holds.append(reserve_package_capacity(traveler=traveler, package=package, number_of_travelers=1))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserve, args=(traveler,)) for traveler in travelers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len([hold for hold in holds if hold is not None]), 5)
+        self.assertEqual(get_package_capacity_summary(package)['held_travelers'], 5)
+
+
+class _CountingEmailBackend(LocMemEmailBackend):
+    def __init__(self, *args, reject=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reject = set(reject)
+        self.open_count = 0
+
+    def open(self):
+        self.open_count += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.reject.intersection(message.to):
+                raise ConnectionError('Relay rejected recipient')
+        return super().send_messages(messages)
+
+
+class OutboundEmailQueueTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin_mail', password='pass12345')
+        UserProfile.objects.create(user=self.admin_user, role='admin')
+        self.vendor_user = User.objects.create_user(username='vendor_mail', email='vendor@example.com', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=self.vendor_user, role='vendor'),
+            name='Mail Vendor',
+            description='Vendor description',
+            status='pending',
+        )
+
+    def test_vendor_review_queues_email_without_sending(self):
+        self.client.force_login(self.admin_user)
+        self.client.post(reverse('update_vendor_status', args=[self.vendor.id, 'approved']))
+
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual((queued.to_email, queued.status), ('vendor@example.com', 'pending'))
+
+        self.assertEqual(send_queued_emails(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['vendor@example.com'])
+        self.assertEqual(OutboundEmail.objects.get().status, 'sent')
+
+    def test_batch_reuses_one_connection_and_backs_off_rejected_messages(self):
+        for index in range(5):
+            OutboundEmail.objects.create(to_email=f'user{index}@example.com', subject='Hello', body='Body')
+
+        backend = _CountingEmailBackend(reject=['user3@example.com'])
+        self.assertEqual(send_queued_emails(connection=backend), (4, 1))
+        self.assertEqual(backend.open_count, 1)
+
+        deferred = OutboundEmail.objects.get(to_email='user3@example.com')
+        self.assertEqual((deferred.status, deferred.attempts), ('pending', 1))
+        self.assertGreater(deferred.next_attempt_at, timezone.now())
+        self.assertEqual(send_queued_emails(connection=backend), (0, 0))
+
+        OutboundEmail.objects.filter(pk=deferred.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_emails(), (1, 0))
+
+    def test_claimed_messages_are_leased_and_reclaimed_after_the_lease_expires(self):
+        claimed = OutboundEmail.objects.create(
+            to_email='claimed@example.com', subject='Hello', body='Body',
+            status='sending', leased_until=timezone.now() + timedelta(minutes=5),
+        )
+        abandoned = OutboundEmail.objects.create(
+            to_email='abandoned@example.com', subject='Hello', body='Body',
+            status='sending', leased_until=timezone.now() - timedelta(minutes=1),
+        )
+        statuses_at_send = []
+
+        class _RecordingBackend(_CountingEmailBackend):
+            def send_messages(self, messages):
+                statuses_at_send.append(OutboundEmail.objects.get(to_email=messages[0].to[0]).status)
+                return super().send_messages(messages)
+
+        self.assertEqual(send_queued_emails(connection=_RecordingBackend()), (1, 0))
+
+        self.assertEqual(statuses_at_send, ['sending'])
+        self.assertEqual(OutboundEmail.objects.get(pk=claimed.pk).status, 'sending')
+        abandoned.refresh_from_db()
+        self.assertEqual((abandoned.status, abandoned.attempts, abandoned.leased_until), ('sent', 1, None))
+
+
+class UnreadNotificationCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.traveler = User.objects.create_user(username='traveler_unread', password='pass12345')
+        UserProfile.objects.create(user=self.traveler, role='traveler')
+        self.client.force_login(self.traveler)
+
+    def _notify(self, dedupe_key=None):
+        return create_notification(
+            user=self.traveler,
+            title='Trip update',
+            message='Something changed.',
+            notification_type='trip_update',
+            dedupe_key=dedupe_key,
+        )
+
+    def test_counter_follows_create_read_and_mark_all(self):
+        first = self._notify('unread:first')
+        self.assertEqual(get_unread_notification_count(self.traveler.id), 1)
+
+        self._notify()
+        self._notify('unread:first')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_notification_count(self.traveler.id), 2)
+
+        mark_notification_read(first)
+        self.assertEqual(get_unread_notification_count(self.traveler.id), 1)
+        self._notify('unread:first')
+        self.assertEqual(get_unread_notification_count(self.traveler.id), 2)
+
+        self.client.post(reverse('mark_all_notifications_read'))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_notification_count(self.traveler.id), 0)
+
+    def test_partials_without_badge_skip_the_count(self):
+        self._notify()
+        cache.clear()
+
+        self.client.get(reverse('search_results'), {'q': 'nepal'})
+        self.assertIsNone(cache.get(f'notifications:unread:{self.traveler.id}'))
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Notifications (1)')
+
+
+class BulkNotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.vendor_user = User.objects.create_user(username='vendor_bulk', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=self.vendor_user, role='vendor'),
+            name='Bulk Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Manaslu Circuit',
+            description='Package description',
+            location='Nepal',
+            travel_type='Trek',
+            price=Decimal('900.00'),
+            max_travelers=500,
+            start_date=timezone.now().date() + timedelta(days=30),
+            end_date=timezone.now().date() + timedelta(days=45),
+        )
+        self.travelers = User.objects.bulk_create([
+            User(username=f'bulk_traveler_{index}') for index in range(60)
+        ])
+        Booking.objects.bulk_create([
+            Booking(user=traveler, package=self.package, total_price=Decimal('900.00'), status='confirmed')
+            for traveler in self.travelers
+        ])
+
+    def test_itinerary_change_fans_out_in_constant_queries(self):
+        # Bookings, existing dedupe keys, then the write inside its savepoint.
+        with self.assertNumQueries(5):
+            self.assertEqual(_notify_itinerary_changed(self.package), 60)
+
+        Notification.objects.filter(user=self.travelers[0]).update(is_read=True)
+        with self.assertNumQueries(5):
+            self.assertEqual(_notify_itinerary_changed(self.package), 60)
+
+        self.assertEqual(Notification.objects.filter(notification_type='trip_update').count(), 60)
+        self.assertEqual(get_unread_notification_count(self.travelers[0].id), 1)
+
+    def test_itinerary_edits_are_queued_and_written_in_batches(self):
+        self.client.login(username='vendor_bulk', password='pass12345')
+        for day_number in (1, 2):
+            self.client.post(reverse('manage_itinerary', args=[self.package.id]), {
+                'action': 'save_day',
+                'day-day_number': day_number,
+                'day-title': f'Day {day_number}',
+                'day-description': 'Trail day',
+                'day-sort_order': day_number,
+            })
+
+        self.assertEqual(PackageDay.objects.filter(package=self.package).count(), 2)
+        self.assertFalse(Notification.objects.filter(notification_type='trip_update').exists())
+        fanout = NotificationFanout.objects.get()
+        self.assertEqual((fanout.kind, fanout.status), ('itinerary_changed', 'pending'))
+
+        # The claim, three batches of 25, 25 and 10 travelers, then marking the fan-out sent.
+        with self.assertNumQueries(5 + 3 * 5 + 1):
+            self.assertEqual(process_notification_fanouts(batch_size=25), (1, 0))
+
+        self.assertEqual(Notification.objects.filter(notification_type='trip_update').count(), 60)
+        self.assertEqual(NotificationFanout.objects.get().status, 'sent')
+        self.assertEqual(process_notification_fanouts(), (0, 0))
+
+    def test_dedupe_key_owned_by_another_user_is_left_alone(self):
+        owner, other = self.travelers[:2]
+        payload = {'title': 'Hello', 'message': 'First', 'notification_type': 'vendor_alert'}
+        create_notification(user=owner, dedupe_key='shared-key', **payload)
+
+        written = create_notifications([
+            (other, {**payload, 'message': 'Second'}, 'shared-key'),
+            (other, payload, None),
+        ])
+
+        self.assertEqual(written, 1)
+        self.assertEqual(Notification.objects.get(dedupe_key='shared-key').user, owner)
+        self.assertEqual(Notification.objects.get(dedupe_key='shared-key').message, 'First')
+
+
+class TravelerDashboardReadModelTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.traveler = User.objects.create_user(username='dashboard_traveler', password='pass12345')
+        UserProfile.objects.create(user=self.traveler, role='traveler')
+        vendor_user = User.objects.create_user(username='dashboard_vendor', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=vendor_user, role='vendor'),
+            name='Dashboard Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Annapurna Base Camp',
+            description='Package description',
+            location='Nepal',
+            travel_type='Trek',
+            price=Decimal('700.00'),
+            max_travelers=500,
+            start_date=timezone.now().date() + timedelta(days=10),
+            end_date=timezone.now().date() + timedelta(days=20),
+        )
+        self.client.login(username='dashboard_traveler', password='pass12345')
+
+    def _create_trips(self, count):
+        bookings = Booking.objects.bulk_create([
+            Booking(user=self.traveler, package=self.package, total_price=Decimal('700.00'), status='confirmed')
+            for _ in range(count)
+        ])
+        trips = Trip.objects.bulk_create([
+            Trip(
+                booking=booking,
+                traveler=self.traveler,
+                vendor=self.vendor,
+                package=self.package,
+                start_date=self.package.start_date,
+            )
+            for booking in bookings
+        ])
+        TripItem.objects.bulk_create([
+            TripItem(trip=trip, day_number=day, title=f'Day {day}', status=status)
+            for trip in trips
+            for day, status in ((1, 'completed'), (2, 'ready'), (3, 'pending'))
+        ])
+
+    def _count_dashboard_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_dashboard_query_count_does_not_grow_with_trips(self):
+        self._create_trips(1)
+        baseline, _ = self._count_dashboard_queries()
+
+        self._create_trips(49)
+        query_count, response = self._count_dashboard_queries()
+
+        self.assertEqual(query_count, baseline)
+        self.assertEqual(response.context['dashboard_summary']['active_trips'], 50)
+        self.assertEqual(response.context['dashboard_summary']['upcoming_items'], 100)
+        self.assertEqual(len(response.context['next_actions']), 6)
+
+    def test_read_model_picks_ready_items_before_pending_ones(self):
+        self._create_trips(1)
+
+        with self.assertNumQueries(4):
+            dashboard = _build_traveler_dashboard(self.traveler)
+
+        card = dashboard['trip_cards'][0]
+        self.assertEqual(card['next_action']['title'], 'Day 2')
+        self.assertEqual(card['progress_summary']['completion_percentage'], 33)
+        self.assertEqual(card['progress_summary']['trip_health_label'], 'On Track')
+        self.assertEqual(dashboard['next_actions'][0]['action_label'], 'Open Link')
+
+    def test_timeline_summary_matches_full_timeline_without_loading_it(self):
+        self._create_trips(3)
+        trips = list(Trip.objects.filter(traveler=self.traveler))
+        TripItem.objects.filter(trip=trips[0], day_number=2).update(status='blocked')
+
+        with self.assertNumQueries(2):
+            summaries = _build_trip_timeline_summaries(trips)
+
+        for trip in trips:
+            timeline_items = _build_trip_timeline_items(trip)
+            self.assertEqual(summaries[trip.id]['progress_summary'], _build_trip_progress_summary(trip))
+            self.assertEqual(summaries[trip.id]['next_action']['id'], _build_trip_next_action(timeline_items)['id'])
+        self.assertEqual(summaries[trips[0].id]['progress_summary']['trip_health_label'], 'Action Needed')
+        self.assertEqual(summaries[trips[0].id]['next_action']['title'], 'Day 3')
+
+
+class VendorDashboardRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.vendor_user = User.objects.create_user(username='vendor_rollup', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=self.vendor_user, role='vendor'),
+            name='Rollup Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.traveler = User.objects.create_user(username='traveler_rollup', password='pass12345')
+        UserProfile.objects.create(user=self.traveler, role='traveler')
+        self.package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Upper Mustang',
+            description='Package description',
+            location='Nepal',
+            travel_type='Trek',
+            price=Decimal('1500.00'),
+            max_travelers=50,
+            start_date=timezone.now().date() + timedelta(days=20),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        self.bookings = []
+        for status, price in (('confirmed', '1500.00'), ('confirmed', '3000.00'), ('pending', '1500.00')):
+            booking = Booking.objects.create(user=self.traveler, package=self.package, total_price=Decimal(price), status=status)
+            _sync_vendor_rollup_from_booking(booking, previous_status=None)
+            self.bookings.append(booking)
+
+    def _rollup_snapshot(self):
+        return sorted(
+            VendorBookingRollup.objects.filter(booking_count__gt=0)
+            .values_list('package_id', 'month', 'status', 'booking_count', 'revenue')
+        )
+
+    def test_status_changes_keep_rollups_in_step_with_a_rebuild(self):
+        self.client.login(username='vendor_rollup', password='pass12345')
+        self.client.post(reverse('update_booking_status', args=[self.bookings[0].id, 'trip_completed']))
+        self.client.post(reverse('update_booking_status', args=[self.bookings[2].id, 'confirmed']))
+        self.client.login(username='traveler_rollup', password='pass12345')
+        self.client.post(reverse('cancel_booking', args=[self.bookings[1].id]), {'cancellation_reason': 'Change of plans'})
+
+        incremental = self._rollup_snapshot()
+        rebuild_vendor_booking_rollups(self.vendor.id)
+        self.assertEqual(incremental, self._rollup_snapshot())
+
+        analytics = get_vendor_dashboard_analytics(self.vendor.id)
+        self.assertEqual(analytics['total_revenue'], Decimal('3000.00'))
+        self.assertEqual(analytics['total_bookings_count'], 2)
+        self.assertEqual(analytics['dashboard_queue']['refund_requests'], 1)
+        self.assertEqual(analytics['package_booking_values'], [2])
+
+    def test_dashboard_payload_is_cached_until_a_booking_changes(self):
+        self.client.login(username='vendor_rollup', password='pass12345')
+        response = self.client.get(reverse('vendor_dashboard'))
+        self.assertEqual(response.context['dashboard_queue']['pending_bookings'], 1)
+
+        with self.assertNumQueries(0):
+            get_vendor_dashboard_analytics(self.vendor.id)
+
+        self.client.post(reverse('update_booking_status', args=[self.bookings[2].id, 'confirmed']))
+        response = self.client.get(reverse('vendor_dashboard'))
+        self.assertEqual(response.context['dashboard_queue']['pending_bookings'], 0)
+        self.assertEqual(response.context['total_revenue'], Decimal('6000.00'))
+
+    def test_revenue_chart_covers_twelve_whole_months(self):
+        this_month = timezone.localdate().replace(day=1)
+        for months_back in (11, 12):
+            index = this_month.year * 12 + this_month.month - 1 - months_back
+            VendorBookingRollup.objects.create(
+                vendor=self.vendor,
+                package=self.package,
+                month=this_month.replace(year=index // 12, month=index % 12 + 1),
+                status='confirmed',
+                booking_count=1,
+                revenue=Decimal('100.00'),
+            )
+
+        analytics = get_vendor_dashboard_analytics(self.vendor.id)
+
+        self.assertEqual(len(analytics['monthly_revenue_labels']), 2)
+        self.assertEqual(analytics['monthly_revenue_values'], [100.0, 4500.0])
+        self.assertEqual(analytics['total_revenue'], Decimal('4700.00'))
+
+
+class VendorBookingExportTests(TestCase):
+    def setUp(self):
+        self.vendor_user = User.objects.create_user(username='vendor_export', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=self.vendor_user, role='vendor'),
+            name='Export Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.traveler = User.objects.create_user(username='traveler_export', email='traveler@example.com')
+        self.package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Gokyo Lakes',
+            description='Package description',
+            location='Nepal',
+            travel_type='Trek',
+            price=Decimal('1100.00'),
+            max_travelers=500,
+            start_date=timezone.now().date() + timedelta(days=20),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+
+    def _create_bookings(self, count, status='confirmed'):
+        Booking.objects.bulk_create(
+            [Booking(user=self.traveler, package=self.package, total_price=Decimal('1100.00'), status=status) for _ in range(count)],
+            batch_size=1000,
+        )
+
+    def _peak_export_memory(self, chunk_size):
+        tracemalloc.start()
+        try:
+            rows = sum(1 for _ in stream_booking_export_csv(Booking.objects.filter(package=self.package), chunk_size=chunk_size))
+            return rows, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_export_streams_filtered_bookings(self):
+        self._create_bookings(2, status='confirmed')
+        self._create_bookings(1, status='pending')
+        self.client.login(username='vendor_export', password='pass12345')
+
+        response = self.client.get(reverse('export_vendor_bookings_csv'), {'status': 'confirmed', 'date_from': 'not-a-date'})
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('Booking ID,'))
+        self.assertIn('traveler@example.com', lines[1])
+        self.assertIn('No customization', lines[1])
+
+    @override_settings(TIME_ZONE='Asia/Kathmandu')
+    def test_date_filters_cover_whole_local_days(self):
+        day = date(2026, 3, 10)
+        local = timezone.get_current_timezone()
+        stamps = [
+            datetime(2026, 3, 9, 23, 59, tzinfo=local),
+            datetime(2026, 3, 10, 0, 0, tzinfo=local),
+            datetime(2026, 3, 10, 23, 59, tzinfo=local),
+            datetime(2026, 3, 11, 0, 0, tzinfo=local),
+        ]
+        bookings = [
+            Booking.objects.create(user=self.traveler, package=self.package, total_price=Decimal('1100.00'))
+            for _ in stamps
+        ]
+        for booking, stamp in zip(bookings, stamps):
+            Booking.objects.filter(pk=booking.pk).update(booking_date=stamp)
+
+        filtered = filter_vendor_bookings(self.vendor, date_from=day, date_to=day)
+
+        self.assertEqual(sorted(filtered.values_list('id', flat=True)), [bookings[1].id, bookings[2].id])
+        self.assertNotIn('django_datetime_cast_date', str(filtered.query))
+
+    def test_peak_memory_does_not_grow_with_row_count(self):
+        self._create_bookings(1000)
+        small_rows, small_peak = self._peak_export_memory(chunk_size=250)
+
+        self._create_bookings(7000)
+        large_rows, large_peak = self._peak_export_memory(chunk_size=250)
+
+        self.assertEqual((small_rows, large_rows), (1001, 8001))
+        self.assertLess(large_peak, small_peak * 1.5)
+
+
+class PaymentLogExplorerTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin_logs', password='pass12345')
+        UserProfile.objects.create(user=self.admin, role='admin')
+        PaymentLog.objects.bulk_create(
+            [PaymentLog(provider='stripe', payment_type='booking', status='success', amount=Decimal('100.00'), transaction_reference=f'cs_{index}') for index in range(52)] +
+            [PaymentLog(provider='esewa', payment_type='booking', status='failed', amount=Decimal('40.00'))] +
+            [PaymentLog(provider='esewa', payment_type='sponsorship', status='success', amount=Decimal('500.00'))]
+        )
+        self.client.login(username='admin_logs', password='pass12345')
+
+    def test_filters_summary_and_cursor_pages(self):
+        with self.assertNumQueries(1):
+            summary = summarize_payment_logs(filter_payment_logs(provider='esewa'))
+        self.assertEqual(summary['overall'], {'count': 2, 'total': Decimal('540.00')})
+        self.assertEqual([entry['count'] for entry in summary['by_status']], [1, 1])
+
+        response = self.client.get(reverse('manage_payment_logs'), {'provider': 'stripe', 'amount_min': '50'})
+        self.assertEqual(len(response.context['payment_logs']), 50)
+        self.assertEqual(response.context['summary']['overall']['count'], 52)
+
+        response = self.client.get(reverse('manage_payment_logs') + response.context['log_page']['next_url'])
+        self.assertEqual(len(response.context['payment_logs']), 2)
+
+        response = self.client.get(reverse('manage_payment_logs'), {'reference': 'cs_7', 'provider': 'esewa'})
+        self.assertEqual([log.transaction_reference for log in response.context['payment_logs']], ['cs_7'])
+
+    def test_exports_stream_the_filtered_logs(self):
+        response = self.client.get(reverse('export_payment_logs', args=['jsonl']), {'provider': 'esewa', 'status': 'success'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['payment_type'], row['amount']) for row in rows], [('sponsorship', '500.00')])
+
+        response = self.client.get(reverse('export_payment_logs', args=['csv']), {'payment_type': 'booking'})
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 54)
+        self.assertEqual(self.client.get(reverse('export_payment_logs', args=['xml'])).status_code, 400)
+
+    @override_settings(TIME_ZONE='Asia/Kathmandu')
+    def test_date_filters_cover_whole_local_days(self):
+        local = timezone.get_current_timezone()
+        day = date(2026, 3, 10)
+        stamps = {
+            'cs_before': datetime(2026, 3, 9, 23, 59, tzinfo=local),
+            'cs_first': datetime(2026, 3, 10, 0, 0, tzinfo=local),
+            'cs_last': datetime(2026, 3, 10, 23, 59, tzinfo=local),
+            'cs_after': datetime(2026, 3, 11, 0, 0, tzinfo=local),
+        }
+        for reference, stamp in stamps.items():
+            log = PaymentLog.objects.create(provider='stripe', payment_type='booking', status='success',
+                                            amount=Decimal('10.00'), transaction_reference=reference)
+            PaymentLog.objects.filter(pk=log.pk).update(created_at=stamp)
+
+        payment_logs = filter_payment_logs(date_from=day, date_to=day)
+
+        self.assertEqual(sorted(payment_logs.values_list('transaction_reference', flat=True)), ['cs_first', 'cs_last'])
+        self.assertNotIn('django_datetime_cast_date', str(payment_logs.query))
+
+
+class VendorBookingsConsoleTests(TestCase):
+    def setUp(self):
+        self.vendor_user = User.objects.create_user(username='vendor_console', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=self.vendor_user, role='vendor'),
+            name='Console Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.traveler = User.objects.create_user(username='traveler_console', password='pass12345')
+        self.package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Tsum Valley',
+            description='Package description',
+            location='Nepal',
+            travel_type='Trek',
+            price=Decimal('1200.00'),
+            max_travelers=500,
+            start_date=timezone.now().date() + timedelta(days=20),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        self.client.login(username='vendor_console', password='pass12345')
+
+    def _create_bookings(self, count, status='confirmed'):
+        return Booking.objects.bulk_create([
+            Booking(user=self.traveler, package=self.package, total_price=Decimal('1200.00'), status=status)
+            for _ in range(count)
+        ])
+
+    def _count_console_queries(self, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('vendor_bookings'), params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_console_pages_and_filters_without_building_forms(self):
+        self._create_bookings(3)
+        baseline, _ = self._count_console_queries()
+
+        self._create_bookings(60)
+        self._create_bookings(2, status='cancellation_requested')
+        query_count, response = self._count_console_queries()
+
+        self.assertEqual(query_count, baseline)
+        self.assertEqual(len(response.context['bookings']), 20)
+        self.assertEqual(response.context['bookings'].paginator.count, 65)
+        self.assertNotContains(response, 'Save Operations')
+
+        _, response = self._count_console_queries({'status': 'cancellation_requested', 'package': self.package.id})
+        self.assertEqual(response.context['bookings'].paginator.count, 2)
+
+    def test_detail_fragment_builds_forms_for_one_booking(self):
+        booking = self._create_bookings(1, status='cancellation_requested')[0]
+
+        response = self.client.get(reverse('vendor_booking_detail', args=[booking.id]))
+
+        self.assertContains(response, 'Save Operations')
+        self.assertContains(response, f'name="cancel-{booking.id}-vendor_committed_cost"')
+        self.assertNotContains(response, '<html')
+
+        other_vendor_user = User.objects.create_user(username='vendor_console_other', password='pass12345')
+        Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=other_vendor_user, role='vendor'),
+            name='Other Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.client.login(username='vendor_console_other', password='pass12345')
+        self.assertEqual(self.client.get(reverse('vendor_booking_detail', args=[booking.id])).status_code, 404)
+
+
+class ChatThreadPaginationTests(TestCase):
+    def setUp(self):
+        self.vendor_user = User.objects.create_user(username='vendor_chat', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=self.vendor_user, role='vendor'),
+            name='Chat Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.traveler = User.objects.create_user(username='traveler_chat', password='pass12345')
+        UserProfile.objects.create(user=self.traveler, role='traveler')
+        self.thread = ChatThread.objects.create(traveler=self.traveler, vendor=self.vendor)
+        self.client.login(username='traveler_chat', password='pass12345')
+
+    def _create_messages(self, count, sender):
+        return ChatMessage.objects.bulk_create([
+            ChatMessage(thread=self.thread, sender=sender, message=f'Message {index}')
+            for index in range(count)
+        ])
+
+    def _count_queries(self, url, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_thread_detail_reads_newest_page_and_older_on_demand(self):
+        url = reverse('chat_thread_detail', args=[self.thread.id])
+        self._create_messages(5, self.vendor_user)
+        baseline, _ = self._count_queries(url)
+
+        messages = self._create_messages(200, self.vendor_user)
+        query_count, response = self._count_queries(url)
+
+        self.assertEqual(query_count, baseline)
+        page = response.context['messages']
+        self.assertEqual(len(page), CHAT_MESSAGES_PER_PAGE)
+        self.assertEqual(page[-1].id, messages[-1].id)
+        self.assertTrue(response.context['has_older_messages'])
+
+        _, response = self._count_queries(url, {'before': response.context['older_messages_cursor']})
+        older_page = response.context['messages']
+        self.assertEqual(older_page[-1].id, page[0].id - 1)
+
+    def test_list_and_dashboard_use_denormalized_latest_message(self):
+        self._create_messages(50, self.vendor_user)
+        latest = record_chat_message(self.thread, self.vendor_user, 'See you at the trailhead   tomorrow.')
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.last_message_at, latest.created_at)
+        self.assertEqual(self.thread.last_message_preview, 'See you at the trailhead tomorrow.')
+
+        _, response = self._count_queries(reverse('chat_thread_list'))
+        thread = response.context['threads'][0]
+        self.assertEqual(thread.last_message_sender, 'vendor_chat')
+        self.assertEqual(thread.unread_count, 51)
+        self.assertContains(response, 'See you at the trailhead tomorrow.')
+
+        _, response = self._count_queries(reverse('dashboard'))
+        self.assertEqual(response.context['recent_threads'][0].unread_count, 51)
+
+
+class ChatThreadFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.vendor_user = User.objects.create_user(username='vendor_feed', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=self.vendor_user, role='vendor'),
+            name='Feed Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.traveler = User.objects.create_user(username='traveler_feed', password='pass12345')
+        UserProfile.objects.create(user=self.traveler, role='traveler')
+        self.thread = ChatThread.objects.create(traveler=self.traveler, vendor=self.vendor)
+        self.client.login(username='traveler_feed', password='pass12345')
+
+    def test_feed_returns_only_messages_after_cursor(self):
+        first = record_chat_message(self.thread, self.traveler, 'Is the lodge heated?')
+        second = record_chat_message(self.thread, self.vendor_user, 'Yes, every room.')
+        url = reverse('chat_thread_feed', args=[self.thread.id])
+
+        payload = self.client.get(url, {'after': first.id, 'timeout': 0}).json()
+        self.assertEqual([message['id'] for message in payload['messages']], [second.id])
+        self.assertFalse(payload['messages'][0]['is_own'])
+        self.assertEqual(payload['last_id'], second.id)
+
+        started = time.monotonic()
+        payload = self.client.get(url, {'after': second.id, 'timeout': 0}).json()
+        self.assertEqual(payload, {'messages': [], 'last_id': second.id})
+        self.assertLess(time.monotonic() - started, 1)
+
+        User.objects.create_user(username='traveler_feed_other', password='pass12345')
+        self.client.login(username='traveler_feed_other', password='pass12345')
+        self.assertEqual(self.client.get(url, {'timeout': 0}).status_code, 403)
+
+    def test_waiting_feed_wakes_when_a_message_is_sent(self):
+        async def scenario():
+            waiter = asyncio.ensure_future(wait_for_chat_messages(self.thread.id, 0, timeout=5))
+            await asyncio.sleep(0.2)
+            sent = await sync_to_async(record_chat_message)(self.thread, self.vendor_user, 'Pickup confirmed.')
+            started = time.monotonic()
+            delivered = await waiter
+            return sent, delivered, time.monotonic() - started
+
+        sent, delivered, waited = async_to_sync(scenario)()
+
+        self.assertEqual([message.id for message in delivered], [sent.id])
+        self.assertLess(waited, 1)
+
+
+class ChatReadCursorTests(TestCase):
+    def setUp(self):
+        self.vendor_user = User.objects.create_user(username='vendor_cursor', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=self.vendor_user, role='vendor'),
+            name='Cursor Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.traveler = User.objects.create_user(username='traveler_cursor', password='pass12345')
+        UserProfile.objects.create(user=self.traveler, role='traveler')
+        self.thread = ChatThread.objects.create(traveler=self.traveler, vendor=self.vendor)
+        self.client.login(username='traveler_cursor', password='pass12345')
+
+    def test_opening_thread_advances_cursor_with_one_update(self):
+        ChatMessage.objects.bulk_create([
+            ChatMessage(thread=self.thread, sender=self.vendor_user, message=f'Update {index}')
+            for index in range(40)
+        ])
+        self.assertEqual(get_unread_chat_total(self.traveler), 40)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('chat_thread_detail', args=[self.thread.id]))
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len([sql for sql in updates if 'main_chatthread' in sql]), 1)
+        self.assertFalse([sql for sql in updates if 'main_chatmessage' in sql])
+
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.traveler_read_cursor, self.thread.messages.order_by('-id').first().id)
+        response = self.client.get(reverse('chat_thread_list'))
+        self.assertEqual(response.context['threads'][0].unread_count, 0)
+        self.assertEqual(response.context['unread_total'], 0)
+
+    def test_unread_total_spans_threads_in_one_query(self):
+        second_package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Rara Lake',
+            description='Package description',
+            location='Nepal',
+            travel_type='Trek',
+            price=Decimal('900.00'),
+            start_date=timezone.now().date() + timedelta(days=20),
+            end_date=timezone.now().date() + timedelta(days=25),
+        )
+        second_thread = ChatThread.objects.create(traveler=self.traveler, vendor=self.vendor, package=second_package)
+        record_chat_message(self.thread, self.traveler, 'Hello')
+        record_chat_message(second_thread, self.traveler, 'Hello again')
+        record_chat_message(second_thread, self.traveler, 'Any news?')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_unread_chat_total(self.vendor_user), 3)
+        self.assertEqual(get_unread_chat_total(self.traveler), 0)
+
+        record_chat_message(second_thread, self.vendor_user, 'Confirmed.')
+        self.assertEqual(get_unread_chat_total(self.vendor_user), 1)
+        self.assertEqual(get_unread_chat_total(self.traveler), 1)
+
+
+class PackageDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        vendor_user = User.objects.create_user(username='vendor_detail', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=vendor_user, role='vendor'),
+            name='Detail Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.package = TravelPackage.objects.create(
+            vendor=self.vendor,
+            name='Upper Mustang',
+            description='Package description',
+            location='Nepal',
+            travel_type='Trek',
+            price=Decimal('1500.00'),
+            start_date=timezone.now().date() + timedelta(days=20),
+            end_date=timezone.now().date() + timedelta(days=30),
+            moderation_status='approved',
+        )
+        for day_number in range(1, 4):
+            day = PackageDay.objects.create(
+                package=self.package,
+                day_number=day_number,
+                title=f'Stage {day_number}',
+                description='Walk on.',
+            )
+            PackageDayOption.objects.create(package_day=day, option_type='stay', title=f'Teahouse {day_number}')
+        for index in range(4):
+            reviewer = User.objects.create_user(username=f'reviewer_detail_{index}', password='pass12345')
+            Review.objects.create(user=reviewer, package=self.package, rating=4 + index % 2, comment=f'Great stage {index}')
+        rebuild_package_rating_stats([self.package.id])
+        self.url = reverse('package_detail', args=[self.package.id])
+
+    def test_repeat_anonymous_view_costs_two_queries(self):
+        self.client.get(self.url)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+
+        self.assertContains(response, 'Teahouse 3')
+        self.assertContains(response, 'Great stage 2')
+        self.assertContains(response, '4.5 · 4 reviews')
+        self.assertEqual(len(response.context['customization_form'].fields), 3)
+
+    def test_itinerary_edits_and_reviews_bump_the_version(self):
+        self.client.get(self.url)
+        day = PackageDay.objects.create(package=self.package, day_number=4, title='Stage 4', description='Walk on.')
+        PackageDayOption.objects.create(package_day=day, option_type='stay', title='Teahouse 4')
+        self.assertNotContains(self.client.get(self.url), 'Teahouse 4')
+
+        _sync_package_itinerary_json(self.package)
+        self.assertContains(self.client.get(self.url), 'Teahouse 4')
+
+        reviewer = User.objects.create_user(username='reviewer_detail_late', password='pass12345')
+        review = Review.objects.create(user=reviewer, package=self.package, rating=1, comment='Too cold')
+        _sync_package_rating_from_review(review)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Too cold')
+        self.assertEqual(response.context['package'].rating_count, 5)
+
+
+class PackageRatingStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        vendor_user = User.objects.create_user(username='vendor_rating', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=vendor_user, role='vendor'),
+            name='Rating Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.packages = [
+            TravelPackage.objects.create(
+                vendor=self.vendor,
+                name=f'Rated Trek {index}',
+                description='Package description',
+                location='Nepal',
+                travel_type='Trek',
+                price=Decimal('1000.00'),
+                start_date=timezone.now().date() + timedelta(days=20),
+                end_date=timezone.now().date() + timedelta(days=30),
+                moderation_status='approved',
+            )
+            for index in range(3)
+        ]
+
+    def _review(self, package, rating, index):
+        reviewer = User.objects.create_user(username=f'rater_{package.id}_{index}', password='pass12345')
+        review = Review.objects.create(user=reviewer, package=package, rating=rating, comment=f'Review {index}')
+        _sync_package_rating_from_review(review)
+        return review
+
+    def test_incremental_stats_match_rebuild(self):
+        reviews = [self._review(self.packages[0], rating, index) for index, rating in enumerate([5, 4, 4, 2, 5])]
+        Review.objects.filter(pk=reviews[3].pk).delete()
+        _sync_package_rating_from_review(reviews[3], delta=-1)
+
+        package = TravelPackage.objects.get(pk=self.packages[0].pk)
+        self.assertEqual((package.rating_avg, package.rating_count), (Decimal('4.50'), 4))
+        self.assertEqual(package.rating_histogram, [0, 0, 0, 2, 2])
+
+        TravelPackage.objects.filter(pk=package.pk).update(rating_avg=0, rating_count=0, rating_histogram=[])
+        rebuild_package_rating_stats([package.pk])
+        rebuilt = TravelPackage.objects.get(pk=package.pk)
+        self.assertEqual(
+            (rebuilt.rating_avg, rebuilt.rating_count, rebuilt.rating_histogram),
+            (package.rating_avg, package.rating_count, package.rating_histogram),
+        )
+
+    def test_catalog_sorts_by_rating_and_reviews_page_by_cursor(self):
+        self._review(self.packages[1], 5, 0)
+        self._review(self.packages[2], 3, 0)
+        for index in range(PACKAGE_REVIEWS_PER_PAGE + 2):
+            self._review(self.packages[0], 4, index + 1)
+
+        with CaptureQueriesContext(connection) as unsorted:
+            self.client.get(reverse('package_list'))
+        cache.clear()
+        with CaptureQueriesContext(connection) as sorted_queries:
+            response = self.client.get(reverse('package_list'), {'sort': 'rating'})
+        self.assertEqual(len(sorted_queries), len(unsorted))
+        self.assertEqual([package.id for package in response.context['packages']], [
+            self.packages[1].id, self.packages[0].id, self.packages[2].id,
+        ])
+        self.assertContains(response, '4.0 (12)')
+
+        response = self.client.get(reverse('package_list'), {'sort': 'rating', 'pagination': 'cursor'})
+        self.assertEqual(response.context['packages'][0].id, self.packages[1].id)
+
+        detail_url = reverse('package_detail', args=[self.packages[0].id])
+        response = self.client.get(detail_url)
+        self.assertEqual(len(response.context['reviews']), PACKAGE_REVIEWS_PER_PAGE)
+        next_url = response.context['review_page']['next_url']
+        response = self.client.get(f'{detail_url}{next_url}')
+        self.assertEqual(len(response.context['reviews']), 2)
+
+
+class PackageSimilarityIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        vendor_user = User.objects.create_user(username='vendor_similar', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=vendor_user, role='vendor'),
+            name='Similar Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+
+    def _package(self, name, travel_type, location, price, days=7, moderation_status='approved'):
+        start_date = timezone.now().date() + timedelta(days=20)
+        return TravelPackage.objects.create(
+            vendor=self.vendor,
+            name=name,
+            description='Package description',
+            location=location,
+            travel_type=travel_type,
+            price=Decimal(price),
+            start_date=start_date,
+            end_date=start_date + timedelta(days=days - 1),
+            moderation_status=moderation_status,
+        )
+
+    def test_ranks_by_type_location_and_price_in_memory(self):
+        base = self._package('Annapurna Circuit', 'Trek', 'Pokhara', '1500.00')
+        same_trip = self._package('Annapurna Base Camp', ' trek ', 'pokhara', '1600.00')
+        same_type = self._package('Langtang Valley', 'Trek', 'Rasuwa', '1400.00')
+        same_place = self._package('Pokhara Paragliding', 'Adventure', 'Pokhara', '9000.00', days=2)
+        self._package('Hidden Trek', 'Trek', 'Pokhara', '1500.00', moderation_status='pending')
+        self.assertEqual(rebuild_package_similarity_index(), 4)
+
+        self.assertEqual(rank_similar_package_ids(base), [same_trip.id, same_type.id, same_place.id])
+        with self.assertNumQueries(0):
+            rank_similar_package_ids(base, limit=2)
+
+        response = self.client.get(reverse('compare_packages'), {'package_id': base.id})
+        self.assertEqual([package.id for package in response.context['packages']], [base.id, same_trip.id, same_type.id, same_place.id])
+
+    def test_package_changes_update_the_index_incrementally(self):
+        base = self._package('Chitwan Safari', 'Wildlife', 'Chitwan', '800.00', days=3)
+        other = self._package('Bardia Safari', 'Culture', 'Bardia', '800.00', days=3)
+        rival = self._package('Koshi Birding', 'Wildlife', 'Koshi', '800.00', days=3)
+        rebuild_package_similarity_index()
+        self.assertEqual(rank_similar_package_ids(base, limit=1), [rival.id])
+
+        TravelPackage.objects.filter(pk=other.pk).update(travel_type='Wildlife', location='Chitwan')
+        sync_package_similarity(other.id)
+        self.assertEqual(rank_similar_package_ids(base, limit=1), [other.id])
+
+        response = self.client.get(reverse('package_detail', args=[base.id]))
+        self.assertEqual([package.id for package in response.context['similar_packages']], [other.id, rival.id])
+        self.assertContains(response, 'You may also like')
+
+        TravelPackage.objects.filter(pk=other.pk).update(moderation_status='rejected')
+        sync_package_similarity(other.id)
+        self.assertEqual(rank_similar_package_ids(base), [rival.id])
+
+    def test_index_reloads_after_a_write_from_another_worker(self):
+        base = self._package('Chitwan Safari', 'Wildlife', 'Chitwan', '800.00', days=3)
+        rival = self._package('Koshi Birding', 'Wildlife', 'Koshi', '800.00', days=3)
+        rebuild_package_similarity_index()
+        self.assertEqual(rank_similar_package_ids(base, limit=1), [rival.id])
+
+        # Another worker drops the vector; nothing in this process is told about it.
+        PackageSimilarityVector.objects.filter(package=rival).delete()
+        self.assertEqual(rank_similar_package_ids(base, limit=1), [rival.id])
+
+        # The worker's cached version lapses after SIMILARITY_VERSION_CHECK_INTERVAL.
+        cache.delete(_SIMILARITY_VERSION_KEY)
+        self.assertEqual(rank_similar_package_ids(base, limit=1), [])
+
+
+class PackageFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_user(username='admin_facets', password='pass12345')
+        UserProfile.objects.create(user=self.admin_user, role='admin')
+        vendor_user = User.objects.create_user(username='vendor_facets', password='pass12345')
+        self.vendor = Vendor.objects.create(
+            user_profile=UserProfile.objects.create(user=vendor_user, role='vendor'),
+            name='Facet Vendor',
+            description='Vendor description',
+            status='approved',
+        )
+        self.lakeside = self._package('Lakeside Stay', 'Leisure', 'Pokhara', '800.00', days=3)
+        self.trek = self._package('Annapurna Trek', 'Trekking', ' pokhara ', '1800.00', days=10)
+        self.city = self._package('Heritage Walk', 'Culture', 'Kathmandu', '1200.00', days=2, start_in=120)
+        day = PackageDay.objects.create(package=self.trek, day_number=1, title='Arrive', description='Arrive')
+        PackageDayOption.objects.create(package_day=day, option_type='stay', title='Temple Tree Resort')
+        PackageDayOption.objects.create(package_day=day, option_type='flight', title='Kathmandu to Pokhara')
+
+    def _package(self, name, travel_type, location, price, days=5, start_in=10):
+        start_date = timezone.now().date() + timedelta(days=start_in)
+        return TravelPackage.objects.create(
+            vendor=self.vendor,
+            name=name,
+            description='Package description',
+            location=location,
+            travel_type=travel_type,
+            price=Decimal(price),
+            start_date=start_date,
+            end_date=start_date + timedelta(days=days - 1),
+        )
+
+    def _facet_counts(self, response, name):
+        facet = next(facet for facet in response.context['facets'] if facet['name'] == name)
+        return {option['value']: option['count'] for option in facet['values']}
+
+    def test_facets_count_each_group_against_the_other_filters(self):
+        response = self.client.get(reverse('package_list'), {'location': 'POKHARA'})
+
+        self.assertEqual({package.id for package in response.context['packages']}, {self.lakeside.id, self.trek.id})
+        self.assertEqual(self._facet_counts(response, 'location'), {'pokhara': 2, 'kathmandu': 1})
+        self.assertEqual(self._facet_counts(response, 'price_bucket'), {'under-1000': 1, '1000-2500': 1})
+        self.assertEqual(self._facet_counts(response, 'duration'), {'short': 1, 'two-weeks': 1})
+        self.assertEqual(self._facet_counts(response, 'departure'), {'30-days': 2})
+        self.assertEqual(self._facet_counts(response, 'option_type'), {'flight': 1, 'stay': 1})
+        self.assertContains(response, 'aria-current="true"')
+
+        response = self.client.get(reverse('package_list'), {'hotel__name': 'temple tree', 'duration': 'two-weeks'})
+        self.assertEqual([package.id for package in response.context['packages']], [self.trek.id])
+        response = self.client.get(reverse('package_list'), {'departure': '6-months', 'option_type': 'stay'})
+        self.assertEqual(list(response.context['packages']), [])
+
+        # Exact facets filter on the indexed normalized columns rather than LIKE scans.
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('package_list'), {'location': 'Kathmandu', 'travel_type': 'culture'})
+        self.assertTrue(queries.captured_queries)
+        self.assertFalse([query for query in queries.captured_queries if 'LIKE' in query['sql']])
+
+    def test_facet_counts_are_cached_until_a_package_changes(self):
+        self.client.get(reverse('package_list'), {'travel_type': 'trekking'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('package_list'), {'travel_type': 'trekking'})
+        self.assertEqual(self._facet_counts(response, 'travel_type'), {'culture': 1, 'leisure': 1, 'trekking': 1})
+        self.assertFalse([query for query in queries.captured_queries if 'main_packagedayoption' in query['sql']])
+
+        self.client.login(username='admin_facets', password='pass12345')
+        self.client.post(reverse('update_package_moderation', args=[self.city.id, 'rejected']))
+
+        response = self.client.get(reverse('package_list'), {'travel_type': 'trekking'})
+        self.assertEqual(self._facet_counts(response, 'travel_type'), {'leisure': 1, 'trekking': 1})
+
+    def test_django_admin_itinerary_edits_refresh_the_catalog(self):
+        User.objects.create_superuser(username='root_facets', password='pass12345')
+        self.client.login(username='root_facets', password='pass12345')
+        option = PackageDayOption.objects.get(title='Temple Tree Resort')
+        self.client.get(reverse('package_list'), {'travel_type': 'trekking'})
+        facet_version = get_package_facet_version()
+
+        response = self.client.post(reverse('admin:main_packagedayoption_change', args=[option.id]), {
+            'package_day': option.package_day_id,
+            'option_type': 'stay',
+            'title': 'Fishtail Lodge',
+            'additional_cost': '0',
+            'is_required': 'on',
+            'sort_order': '0',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(get_package_facet_version(), facet_version)
+        self.assertEqual(list(search_packages('fishtail')), [self.trek])
+        self.trek.refresh_from_db()
+        self.assertIn('Fishtail Lodge', self.trek.itinerary[0]['inclusions'])
+
+        self.client.post(reverse('admin:main_packageday_delete', args=[option.package_day_id]), {'post': 'yes'})
+        self.trek.refresh_from_db()
+        self.assertEqual(self.trek.itinerary, [])
+        self.assertEqual(list(search_packages('fishtail')), [])
+
+
+class QueryPlanTests(TestCase):
+    def test_key_queries_avoid_sequential_scans_on_seeded_data(self):
+        output = StringIO()
+        call_command(
+            'check_query_plans',
+            vendors=5, travelers=40, packages=400, bookings=2000, min_rows=0,
+            stdout=output,
+        )
+
+        self.assertIn('catalog_page: ok', output.getvalue())
+        self.assertIn('All key queries use indexes.', output.getvalue())
+        self.assertFalse(TravelPackage.objects.exists())
+
+    def test_unindexed_filter_is_reported_as_a_sequential_scan(self):
+        self.assertEqual(find_sequential_scans(Booking.objects.filter(total_price__gt=100)), ['main_booking'])
+        self.assertEqual(find_sequential_scans(Booking.objects.filter(package_id=1, status='confirmed')), [])
@@ -14,6 +14,7 @@ urlpatterns = [
     path('management/cancellations/', views.manage_cancellation_requests, name='manage_cancellation_requests'),
     path('management/cancellations/<int:booking_id>/<str:decision>/', views.finalize_cancellation_request, name='finalize_cancellation_request'),
     path('management/payments/', views.manage_payment_logs, name='manage_payment_logs'),
+    path('management/payments/export/<str:export_format>/', views.export_payment_logs, name='export_payment_logs'),
     path('management/disputes/', views.manage_booking_disputes, name='manage_booking_disputes'),
     path('management/disputes/<int:dispute_id>/<str:new_status>/', views.update_booking_dispute, name='update_booking_dispute'),
     path('management/packages/', views.manage_package_moderation, name='manage_package_moderation'),
@@ -15,5 +15,7 @@ urlpatterns = [
     path('payment/esewa-checkout/sponsorship/<int:package_id>/', views.esewa_sponsorship_checkout, name='esewa_sponsorship_checkout'),
     path('payment/esewa-verify/', views.esewa_verify, name='esewa_verify'),
     path('payment-success/', views.payment_success, name='payment_success'),
+    path('payment/status/', views.payment_status, name='payment_status'),
     path('payment-cancelled/', views.payment_cancelled, name='payment_cancelled'),
+    path('payment/webhooks/stripe/', views.stripe_webhook, name='stripe_webhook'),
 ]
@@ -11,6 +11,7 @@ urlpatterns = [
     path('chat/', views.chat_thread_list, name='chat_thread_list'),
     path('chat/open/package/<int:package_id>/', views.chat_thread_open, name='chat_thread_open'),
     path('chat/thread/<int:thread_id>/', views.chat_thread_detail, name='chat_thread_detail'),
+    path('chat/thread/<int:thread_id>/feed/', views.chat_thread_feed, name='chat_thread_feed'),
     path('my-bookings/', views.my_bookings, name='my_bookings'),
     path('notifications/', views.notification_list, name='notification_list'),
     path('notifications/<int:notification_id>/open/', views.mark_notification_read_view, name='mark_notification_read'),
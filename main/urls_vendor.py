@@ -14,6 +14,8 @@ urlpatterns = [
     path('vendor/booking/<int:booking_id>/update/<str:new_status>/', views.update_booking_status, name='update_booking_status'),
     path('vendor/booking/<int:booking_id>/operations/', views.update_booking_operations, name='update_booking_operations'),
     path('vendor/booking/<int:booking_id>/cancellation-review/', views.review_cancellation_request, name='review_cancellation_request'),
+    path('vendor/booking/<int:booking_id>/detail/', views.vendor_booking_detail, name='vendor_booking_detail'),
+    path('vendor/bookings/export/csv/', views.export_vendor_bookings_csv, name='export_vendor_bookings_csv'),
     path('vendor/booking/<int:booking_id>/csv/', views.export_booking_csv, name='export_booking_csv'),
     path('vendor/flights/', views.flight_bookings, name='flight_bookings'),
     path('vendor/packages/', views.vendor_package_list, name='vendor_package_list'),
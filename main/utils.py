@@ -1,9 +1,9 @@
 # utils.py
 import secrets
 from django.conf import settings
-from django.core.mail import send_mail
 from django.utils import timezone
 from .models import EmailOTP
+from .services.mailer import queue_email
 
 def generate_otp():
     return f"{secrets.randbelow(900000) + 100000}"
@@ -13,10 +13,9 @@ def send_otp(email, user=None):
     expires_at = timezone.now() + timezone.timedelta(minutes=10)
     EmailOTP.objects.filter(email=email).delete()
     EmailOTP.objects.create(user=user, email=email, otp=otp, expires_at=expires_at)
-    send_mail(
+    queue_email(
         'Your OTP Code',
         f'Your OTP code is {otp}. It will expire in 10 minutes.',
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=False,
+        email,
+        from_email=settings.DEFAULT_FROM_EMAIL,
     )
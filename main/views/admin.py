@@ -2,14 +2,14 @@ from decimal import Decimal
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseBadRequest
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 
 from django.contrib.auth import get_user_model
 
 from ..decorators import role_required
-from ..models import Booking, BookingDispute, PaymentLog, TravelPackage, UserProfile, Vendor
+from ..models import Booking, BookingDispute, PaymentLog, Review, TravelPackage, UserProfile, Vendor
 from ..services.accounts import (
     anonymize_user_account,
     get_vendor_deletion_blockers,
@@ -17,11 +17,26 @@ from ..services.accounts import (
     vendor_can_be_deactivated,
 )
 from ..services.access import _sync_trip_status_from_booking
+from ..services.analytics import _sync_vendor_rollup_from_booking
+from ..services.capacity import _sync_capacity_ledger_from_booking
+from ..services.pagination import _build_cursor_url, paginate_by_keyset
+from ..services.facets import bump_package_facet_version
+from ..services.payment_logs import (
+    filter_payment_logs,
+    get_payment_log_filters,
+    stream_payment_logs_csv,
+    stream_payment_logs_jsonl,
+    summarize_payment_logs,
+)
 from ..services.payments import _create_payment_log
+from ..services.packages import on_package_changed
+from ..services.ratings import _sync_package_rating_from_review
 from ..services.vendor_ops import send_vendor_status_email
 
 User = get_user_model()
 
+PAYMENT_LOGS_PER_PAGE = 50
+
 
 @login_required
 @role_required(allowed_roles=['admin'])
@@ -64,7 +79,11 @@ def delete_user(request, user_id):
     if request.method == 'POST':
         user_to_delete = get_object_or_404(User, id=user_id)
         if not user_to_delete.is_superuser:
+            reviews = list(Review.objects.filter(user=user_to_delete).only('package_id', 'rating'))
             user_to_delete.delete()
+            bump_package_facet_version()
+            for review in reviews:
+                _sync_package_rating_from_review(review, delta=-1)
             messages.success(request, f"User {user_to_delete.username} has been deleted.")
         else:
             messages.error(request, "Superusers cannot be deleted.")
@@ -232,6 +251,7 @@ def finalize_cancellation_request(request, booking_id, decision):
             notes='Admin approved booking cancellation refund.',
         )
         _sync_trip_status_from_booking(booking)
+        _sync_vendor_rollup_from_booking(booking, 'cancellation_reviewed')
         messages.success(request, 'Cancellation approved and refund status recorded.')
     elif decision == 'reject':
         booking.status = 'confirmed'
@@ -239,6 +259,8 @@ def finalize_cancellation_request(request, booking_id, decision):
         booking.cancellation_admin_reviewed_at = timezone.now()
         booking.save(update_fields=['status', 'admin_cancellation_notes', 'cancellation_admin_reviewed_at'])
         _sync_trip_status_from_booking(booking)
+        _sync_capacity_ledger_from_booking(booking, 'cancellation_reviewed')
+        _sync_vendor_rollup_from_booking(booking, 'cancellation_reviewed')
         messages.success(request, 'Cancellation rejected and booking restored to confirmed.')
     else:
         messages.error(request, 'Invalid cancellation decision.')
@@ -249,11 +271,50 @@ def finalize_cancellation_request(request, booking_id, decision):
 @login_required
 @role_required(allowed_roles=['admin'])
 def manage_payment_logs(request):
-    payment_logs = (
-        PaymentLog.objects.select_related('user', 'booking', 'package')
-        .order_by('-created_at')
+    filters = get_payment_log_filters(request.GET)
+    payment_logs = filter_payment_logs(**filters)
+
+    log_page = paginate_by_keyset(
+        payment_logs.select_related('user', 'booking', 'package'),
+        cursor=request.GET.get('cursor'),
+        direction=request.GET.get('direction', 'next'),
+        per_page=PAYMENT_LOGS_PER_PAGE,
     )
-    return render(request, 'main/admin/manage_payment_logs.html', {'payment_logs': payment_logs})
+    log_page.update({
+        'next_url': _build_cursor_url(request, log_page['next_cursor'], 'next'),
+        'previous_url': _build_cursor_url(request, log_page['previous_cursor'], 'previous'),
+    })
+
+    export_params = request.GET.copy()
+    for key in ('cursor', 'direction', 'pagination'):
+        export_params.pop(key, None)
+
+    return render(request, 'main/admin/manage_payment_logs.html', {
+        'payment_logs': log_page['object_list'],
+        'log_page': log_page,
+        'filters': filters,
+        'summary': summarize_payment_logs(payment_logs),
+        'providers': PaymentLog.objects.order_by('provider').values_list('provider', flat=True).distinct(),
+        'status_choices': PaymentLog.STATUS_CHOICES,
+        'payment_type_choices': PaymentLog.PAYMENT_TYPE_CHOICES,
+        'export_query': export_params.urlencode(),
+    })
+
+
+@login_required
+@role_required(allowed_roles=['admin'])
+def export_payment_logs(request, export_format):
+    payment_logs = filter_payment_logs(**get_payment_log_filters(request.GET))
+    if export_format == 'csv':
+        content, content_type = stream_payment_logs_csv(payment_logs), 'text/csv'
+    elif export_format == 'jsonl':
+        content, content_type = stream_payment_logs_jsonl(payment_logs), 'application/x-ndjson'
+    else:
+        return HttpResponseBadRequest('Unsupported export format.')
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="payment_logs_{timezone.now():%Y%m%d}.{export_format}"'
+    return response
 
 
 @login_required
@@ -311,5 +372,6 @@ def update_package_moderation(request, package_id, new_status):
     package.moderation_notes = request.POST.get('moderation_notes', '').strip()
     package.moderated_at = timezone.now()
     package.save(update_fields=['moderation_status', 'moderation_notes', 'moderated_at'])
+    on_package_changed(package.id)
     messages.success(request, f'{package.name} marked as {package.get_moderation_status_display()}.')
     return redirect('manage_package_moderation')
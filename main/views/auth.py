@@ -3,7 +3,6 @@ from django.contrib.auth import login, logout, update_session_auth_hash
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import login_required
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import EmailMessage
 from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
@@ -30,6 +29,7 @@ from ..services.accounts import (
     traveler_can_be_deactivated,
     vendor_can_be_deactivated,
 )
+from ..services.mailer import queue_email
 from ..utils import send_otp
 
 User = get_user_model()
@@ -393,8 +393,7 @@ def send_verification_email(request, user, profile):
         'uid': urlsafe_base64_encode(force_bytes(user.pk)),
         'token': profile.verification_token,
     })
-    email = EmailMessage(mail_subject, message, to=[user.email])
-    email.send()
+    queue_email(mail_subject, message, user.email)
 
 
 def check_email(request):
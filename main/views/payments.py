@@ -3,12 +3,13 @@ import json
 import logging
 import uuid
 from decimal import Decimal
+from urllib.parse import urlencode
 
 import stripe
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseBadRequest
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
@@ -17,25 +18,77 @@ from ..decorators import role_required
 from ..forms import BookingTravelerForm
 from ..models import CustomItinerary, TravelPackage
 from ..services.access import _get_vendor_or_403, _safe_int
-from ..services.capacity import can_proceed_with_capacity
-from ..services.notifications import _notify_booking_confirmed, _notify_payment_cancelled
+from ..services.capacity import (
+    can_proceed_with_capacity,
+    release_capacity_hold,
+    reserve_package_capacity,
+)
+from ..services.notifications import _notify_payment_cancelled
+from ..services.payment_events import get_checkout_return_event, record_checkout_return, record_stripe_event
 from ..services.payments import (
-    _activate_pending_sponsorship,
+    _build_checkout_metadata,
+    _build_pending_checkout_metadata,
     _build_payment_context,
     _build_sponsorship_payment_context,
     _calculate_booking_pricing,
     _clear_pending_payment_session,
-    _create_or_update_booking_from_pending_payment,
     _create_payment_log,
     _generate_esewa_signature,
+    _get_checkout_payment_log,
+    _get_confirmed_booking_for_payment,
     _normalize_sponsorship_amount,
-    _get_sponsorship_price,
     _store_pending_payment_session,
     _verify_esewa_payload,
 )
 
 logger = logging.getLogger(__name__)
 
+CAPACITY_UNAVAILABLE_MESSAGE = (
+    "Your seat hold expired before the payment went through and the package has since filled up. "
+    "No booking was made and your payment has been flagged for a refund."
+)
+PAYMENT_NOT_CONFIRMED_MESSAGE = (
+    "We could not confirm your payment. Please contact support with your payment reference."
+)
+# How often the processing page checks whether the payment worker has confirmed the checkout.
+PAYMENT_PROCESSING_REFRESH_SECONDS = 3
+
+
+def _reserve_checkout_capacity(request, *, package, number_of_travelers, approved_request=None):
+    # Starting a new checkout abandons any earlier one, so its seats go back to the pool first.
+    release_capacity_hold(request.session.get('pending_capacity_hold_id'))
+    request.session.pop('pending_capacity_hold_id', None)
+    return reserve_package_capacity(
+        traveler=request.user,
+        package=package,
+        number_of_travelers=number_of_travelers,
+        allow_overbooking=approved_request is not None,
+    )
+
+
+def _reserve_custom_itinerary_capacity(request, custom_itinerary, *, adult_count, child_count, child_under_seven_count):
+    # Custom itineraries book seats on their base package, so they go through the same hold.
+    package = custom_itinerary.package
+    allowed, approved_request, _ = can_proceed_with_capacity(
+        traveler=request.user,
+        package=package,
+        adult_count=adult_count,
+        child_count=child_count,
+        child_under_seven_count=child_under_seven_count,
+    )
+    capacity_hold = None
+    if allowed:
+        capacity_hold = _reserve_checkout_capacity(
+            request,
+            package=package,
+            number_of_travelers=adult_count + child_count + child_under_seven_count,
+            approved_request=approved_request,
+        )
+    if capacity_hold is None:
+        messages.error(request, 'This package does not have enough spots left for the requested group size.')
+        return None, redirect('custom_itinerary_detail', custom_itinerary_id=custom_itinerary.id)
+    return capacity_hold, None
+
 
 @login_required
 def choose_payment(request, package_id):
@@ -150,6 +203,15 @@ def esewa_checkout(request, package_id):
     if not allowed:
         messages.error(request, 'This package is currently full for the requested group size. Vendor approval is required before payment.')
         return redirect('package_detail', package_id=package.id)
+    capacity_hold = _reserve_checkout_capacity(
+        request,
+        package=package,
+        number_of_travelers=adult_count + child_count + child_under_seven_count,
+        approved_request=approved_request,
+    )
+    if capacity_hold is None:
+        messages.error(request, 'The last spots on this package were just reserved by another traveler. Please try a smaller group or check back shortly.')
+        return redirect('package_detail', package_id=package.id)
     pricing = _calculate_booking_pricing(package, adult_count, child_count, child_under_seven_count)
     transaction_uuid = str(uuid.uuid4())
     amount = pricing['total_price']
@@ -166,6 +228,7 @@ def esewa_checkout(request, package_id):
         child_under_seven_count=child_under_seven_count,
         total_price=pricing['total_price'],
         capacity_request_id=approved_request.id if approved_request else None,
+        capacity_hold_id=capacity_hold.id,
     )
     _create_payment_log(
         provider='esewa',
@@ -273,6 +336,15 @@ def esewa_custom_itinerary_checkout(request, custom_itinerary_id):
     adult_count = traveler_form.cleaned_data['adult_count']
     child_count = traveler_form.cleaned_data['child_count']
     child_under_seven_count = traveler_form.cleaned_data['child_under_seven_count']
+    capacity_hold, redirect_response = _reserve_custom_itinerary_capacity(
+        request,
+        custom_itinerary,
+        adult_count=adult_count,
+        child_count=child_count,
+        child_under_seven_count=child_under_seven_count,
+    )
+    if redirect_response is not None:
+        return redirect_response
     pricing = _calculate_booking_pricing(
         custom_itinerary.package,
         adult_count,
@@ -294,6 +366,7 @@ def esewa_custom_itinerary_checkout(request, custom_itinerary_id):
         child_count=child_count,
         child_under_seven_count=child_under_seven_count,
         total_price=pricing['total_price'],
+        capacity_hold_id=capacity_hold.id,
     )
     _create_payment_log(
         provider='esewa',
@@ -328,6 +401,10 @@ def esewa_custom_itinerary_checkout(request, custom_itinerary_id):
     return render(request, 'main/payment/esewa_checkout.html', context)
 
 
+def _payment_status_url(provider, transaction_reference):
+    return f"{reverse('payment_status')}?{urlencode({'provider': provider, 'reference': transaction_reference})}"
+
+
 @csrf_exempt
 @login_required
 def esewa_verify(request):
@@ -356,6 +433,12 @@ def esewa_verify(request):
         payload,
     )
 
+    confirmed_booking = _get_confirmed_booking_for_payment(request.user, 'esewa', transaction_uuid)
+    if confirmed_booking:
+        return redirect('booking_confirmation', booking_id=confirmed_booking.id)
+    if get_checkout_return_event(request.user, 'esewa', transaction_uuid):
+        return redirect(_payment_status_url('esewa', transaction_uuid))
+
     if not pending_transaction_uuid or pending_transaction_uuid != transaction_uuid:
         logger.warning(
             "eSewa session mismatch: pending_transaction_uuid=%s callback_transaction_uuid=%s",
@@ -374,50 +457,9 @@ def esewa_verify(request):
             f"{reverse('payment_cancelled')}?reason=esewa_status&status={status or 'UNKNOWN'}"
         )
 
-    if request.session.get('pending_sponsorship_package_id'):
-        try:
-            package = _activate_pending_sponsorship(request)
-        except ValueError:
-            messages.error(request, 'Could not find a pending sponsorship after eSewa verification.')
-            return redirect('vendor_package_list')
-
-        _clear_pending_payment_session(request)
-        _create_payment_log(
-            provider='esewa',
-            payment_type='sponsorship',
-            status='success',
-            amount=_get_sponsorship_price(package),
-            user=request.user,
-            package=package,
-            transaction_reference=transaction_uuid or '',
-        )
-        messages.success(request, f"{package.name} is now sponsored through {package.sponsorship_end}.")
-        return redirect('vendor_package_list')
-
-    try:
-        booking, package, is_custom = _create_or_update_booking_from_pending_payment(request)
-    except ValueError:
-        messages.error(request, 'Could not find a pending booking after eSewa verification.')
-        return redirect('package_list')
-
-    _notify_booking_confirmed(booking, is_custom=is_custom)
+    record_checkout_return('esewa', transaction_uuid, _build_pending_checkout_metadata(request))
     _clear_pending_payment_session(request)
-    _create_payment_log(
-        provider='esewa',
-        payment_type='custom_itinerary' if is_custom else 'booking',
-        status='success',
-        amount=booking.total_price,
-        user=request.user,
-        booking=booking,
-        package=package,
-        transaction_reference=transaction_uuid or '',
-    )
-    if is_custom:
-        messages.success(request, f"Your custom booking for {package.name} is confirmed!")
-    else:
-        messages.success(request, f"Your booking for {package.name} is confirmed!")
-
-    return redirect('booking_confirmation', booking_id=booking.id)
+    return redirect(_payment_status_url('esewa', transaction_uuid))
 
 
 @login_required
@@ -447,6 +489,15 @@ def create_checkout_session(request, package_id):
     if not allowed:
         messages.error(request, 'This package is currently full for the requested group size. Vendor approval is required before payment.')
         return redirect('package_detail', package_id=package.id)
+    capacity_hold = _reserve_checkout_capacity(
+        request,
+        package=package,
+        number_of_travelers=adult_count + child_count + child_under_seven_count,
+        approved_request=approved_request,
+    )
+    if capacity_hold is None:
+        messages.error(request, 'The last spots on this package were just reserved by another traveler. Please try a smaller group or check back shortly.')
+        return redirect('package_detail', package_id=package.id)
     pricing = _calculate_booking_pricing(package, adult_count, child_count, child_under_seven_count)
     stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -486,6 +537,19 @@ def create_checkout_session(request, package_id):
             success_url=success_url,
             cancel_url=cancel_url,
             customer_email=request.user.email,
+            # Closing the session with the hold keeps a late payment from claiming released seats.
+            expires_at=int(capacity_hold.expires_at.timestamp()),
+            metadata=_build_checkout_metadata(
+                request.user,
+                'booking',
+                package_id=package.id,
+                adult_count=adult_count,
+                child_count=child_count,
+                child_under_seven_count=child_under_seven_count,
+                total_price=pricing['total_price'],
+                capacity_request_id=approved_request.id if approved_request else None,
+                capacity_hold_id=capacity_hold.id,
+            ),
         )
 
         _store_pending_payment_session(
@@ -497,6 +561,8 @@ def create_checkout_session(request, package_id):
             child_under_seven_count=child_under_seven_count,
             total_price=pricing['total_price'],
             capacity_request_id=approved_request.id if approved_request else None,
+            transaction_uuid=checkout_session.id,
+            capacity_hold_id=capacity_hold.id,
         )
         _create_payment_log(
             provider='stripe',
@@ -511,6 +577,7 @@ def create_checkout_session(request, package_id):
         return redirect(checkout_session.url, code=303)
 
     except Exception as e:
+        release_capacity_hold(capacity_hold.id)
         messages.error(request, f"Something went wrong with the payment process. Error: {e}")
         return redirect('package_detail', package_id=package.id)
 
@@ -550,11 +617,18 @@ def create_sponsorship_checkout_session(request, package_id):
             success_url=success_url,
             cancel_url=cancel_url,
             customer_email=request.user.email,
+            metadata=_build_checkout_metadata(
+                request.user,
+                'sponsorship',
+                package_id=package.id,
+                sponsorship_amount=amount,
+            ),
         )
 
         _store_pending_payment_session(
             request,
             sponsorship_package_id=package.id,
+            transaction_uuid=checkout_session.id,
             provider='stripe',
             sponsorship_amount=amount,
         )
@@ -599,6 +673,15 @@ def create_custom_itinerary_checkout_session(request, custom_itinerary_id):
     adult_count = traveler_form.cleaned_data['adult_count']
     child_count = traveler_form.cleaned_data['child_count']
     child_under_seven_count = traveler_form.cleaned_data['child_under_seven_count']
+    capacity_hold, redirect_response = _reserve_custom_itinerary_capacity(
+        request,
+        custom_itinerary,
+        adult_count=adult_count,
+        child_count=child_count,
+        child_under_seven_count=child_under_seven_count,
+    )
+    if redirect_response is not None:
+        return redirect_response
     pricing = _calculate_booking_pricing(
         custom_itinerary.package,
         adult_count,
@@ -644,16 +727,29 @@ def create_custom_itinerary_checkout_session(request, custom_itinerary_id):
             success_url=success_url,
             cancel_url=cancel_url,
             customer_email=request.user.email,
+            expires_at=int(capacity_hold.expires_at.timestamp()),
+            metadata=_build_checkout_metadata(
+                request.user,
+                'custom_itinerary',
+                custom_itinerary_id=custom_itinerary.id,
+                adult_count=adult_count,
+                child_count=child_count,
+                child_under_seven_count=child_under_seven_count,
+                total_price=pricing['total_price'],
+                capacity_hold_id=capacity_hold.id,
+            ),
         )
 
         _store_pending_payment_session(
             request,
             custom_itinerary_id=custom_itinerary.id,
+            transaction_uuid=checkout_session.id,
             provider='stripe',
             adult_count=adult_count,
             child_count=child_count,
             child_under_seven_count=child_under_seven_count,
             total_price=pricing['total_price'],
+            capacity_hold_id=capacity_hold.id,
         )
         _create_payment_log(
             provider='stripe',
@@ -667,63 +763,79 @@ def create_custom_itinerary_checkout_session(request, custom_itinerary_id):
 
         return redirect(checkout_session.url, code=303)
     except Exception as e:
+        release_capacity_hold(capacity_hold.id)
         messages.error(request, f"Something went wrong with the payment process. Error: {e}")
         return redirect('custom_itinerary_detail', custom_itinerary_id=custom_itinerary.id)
 
 
-def payment_success(request):
-    if not request.session.get('pending_custom_itinerary_id') and not request.session.get('pending_booking_package_id') and not request.session.get('pending_sponsorship_package_id'):
-        messages.error(request, "Could not find a pending booking. Please try again.")
-        return redirect('package_list')
+def _render_checkout_status(request, provider, transaction_reference):
+    """Show what became of a returned checkout, or a page that polls until the worker decides.
 
-    if request.session.get('pending_sponsorship_package_id'):
-        try:
-            package = _activate_pending_sponsorship(request)
-        except ValueError:
-            messages.error(request, "Could not find a pending sponsorship. Please try again.")
-            return redirect('vendor_package_list')
+    Returns ``None`` when this user has no queued return for the reference.
+    """
+    booking = _get_confirmed_booking_for_payment(request.user, provider, transaction_reference)
+    if booking:
+        return render(request, 'main/payment/payment_success.html', {'booking': booking})
 
-        _clear_pending_payment_session(request)
-        _create_payment_log(
-            provider='stripe',
-            payment_type='sponsorship',
-            status='success',
-            amount=_get_sponsorship_price(package),
-            user=request.user,
-            package=package,
-            transaction_reference=request.GET.get('session_id', ''),
-        )
-        messages.success(request, f"{package.name} is now sponsored through {package.sponsorship_end}.")
+    payment_log = _get_checkout_payment_log(request.user, provider, transaction_reference)
+    if payment_log and payment_log.status == 'failed':
+        messages.error(request, CAPACITY_UNAVAILABLE_MESSAGE)
+        return redirect('package_list')
+    if payment_log and payment_log.payment_type == 'sponsorship':
         return render(request, 'main/payment/payment_success.html', {
-            'sponsorship_package': package,
-            'sponsorship_end': package.sponsorship_end,
+            'sponsorship_package': payment_log.package,
+            'sponsorship_end': payment_log.package.sponsorship_end,
         })
 
-    try:
-        booking, package, is_custom = _create_or_update_booking_from_pending_payment(request)
-    except ValueError:
-        messages.error(request, "Could not find a pending booking. Please try again.")
+    event = get_checkout_return_event(request.user, provider, transaction_reference)
+    if event is None:
+        return None
+    if event.status != 'pending':
+        messages.error(request, PAYMENT_NOT_CONFIRMED_MESSAGE)
         return redirect('package_list')
+    return render(request, 'main/payment/payment_processing.html', {
+        'refresh_seconds': PAYMENT_PROCESSING_REFRESH_SECONDS,
+    })
 
-    _notify_booking_confirmed(booking, is_custom=is_custom)
-    _clear_pending_payment_session(request)
-    _create_payment_log(
-        provider='stripe',
-        payment_type='custom_itinerary' if is_custom else 'booking',
-        status='success',
-        amount=booking.total_price,
-        user=request.user,
-        booking=booking,
-        package=package,
-        transaction_reference=request.GET.get('session_id', ''),
-    )
 
-    if is_custom:
-        messages.success(request, f"Your custom booking for {package.name} is confirmed!")
+def payment_success(request):
+    session_id = request.GET.get('session_id', '')
+    has_pending_checkout = any(request.session.get(key) for key in [
+        'pending_custom_itinerary_id',
+        'pending_booking_package_id',
+        'pending_sponsorship_package_id',
+    ])
+
+    # Only the Checkout Session created for this browser session is queued here; the
+    # session_id query parameter is never trusted on its own. The payment event worker
+    # confirms it, the same as the webhook, so this request stays short.
+    if (
+        request.user.is_authenticated
+        and has_pending_checkout
+        and session_id
+        and request.session.get('pending_payment_transaction_uuid') == session_id
+    ):
+        record_checkout_return('stripe', session_id, _build_pending_checkout_metadata(request))
+        _clear_pending_payment_session(request)
+
+    response = _render_checkout_status(request, 'stripe', session_id)
+    if response is not None:
+        return response
+
+    if not has_pending_checkout:
+        messages.error(request, "Could not find a pending booking. Please try again.")
     else:
-        messages.success(request, f"Your booking for {package.name} is confirmed!")
+        messages.error(request, "This payment does not match your current checkout. Please try again.")
+    return redirect('package_list')
+
 
-    return render(request, 'main/payment/payment_success.html', {'booking': booking})
+@login_required
+def payment_status(request):
+    response = _render_checkout_status(request, request.GET.get('provider', ''), request.GET.get('reference', ''))
+    if response is not None:
+        return response
+    messages.error(request, "Could not find a pending payment. Please try again.")
+    return redirect('package_list')
 
 
 def payment_cancelled(request):
@@ -747,6 +859,7 @@ def payment_cancelled(request):
             vendor__user=request.user,
         ).first()
 
+    release_capacity_hold(request.session.get('pending_capacity_hold_id'))
     _notify_payment_cancelled(request, detail_message)
     pending_package_id = request.session.get('pending_booking_package_id') or request.session.get('pending_sponsorship_package_id')
     pending_package = TravelPackage.objects.filter(pk=pending_package_id).first() if pending_package_id else None
@@ -774,3 +887,18 @@ def payment_cancelled(request):
             'sponsorship_package': sponsorship_package,
         },
     )
+
+
+@csrf_exempt
+def stripe_webhook(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    try:
+        event, created = record_stripe_event(request.body, request.META.get('HTTP_STRIPE_SIGNATURE', ''))
+    except (ValueError, KeyError, stripe.SignatureVerificationError):
+        logger.warning("Rejected Stripe webhook with an invalid payload or signature.")
+        return HttpResponseBadRequest('Invalid Stripe webhook.')
+
+    logger.info("Stripe webhook queued: event_id=%s type=%s new=%s", event.event_id, event.event_type, created)
+    return HttpResponse(status=200)
@@ -1,13 +1,26 @@
-from decimal import Decimal
-
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Case, When, Value, IntegerField
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
 
 from ..filters import TravelPackageFilter
-from ..models import TravelPackage
+from ..models import TravelPackage, normalize_facet_value
+from ..services.capacity import annotate_package_capacity, attach_package_capacity
+from ..services.facets import get_package_facets
+from ..services.pagination import _build_cursor_url, paginate_by_keyset
+from ..services.search import search_packages
+from ..services.similarity import get_similar_packages
+from ..services.sponsorship import (
+    filter_sponsored_packages,
+    get_active_sponsored_package_ids,
+    get_active_sponsored_packages,
+)
+
+PACKAGE_LIST_SORT_FIELDS = {
+    'newest': 'created_at',
+    'rating': 'rating_avg',
+}
+# Query parameters that only make sense for the page being left, dropped from facet links.
+PACKAGE_LIST_PAGING_PARAMS = ('page', 'cursor', 'direction')
 
 
 def root_redirect_view(request):
@@ -24,21 +37,13 @@ def root_redirect_view(request):
 
 
 def home(request):
-    today = timezone.now().date()
-    sponsored_packages = TravelPackage.objects.select_related('vendor').filter(
-        moderation_status='approved',
-        is_sponsored=True,
-        sponsorship_start__isnull=False,
-        sponsorship_end__isnull=False,
-        sponsorship_start__lte=today,
-        sponsorship_end__gte=today,
-    ).order_by('-sponsorship_amount', '-created_at')[:4]
-    packages = (
+    sponsored_packages = attach_package_capacity(get_active_sponsored_packages(limit=4))
+    packages = annotate_package_capacity(
         TravelPackage.objects.select_related('vendor')
         .filter(moderation_status='approved')
-        .exclude(id__in=sponsored_packages.values_list('id', flat=True))
-        .order_by('-created_at')[:4]
-    )
+        .exclude(id__in=get_active_sponsored_package_ids())
+        .order_by('-created_at')
+    )[:4]
     return render(request, 'main/public/home.html', {
         'packages': packages,
         'sponsored_packages': sponsored_packages,
@@ -51,17 +56,37 @@ def about(request):
 
 def search_results(request):
     query = request.GET.get('q', '')
-    base_qs = TravelPackage.objects.filter(moderation_status='approved')
-    if query:
-        packages = base_qs.filter(
-            Q(name__icontains=query)
-            | Q(description__icontains=query)
-            | Q(vendor__name__icontains=query)
-        )
-    else:
-        packages = base_qs
+    base_qs = TravelPackage.objects.select_related('vendor').filter(moderation_status='approved')
+    packages_qs = annotate_package_capacity(search_packages(query, base_qs))
+
+    paginator = Paginator(packages_qs, 9)
+    packages = paginator.get_page(request.GET.get('page'))
+
+    return render(request, 'main/public/_package_list_partial.html', {
+        'packages': packages,
+        'query': query,
+    })
 
-    return render(request, 'main/public/_package_list_partial.html', {'packages': packages})
+
+def _build_facet_links(request, facets):
+    base_params = request.GET.copy()
+    for param in PACKAGE_LIST_PAGING_PARAMS:
+        base_params.pop(param, None)
+
+    facet_groups = []
+    for facet in facets:
+        selected_value = normalize_facet_value(request.GET.get(facet['name']))
+        values = []
+        for option in facet['values']:
+            params = base_params.copy()
+            selected = option['value'] == selected_value
+            if selected:
+                params.pop(facet['name'], None)
+            else:
+                params[facet['name']] = option['value']
+            values.append({**option, 'selected': selected, 'url': f'?{params.urlencode()}'})
+        facet_groups.append({**facet, 'values': values})
+    return facet_groups
 
 
 def package_list(request):
@@ -71,72 +96,58 @@ def package_list(request):
         .order_by('-created_at')
     )
     package_filter = TravelPackageFilter(request.GET, queryset=packages_list)
-    today = timezone.now().date()
     filtered_qs = package_filter.qs.select_related('vendor')
-    sponsored_packages = filtered_qs.filter(
-        is_sponsored=True,
-        sponsorship_start__isnull=False,
-        sponsorship_end__isnull=False,
-        sponsorship_start__lte=today,
-        sponsorship_end__gte=today,
-    ).order_by('-sponsorship_amount', '-created_at')
-
-    organic_packages_qs = filtered_qs.exclude(
-        id__in=sponsored_packages.values_list('id', flat=True)
-    ).order_by('-created_at')
-
-    paginator = Paginator(organic_packages_qs, 9)
-    page_number = request.GET.get('page')
-    packages = paginator.get_page(page_number)
+    facets = _build_facet_links(request, get_package_facets(package_filter))
+    if package_filter.form.has_changed():
+        sponsored_packages = filter_sponsored_packages(filtered_qs)
+    else:
+        sponsored_packages = get_active_sponsored_packages()
+    sponsored_packages = attach_package_capacity(sponsored_packages)
+
+    sort = request.GET.get('sort') if request.GET.get('sort') in PACKAGE_LIST_SORT_FIELDS else 'newest'
+    sort_field = PACKAGE_LIST_SORT_FIELDS[sort]
+    organic_packages_qs = annotate_package_capacity(
+        filtered_qs.exclude(id__in=get_active_sponsored_package_ids())
+    ).order_by(f'-{sort_field}', '-id')
+
+    cursor_page = None
+    if request.GET.get('pagination') == 'cursor':
+        cursor_page = paginate_by_keyset(
+            organic_packages_qs,
+            cursor=request.GET.get('cursor'),
+            direction=request.GET.get('direction', 'next'),
+            per_page=9,
+            field=sort_field,
+        )
+        packages = cursor_page['object_list']
+        cursor_page.update({
+            'next_url': _build_cursor_url(request, cursor_page['next_cursor'], 'next'),
+            'previous_url': _build_cursor_url(request, cursor_page['previous_cursor'], 'previous'),
+        })
+    else:
+        paginator = Paginator(organic_packages_qs, 9)
+        page_number = request.GET.get('page')
+        packages = paginator.get_page(page_number)
+
+    filter_params = request.GET.copy()
+    filter_params.pop('page', None)
 
     return render(request, 'main/public/package_list.html', {
         'packages': packages,
+        'cursor_page': cursor_page,
+        'filter_query': filter_params.urlencode(),
         'filter': package_filter,
+        'facets': facets,
+        'sort': sort,
         'sponsored_packages': sponsored_packages,
     })
 
 
 def compare_packages(request):
-    def _find_similar_packages(base_package, limit=3):
-        base_queryset = TravelPackage.objects.exclude(id=base_package.id)
-        similarity_score = Case(
-            When(travel_type=base_package.travel_type, then=Value(3)),
-            default=Value(0),
-            output_field=IntegerField(),
-        ) + Case(
-            When(location=base_package.location, then=Value(2)),
-            default=Value(0),
-            output_field=IntegerField(),
-        ) + Case(
-            When(
-                price__gte=base_package.price * Decimal('0.80'),
-                price__lte=base_package.price * Decimal('1.20'),
-                then=Value(1),
-            ),
-            default=Value(0),
-            output_field=IntegerField(),
-        )
-
-        deluxe_q = (
-            Q(name__icontains='deluxe')
-            | Q(description__icontains='deluxe')
-            | Q(travel_type__icontains='deluxe')
-        )
-        base_is_deluxe = TravelPackage.objects.filter(id=base_package.id).filter(deluxe_q).exists()
-
-        if base_is_deluxe:
-            base_queryset = base_queryset.filter(deluxe_q)
-
-        return list(
-            base_queryset
-            .annotate(similarity_score=similarity_score)
-            .order_by('-similarity_score', '-created_at')[:limit]
-        )
-
     if request.method == 'GET' and request.GET.get('package_id'):
         base_package = get_object_or_404(TravelPackage, id=request.GET.get('package_id'))
-        similar_packages = _find_similar_packages(base_package)
-        packages = [base_package] + similar_packages
+        similar_packages = get_similar_packages(base_package)
+        packages = attach_package_capacity([base_package] + similar_packages)
         return render(request, 'main/public/compare_packages.html', {
             'packages': packages,
             'base_package': base_package,
@@ -153,7 +164,7 @@ def compare_packages(request):
 
         if len(selected_packages) == 1:
             base_package = selected_packages[0]
-            packages = [base_package] + _find_similar_packages(base_package)
+            packages = attach_package_capacity([base_package] + get_similar_packages(base_package))
             messages.info(
                 request,
                 "Showing similar packages automatically based on your selected package.",
@@ -165,7 +176,7 @@ def compare_packages(request):
             })
 
         return render(request, 'main/public/compare_packages.html', {
-            'packages': selected_packages,
+            'packages': attach_package_capacity(selected_packages),
             'auto_generated': False,
         })
 
@@ -1,10 +1,13 @@
 from decimal import Decimal
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
 from django.db import transaction
-from django.http import HttpResponseBadRequest
+from django.db.models import BooleanField, Case, Count, Exists, OuterRef, Q, Value, When
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
@@ -14,7 +17,6 @@ from ..forms import (
     BookingDisputeForm,
     ChatMessageForm,
     CustomItinerarySelectionForm,
-    ItineraryDayForm,
     ReviewForm,
 )
 from ..models import (
@@ -28,22 +30,34 @@ from ..models import (
     TravelPackage,
     Trip,
 )
-from ..notifications import mark_notification_read
+from ..notifications import mark_all_notifications_read_for_user, mark_notification_read
 from ..notifications import create_notification
 from ..services.access import _get_chat_thread_for_user_or_403, _get_vendor_or_403, _safe_int
-from ..services.capacity import can_proceed_with_capacity, get_package_capacity_summary
-from ..services.dashboard import (
-    _build_dashboard_next_actions,
-    _build_dashboard_trip_cards,
-    _build_traveler_dashboard_summary,
+from ..services.analytics import _sync_vendor_rollup_from_booking
+from ..services.capacity import _sync_capacity_ledger_from_booking, can_proceed_with_capacity, get_package_capacity_summary
+from ..services.chat import (
+    CHAT_FEED_TIMEOUT,
+    annotate_thread_summaries,
+    get_chat_message_page,
+    get_unread_chat_total,
+    mark_chat_thread_read,
+    record_chat_message,
+    serialize_chat_message,
+    wait_for_chat_messages,
 )
+from ..services.dashboard import _build_traveler_dashboard
 from ..services.itineraries import (
     _build_booking_selection_items,
     _build_selected_options_summary,
     _group_booking_selection_items,
+    _prefetch_booking_selections,
 )
 from ..services.notifications import _notify_chat_message, _notify_custom_itinerary_saved
+from ..services.package_detail import get_package_detail_content, get_package_review_page
+from ..services.pagination import _build_cursor_url
 from ..services.payments import _build_payment_context
+from ..services.ratings import _sync_package_rating_from_review, build_rating_histogram_rows
+from ..services.similarity import get_similar_packages
 from ..services.trips import (
     _build_trip_next_action,
     _build_trip_progress_summary,
@@ -52,6 +66,8 @@ from ..services.trips import (
     _build_trip_timeline_sections,
 )
 
+MY_BOOKINGS_PER_PAGE = 10
+
 
 def _user_can_review_package(user, package):
     return Booking.objects.filter(
@@ -85,21 +101,22 @@ def dashboard(request):
     )
 
     recent_threads = list(
-        ChatThread.objects.filter(traveler=request.user, is_active=True)
+        annotate_thread_summaries(
+            ChatThread.objects.filter(traveler=request.user, is_active=True),
+            request.user,
+        )
         .select_related('vendor', 'package')
-        .prefetch_related('messages__sender')
         .order_by('-updated_at')[:5]
     )
-    for thread in recent_threads:
-        messages_list = list(thread.messages.all())
-        thread.latest_message = messages_list[-1] if messages_list else None
 
+    dashboard = _build_traveler_dashboard(request.user)
     return render(request, 'main/traveler/traveler_dashboard.html', {
-        'dashboard_summary': _build_traveler_dashboard_summary(request.user),
-        'active_trip_cards': _build_dashboard_trip_cards(request.user, limit=1),
-        'next_actions': _build_dashboard_next_actions(request.user),
+        'dashboard_summary': dashboard['summary'],
+        'active_trip_cards': dashboard['trip_cards'],
+        'next_actions': dashboard['next_actions'],
         'recent_notifications': recent_notifications,
         'recent_threads': recent_threads,
+        'unread_chat_count': get_unread_chat_total(request.user),
         'recent_bookings': recent_bookings,
     })
 
@@ -128,16 +145,13 @@ def mark_all_notifications_read(request):
     if request.method != 'POST':
         return HttpResponseBadRequest('POST request required.')
 
-    Notification.objects.filter(user=request.user, is_read=False).update(
-        is_read=True,
-        read_at=timezone.now(),
-    )
+    mark_all_notifications_read_for_user(request.user)
     messages.success(request, 'All notifications marked as read.')
     return redirect('notification_list')
 
 
 def package_detail(request, package_id):
-    package = get_object_or_404(TravelPackage, pk=package_id)
+    package = get_object_or_404(TravelPackage.objects.select_related('vendor'), pk=package_id)
     profile = getattr(request.user, 'userprofile', None) if request.user.is_authenticated else None
     profile_vendor = getattr(profile, 'vendor', None) if profile else None
 
@@ -154,7 +168,6 @@ def package_detail(request, package_id):
     ):
         raise PermissionDenied
 
-    reviews = Review.objects.filter(package=package).order_by('-created_at')
     review_form = ReviewForm()
     itinerary_items = []
     is_vendor_owner = bool(
@@ -164,18 +177,22 @@ def package_detail(request, package_id):
         and profile_vendor
         and profile_vendor.id == package.vendor_id
     )
-    package_days = package.package_days.prefetch_related('options').all()
+    detail_content = get_package_detail_content(package)
+    package_days = detail_content['package_days']
     capacity_summary = get_package_capacity_summary(package)
-    customization_form = CustomItinerarySelectionForm(package=package) if package_days.exists() else None
+    customization_form = (
+        CustomItinerarySelectionForm(package=package, package_days=package_days)
+        if package_days else None
+    )
     selected_options_summary = []
     customization_extra_cost = Decimal('0.00')
     customization_total = Decimal(package.price)
 
-    if package_days.exists():
+    if package_days:
         if request.method == 'POST' and (
             'preview_customization' in request.POST or 'save_customization' in request.POST
         ):
-            customization_form = CustomItinerarySelectionForm(request.POST, package=package)
+            customization_form = CustomItinerarySelectionForm(request.POST, package=package, package_days=package_days)
             if customization_form.is_valid():
                 selected_options = customization_form.get_selected_options()
                 customization_total = customization_form.calculate_total(package.price)
@@ -227,35 +244,18 @@ def package_detail(request, package_id):
                 'selection_field': selection_field,
             })
     else:
-        activity_labels = dict(ItineraryDayForm.ACTIVITY_CHOICES)
-        raw_itinerary_items = package.itinerary if isinstance(package.itinerary, list) else []
-
-        for item in sorted(raw_itinerary_items, key=lambda entry: entry.get('day') or 0):
-            if not isinstance(item, dict):
-                continue
-
-            day = item.get('day')
-            title = (item.get('title') or '').strip()
-            description = (item.get('description') or '').strip()
-            activity_type = item.get('activity_type') or ''
-            inclusions = [
-                inclusion.strip()
-                for inclusion in (item.get('inclusions') or '').split(',')
-                if inclusion.strip()
-            ]
-
-            if not day or not title or not description:
-                continue
+        itinerary_items = detail_content['legacy_itinerary_items']
 
-            itinerary_items.append({
-                'day': day,
-                'title': title,
-                'description': description,
-                'activity_label': activity_labels.get(activity_type, activity_type.replace('_', ' ').title()),
-                'inclusions': inclusions,
-                'options': [],
-                'selection_field': None,
-            })
+    review_page = get_package_review_page(
+        package,
+        cursor=request.GET.get('cursor'),
+        direction=request.GET.get('direction', 'next'),
+        first_page=detail_content['first_review_page'],
+    )
+    review_page.update({
+        'next_url': _build_cursor_url(request, review_page['next_cursor'], 'next'),
+        'previous_url': _build_cursor_url(request, review_page['previous_cursor'], 'previous'),
+    })
 
     user_can_review = False
     if request.user.is_authenticated:
@@ -268,7 +268,10 @@ def package_detail(request, package_id):
 
     return render(request, 'main/traveler/package_detail.html', {
         'package': package,
-        'reviews': reviews,
+        'reviews': review_page['object_list'],
+        'review_page': review_page,
+        'rating_histogram': build_rating_histogram_rows(package),
+        'similar_packages': get_similar_packages(package) if package.moderation_status == 'approved' else [],
         'user_can_review': user_can_review,
         'review_form': review_form,
         'itinerary_items': itinerary_items,
@@ -386,26 +389,36 @@ def custom_itinerary_detail(request, custom_itinerary_id):
 
 @login_required
 def my_bookings(request):
+    today = timezone.now().date()
     bookings = (
         Booking.objects.filter(user=request.user)
         .select_related('package', 'package__vendor', 'custom_itinerary', 'trip', 'operations')
-        .prefetch_related(
-            'custom_itinerary__selections__package_day',
-            'custom_itinerary__selections__selected_option',
+        .prefetch_related(_prefetch_booking_selections())
+        .annotate(
+            has_review=Exists(Review.objects.filter(user=OuterRef('user'), package=OuterRef('package'))),
+            dispute_count=Count('disputes'),
         )
-        .order_by('-booking_date')
+        .annotate(
+            can_leave_review=Case(
+                When(
+                    Q(status__in=['confirmed', 'trip_completed'], package__end_date__lt=today, has_review=False),
+                    then=Value(True),
+                ),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+        )
+        .order_by('-booking_date', '-id')
     )
-    for booking in bookings:
-        booking.selection_items = _build_booking_selection_items(booking.custom_itinerary)
+    bookings_page = Paginator(bookings, MY_BOOKINGS_PER_PAGE).get_page(request.GET.get('page'))
+    for booking in bookings_page:
+        booking.selection_items = _build_booking_selection_items(
+            booking.custom_itinerary,
+            selections=booking.custom_itinerary.selections.all() if booking.custom_itinerary else None,
+        )
         booking.selection_groups = _group_booking_selection_items(booking.selection_items)
         booking.operation_record = getattr(booking, 'operations', None)
-        booking.has_review = Review.objects.filter(user=request.user, package=booking.package).exists()
-        booking.can_leave_review = (
-            booking.status in ['confirmed', 'trip_completed']
-            and booking.package.end_date < timezone.now().date()
-            and not booking.has_review
-        )
-    return render(request, 'main/traveler/my_bookings.html', {'bookings': bookings})
+    return render(request, 'main/traveler/my_bookings.html', {'bookings': bookings_page})
 
 
 @login_required
@@ -419,10 +432,13 @@ def cancel_booking(request, booking_id):
         if booking.status in ['pending', 'confirmed']:
             form = BookingCancellationRequestForm(request.POST, instance=booking)
             if form.is_valid():
+                previous_status = booking.status
                 booking = form.save(commit=False)
                 booking.status = 'cancellation_requested'
                 booking.cancellation_requested_at = timezone.now()
                 booking.save(update_fields=['cancellation_reason', 'status', 'cancellation_requested_at'])
+                _sync_capacity_ledger_from_booking(booking, previous_status)
+                _sync_vendor_rollup_from_booking(booking, previous_status)
                 messages.success(request, 'Cancellation request sent to the vendor for review.')
             else:
                 messages.error(request, 'Please add a short cancellation reason.')
@@ -454,6 +470,7 @@ def add_review(request, package_id):
             review.user = request.user
             review.is_verified = True
             review.save()
+            _sync_package_rating_from_review(review)
             messages.success(request, 'Thank you for your review!')
             return redirect('package_detail', package_id=package.id)
         messages.error(request, 'Please provide a rating and comment for your review.')
@@ -571,7 +588,7 @@ def chat_thread_list(request):
             'vendor__user_profile',
             'vendor__user_profile__user',
             'package',
-        ).prefetch_related('messages__sender')
+        )
     elif profile.role == 'vendor':
         vendor = _get_vendor_or_403(request)
         threads = ChatThread.objects.filter(
@@ -580,12 +597,14 @@ def chat_thread_list(request):
         ).select_related(
             'traveler',
             'package',
-        ).prefetch_related('messages__sender')
+        )
     else:
         raise PermissionDenied
 
+    threads = list(annotate_thread_summaries(threads, request.user))
     return render(request, 'main/chat/chat_thread_list.html', {
         'threads': threads,
+        'unread_total': sum(thread.unread_count for thread in threads),
         'user_role': profile.role,
     })
 
@@ -593,25 +612,53 @@ def chat_thread_list(request):
 @login_required
 def chat_thread_detail(request, thread_id):
     thread = _get_chat_thread_for_user_or_403(request.user, thread_id)
-    messages_qs = thread.messages.select_related('sender').all()
 
     if request.method == 'POST':
         form = ChatMessageForm(request.POST)
         if form.is_valid():
-            message = form.save(commit=False)
-            message.thread = thread
-            message.sender = request.user
-            message.save()
-            ChatThread.objects.filter(pk=thread.id).update(updated_at=timezone.now())
+            message = record_chat_message(thread, request.user, form.cleaned_data['message'])
             _notify_chat_message(message)
             return redirect('chat_thread_detail', thread_id=thread.id)
     else:
         form = ChatMessageForm()
 
+    before_id = _safe_int(request.GET.get('before'), None, minimum=1)
+    message_page = get_chat_message_page(thread, before_id=before_id)
+    latest_message_id = message_page['messages'][-1].id if message_page['messages'] else 0
+    if before_id is None and latest_message_id:
+        mark_chat_thread_read(thread, request.user, latest_message_id)
+
     counterpart_name = thread.vendor.name if thread.traveler_id == request.user.id else thread.traveler.username
     return render(request, 'main/chat/chat_thread_detail.html', {
         'thread': thread,
-        'messages': messages_qs,
+        'messages': message_page['messages'],
+        'has_older_messages': message_page['has_older'],
+        'older_messages_cursor': message_page['older_cursor'],
+        'latest_message_id': latest_message_id,
         'form': form,
         'counterpart_name': counterpart_name,
     })
+
+
+@login_required
+async def chat_thread_feed(request, thread_id):
+    """Long-poll for messages newer than ``?after=<message id>`` and return them as JSON.
+
+    Responds as soon as something new arrives, or with an empty list after ``?timeout=``
+    seconds (capped at ``CHAT_FEED_TIMEOUT``) so the client can reconnect.
+    """
+    user = await request.auser()
+    thread = await sync_to_async(_get_chat_thread_for_user_or_403)(user, thread_id)
+    after_id = _safe_int(request.GET.get('after'), 0)
+    timeout = min(_safe_int(request.GET.get('timeout'), CHAT_FEED_TIMEOUT), CHAT_FEED_TIMEOUT)
+
+    new_messages = await wait_for_chat_messages(thread.id, after_id, timeout=timeout)
+    if new_messages:
+        await sync_to_async(mark_chat_thread_read)(thread, user, new_messages[-1].id)
+    return JsonResponse({
+        'messages': [
+            {**serialize_chat_message(message), 'is_own': message.sender_id == user.id}
+            for message in new_messages
+        ],
+        'last_id': new_messages[-1].id if new_messages else after_id,
+    })
@@ -5,10 +5,8 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.exceptions import PermissionDenied
-from django.core.mail import EmailMessage
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncMonth
-from django.http import HttpResponseBadRequest
+from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
@@ -26,15 +24,22 @@ from ..forms import (
 from ..models import Booking, BookingCapacityRequest, BookingOperation, PackageDayOption, TravelPackage, Trip, TripItem, TripItemAttachment
 from ..notifications import create_notification
 from ..services.access import _get_vendor_or_403, _sync_trip_status_from_booking
-from ..services.capacity import get_package_capacity_summary
+from ..services.analytics import _sync_vendor_rollup_from_booking, get_vendor_dashboard_analytics
+from ..services.capacity import _sync_capacity_ledger_from_booking, annotate_package_capacity
+from ..services.chat import get_unread_chat_total
 from ..services.cancellations import _calculate_refund_amount
+from ..services.bookings import filter_vendor_bookings, get_vendor_booking_filters
+from ..services.exports import stream_booking_export_csv
 from ..services.itineraries import (
     _build_booking_selection_items,
     _group_booking_selection_items,
-    _sync_package_itinerary_json,
 )
+from ..services.mailer import queue_email
+from ..services.packages import on_package_changed
 from ..services.trips import _build_trip_progress_summary, _build_trip_timeline_items
 
+VENDOR_BOOKINGS_PER_PAGE = 20
+
 
 def _build_capacity_request_checkout_url(capacity_request):
     return (
@@ -63,98 +68,85 @@ def _send_capacity_request_approved_email(request, capacity_request):
         f"{checkout_url}\n\n"
         "Regards,\nTravel Team"
     )
-    EmailMessage(subject, body, to=[traveler.email]).send()
+    queue_email(subject, body, traveler.email)
 
 
 @login_required
 @role_required(allowed_roles=['vendor'])
 def vendor_dashboard(request):
     vendor = _get_vendor_or_403(request)
-    vendor_bookings_qs = Booking.objects.filter(package__vendor=vendor)
     pending_capacity_requests = (
         BookingCapacityRequest.objects.filter(package__vendor=vendor, status='pending')
         .select_related('traveler', 'package')
         .order_by('-created_at')[:5]
     )
-    confirmed_bookings = vendor_bookings_qs.filter(status__in=['confirmed', 'trip_completed'])
-
-    total_stats = confirmed_bookings.aggregate(
-        total_revenue=Sum('total_price'),
-        total_bookings=Count('id'),
-    )
-    total_revenue = total_stats.get('total_revenue') or 0
-    total_bookings_count = total_stats.get('total_bookings') or 0
-
-    twelve_months_ago = timezone.now() - timezone.timedelta(days=365)
-    monthly_revenue_data = confirmed_bookings.filter(
-        booking_date__gte=twelve_months_ago
-    ).annotate(
-        month=TruncMonth('booking_date')
-    ).values('month').annotate(
-        revenue=Sum('total_price')
-    ).order_by('month')
+    analytics = get_vendor_dashboard_analytics(vendor.id)
+    recent_bookings = Booking.objects.filter(package__vendor=vendor).order_by('-booking_date')[:1]
 
-    monthly_labels = [item['month'].strftime('%b %Y') for item in monthly_revenue_data]
-    monthly_values = [float(item['revenue']) for item in monthly_revenue_data]
+    return render(request, 'main/vendor/vendor_dashboard.html', {
+        'total_revenue': analytics['total_revenue'],
+        'total_bookings_count': analytics['total_bookings_count'],
+        'monthly_revenue_labels': json.dumps(analytics['monthly_revenue_labels']),
+        'monthly_revenue_values': json.dumps(analytics['monthly_revenue_values']),
+        'package_booking_labels': json.dumps(analytics['package_booking_labels']),
+        'package_booking_values': json.dumps(analytics['package_booking_values']),
+        'dashboard_queue': analytics['dashboard_queue'],
+        'recent_bookings': recent_bookings,
+        'pending_capacity_requests': pending_capacity_requests,
+        'unread_chat_count': get_unread_chat_total(request.user),
+    })
 
-    package_booking_data = confirmed_bookings.values('package__name').annotate(
-        count=Count('id')
-    ).order_by('-count')[:5]
 
-    package_labels = [item['package__name'] for item in package_booking_data]
-    package_values = [item['count'] for item in package_booking_data]
+@login_required
+@role_required(allowed_roles=['vendor'])
+def vendor_bookings(request):
+    vendor = _get_vendor_or_403(request)
+    filters = get_vendor_booking_filters(request.GET)
 
-    recent_bookings = vendor_bookings_qs.order_by('-booking_date')[:1]
+    bookings = (
+        filter_vendor_bookings(vendor, **filters)
+        .select_related('user', 'package', 'trip')
+        .order_by('-booking_date', '-id')
+    )
+    bookings_page = Paginator(bookings, VENDOR_BOOKINGS_PER_PAGE).get_page(request.GET.get('page'))
 
-    dashboard_queue = {
-        'pending_bookings': vendor_bookings_qs.filter(status='pending').count(),
-        'in_review_bookings': vendor_bookings_qs.filter(status='in_review').count(),
-        'refund_requests': vendor_bookings_qs.filter(status__in=['cancellation_requested', 'cancellation_reviewed']).count(),
-        'active_trips': Trip.objects.filter(vendor=vendor).exclude(status__in=['completed', 'cancelled', 'no_show']).count(),
-    }
+    filter_params = request.GET.copy()
+    filter_params.pop('page', None)
 
-    return render(request, 'main/vendor/vendor_dashboard.html', {
-        'total_revenue': total_revenue,
-        'total_bookings_count': total_bookings_count,
-        'monthly_revenue_labels': json.dumps(monthly_labels),
-        'monthly_revenue_values': json.dumps(monthly_values),
-        'package_booking_labels': json.dumps(package_labels),
-        'package_booking_values': json.dumps(package_values),
-        'dashboard_queue': dashboard_queue,
-        'recent_bookings': recent_bookings,
-        'pending_capacity_requests': pending_capacity_requests,
+    return render(request, 'main/vendor/vendor_bookings.html', {
+        'bookings': bookings_page,
+        'filters': filters,
+        'filter_query': filter_params.urlencode(),
+        'vendor_packages': TravelPackage.objects.filter(vendor=vendor).order_by('name').only('id', 'name'),
+        'status_choices': Booking.STATUS_CHOICES,
     })
 
 
 @login_required
 @role_required(allowed_roles=['vendor'])
-def vendor_bookings(request):
+def vendor_booking_detail(request, booking_id):
     vendor = _get_vendor_or_403(request)
+    booking = get_object_or_404(
+        Booking.objects.select_related('custom_itinerary', 'operations'),
+        id=booking_id,
+        package__vendor=vendor,
+    )
 
-    bookings = Booking.objects.filter(package__vendor=vendor)\
-        .select_related('user', 'package', 'custom_itinerary', 'trip', 'operations')\
-        .prefetch_related(
-            'custom_itinerary__selections__package_day',
-            'custom_itinerary__selections__selected_option'
-        )\
-        .order_by('-booking_date')
-
-    for booking in bookings:
-        booking.selection_items = _build_booking_selection_items(booking.custom_itinerary)
-        booking.selection_groups = _group_booking_selection_items(booking.selection_items)
-        booking.operation_record = getattr(booking, 'operations', None)
-        if booking.status == 'cancellation_requested':
-            booking.cancellation_review_form = VendorCancellationReviewForm(
-                instance=booking,
-                booking=booking,
-                prefix=f'cancel-{booking.id}',
-            )
-        booking.operation_form = VendorBookingOperationsForm(
-            instance=booking.operation_record,
-            prefix=f'ops-{booking.id}',
+    booking.selection_items = _build_booking_selection_items(booking.custom_itinerary)
+    booking.selection_groups = _group_booking_selection_items(booking.selection_items)
+    booking.operation_record = getattr(booking, 'operations', None)
+    if booking.status == 'cancellation_requested':
+        booking.cancellation_review_form = VendorCancellationReviewForm(
+            instance=booking,
+            booking=booking,
+            prefix=f'cancel-{booking.id}',
         )
+    booking.operation_form = VendorBookingOperationsForm(
+        instance=booking.operation_record,
+        prefix=f'ops-{booking.id}',
+    )
 
-    return render(request, 'main/vendor/vendor_bookings.html', {'bookings': bookings})
+    return render(request, 'main/vendor/_booking_detail_partial.html', {'booking': booking})
 
 
 @login_required
@@ -165,9 +157,12 @@ def update_booking_status(request, booking_id, new_status):
 
     if request.method == 'POST':
         if new_status in ['confirmed', 'in_review', 'trip_completed', 'no_show', 'cancelled']:
+            previous_status = booking.status
             booking.status = new_status
             booking.save(update_fields=['status'])
             _sync_trip_status_from_booking(booking)
+            _sync_capacity_ledger_from_booking(booking, previous_status)
+            _sync_vendor_rollup_from_booking(booking, previous_status)
             messages.success(request, f"Booking status updated to {booking.get_status_display()}.")
         else:
             messages.error(request, 'Invalid status.')
@@ -192,6 +187,7 @@ def update_booking_operations(request, booking_id):
             booking.status = 'in_review'
             booking.save(update_fields=['status'])
             _sync_trip_status_from_booking(booking)
+            _sync_vendor_rollup_from_booking(booking, 'confirmed')
         messages.success(request, 'Booking operations updated.')
     else:
         messages.error(request, 'Please correct the booking operations form.')
@@ -233,6 +229,7 @@ def review_cancellation_request(request, booking_id):
         'status',
         'cancellation_reviewed_at',
     ])
+    _sync_vendor_rollup_from_booking(booking, 'cancellation_requested')
 
     messages.success(request, 'Cancellation review sent for admin approval.')
     return redirect('vendor_bookings')
@@ -255,9 +252,7 @@ def flight_bookings(request):
 @role_required(allowed_roles=['vendor'])
 def vendor_package_list(request):
     vendor = _get_vendor_or_403(request)
-    packages = TravelPackage.objects.filter(vendor=vendor).order_by('-created_at')
-    for package in packages:
-        package.capacity_summary = get_package_capacity_summary(package)
+    packages = annotate_package_capacity(TravelPackage.objects.filter(vendor=vendor)).order_by('-created_at')
     return render(request, 'main/vendor/vendor_package_list.html', {'packages': packages})
 
 
@@ -273,6 +268,7 @@ def create_package(request):
             package.moderation_notes = ''
             package.moderated_at = None
             package.save()
+            on_package_changed(package.id)
             messages.success(request, 'Package created and sent for admin review.')
             return redirect('vendor_dashboard')
     else:
@@ -299,6 +295,7 @@ def edit_package(request, package_id):
             package.moderation_notes = ''
             package.moderated_at = None
             package.save()
+            on_package_changed(package.id)
             messages.success(request, 'Package updated and sent for admin review.')
             return redirect('vendor_package_list')
     else:
@@ -338,7 +335,9 @@ def delete_package(request, package_id):
         )
         return redirect('vendor_package_list')
 
+    package_id = package.id
     package.delete()
+    on_package_changed(package_id)
     messages.success(request, 'Package deleted successfully.')
     return redirect('vendor_package_list')
 
@@ -381,7 +380,7 @@ def manage_itinerary(request, package_id):
                 day = day_form.save(commit=False)
                 day.package = package
                 day.save()
-                _sync_package_itinerary_json(package)
+                on_package_changed(package.id, itinerary_changed=True)
                 messages.success(request, 'Itinerary day saved successfully.')
                 return redirect('manage_itinerary', package_id=package.id)
         elif action == 'save_option':
@@ -393,14 +392,14 @@ def manage_itinerary(request, package_id):
             day_form = PackageDayForm(package=package, prefix='day')
             if option_form.is_valid():
                 option_form.save()
-                _sync_package_itinerary_json(package)
+                on_package_changed(package.id, itinerary_changed=True)
                 messages.success(request, 'Itinerary option saved successfully.')
                 return redirect('manage_itinerary', package_id=package.id)
         elif action == 'delete_day':
             day_to_delete = package_days.filter(pk=day_id).first() if day_id else None
             if day_to_delete:
                 day_to_delete.delete()
-                _sync_package_itinerary_json(package)
+                on_package_changed(package.id, itinerary_changed=True)
                 messages.success(request, 'Itinerary day deleted.')
                 return redirect('manage_itinerary', package_id=package.id)
         elif action == 'delete_option':
@@ -410,7 +409,7 @@ def manage_itinerary(request, package_id):
             )
             if option_to_delete:
                 option_to_delete.delete()
-                _sync_package_itinerary_json(package)
+                on_package_changed(package.id, itinerary_changed=True)
                 messages.success(request, 'Itinerary option deleted.')
                 return redirect('manage_itinerary', package_id=package.id)
 
@@ -614,6 +613,17 @@ def review_capacity_request(request, request_id, decision):
     return redirect('vendor_dashboard')
 
 
+@login_required
+@role_required(allowed_roles=['vendor'])
+def export_vendor_bookings_csv(request):
+    vendor = _get_vendor_or_403(request)
+    bookings = filter_vendor_bookings(vendor, **get_vendor_booking_filters(request.GET))
+
+    response = StreamingHttpResponse(stream_booking_export_csv(bookings), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="bookings_{timezone.now():%Y%m%d}.csv"'
+    return response
+
+
 @login_required
 @role_required(allowed_roles=['vendor'])
 def export_booking_csv(request, booking_id):
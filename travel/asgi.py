@@ -2,6 +2,8 @@
 ASGI config for travel project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the project through it (e.g. ``uvicorn travel.asgi:application``) so the async
+chat feed can park waiting clients on the event loop instead of on worker threads.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/